@@ -1,5 +1,5 @@
 import sys
-from main import main
+from projects.p import main
 
 if __name__ == '__main__':
-    main(sys.argv)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the persistent cache storage. Every cache is a JSON document stored
+in the ~/.p/cache folder under its own name. A missing or corrupted cache is treated as
+an empty one, so the callers can always fall back to recomputing the cached data.
+
+Several p processes may use the same caches at the same time, so the storage follows
+these rules:
+
+    readers     never lock. A cache file is only ever replaced as a whole by an atomic
+                rename, so a reader sees either the previous or the next snapshot.
+    writers     hold an exclusive advisory lock (fcntl.flock on <name>.lock) while they
+                read the latest snapshot, change it and rename the new one in place.
+                Concurrent writers are serialized and no update is lost.
+    generation  every snapshot carries a counter that is incremented by every write,
+                so a reader can tell whether a cache changed since it was read.
+
+Callers that computed a part of a cache use merge() or update(), so the entries
+written by other processes in the meantime are kept. The locks are released by the
+kernel when a process dies, a crashed writer cannot block the others. On platforms
+without fcntl the writers are not serialized, but the snapshots are still atomic.
+
+API:
+    load(name)              Returns the cached dictionary or an empty one.
+    get_generation(name)    Returns the generation of the current snapshot.
+    dump(name, data)        Atomically replaces the cached dictionary.
+    merge(name, entries)    Atomically adds or replaces entries of the cached dictionary.
+    update(name, function)  Atomically replaces the cached dictionary with function(data).
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from projects import config
+
+_FORMAT_VERSION = 1
+
+
+def load(name):
+    """ Loads a named cache without locking.
+
+    :param name: {str} name of the cache
+    :return: {dict} cached data, empty if the cache does not exist or it is corrupted
+    """
+    return _read(_get_cache_path(name))[1]
+
+
+def get_generation(name):
+    """ Generation of the current snapshot of a named cache.
+
+    :param name: {str} name of the cache
+    :return: {int} number of writes since the cache was created, 0 if it does not exist
+    """
+    return _read(_get_cache_path(name))[0]
+
+
+def dump(name, data):
+    """ Writes a named cache. Readers never see a partially written file.
+
+    :param name: {str} name of the cache
+    :param data: {dict} data to cache
+    :return: None
+    """
+    update(name, lambda _: data)
+
+
+def merge(name, entries):
+    """ Adds entries to a named cache, keeping the entries written by other processes.
+
+    :param name: {str} name of the cache
+    :param entries: {dict} entries to add or replace
+    :return: None
+    """
+    def add(data):
+        data.update(entries)
+        return data
+
+    update(name, add)
+
+
+def update(name, function):
+    """ Replaces a named cache with the result of a function of its latest snapshot. The
+    function is called while holding the writer lock of the cache, it should be fast.
+
+    :param name: {str} name of the cache
+    :param function: {callable} called with the cached dictionary, returns the new one
+                     or None to keep the cache unchanged
+    :return: {dict} the new cached data
+    """
+    path = _get_cache_path(name)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # created by a concurrent writer
+            if not os.path.isdir(directory):
+                raise
+    with _writer_lock(path):
+        generation, data = _read(path)
+        result = function(data)
+        if result is None:
+            return data
+        _write(path, {'format': _FORMAT_VERSION, 'generation': generation + 1, 'data': result})
+    return result
+
+
+def _get_cache_path(name):
+    return config.data_path('cache', name + '.json')
+
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            document = json.load(f)
+    except (IOError, OSError, ValueError):
+        return 0, {}
+    if not isinstance(document, dict) or document.get('format') != _FORMAT_VERSION:
+        return 0, {}
+    data = document.get('data')
+    return document.get('generation', 0), data if isinstance(data, dict) else {}
+
+
+def _write(path, document):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(document, f, separators=(',', ':'))
+        os.rename(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+@contextlib.contextmanager
+def _writer_lock(path):
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(os.path.splitext(path)[0] + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the content-addressed artifact store for command outputs. Commands
+can declare their inputs and outputs in the Projectfile command header:
+
+    build|b: [bootstrap] {inputs=src CMakeLists.txt, outputs=build/app}
+
+The outputs of a successful run are stored under ~/.p/cas keyed by the hash of the
+command text, the resolved variables and the content fingerprint of the inputs. Since
+the key only depends on contents, the same outputs are reused across branches and
+across sibling checkouts as well.
+
+Layout:
+
+    ~/.p/cas/objects/ab/abcdef..    file contents addressed by their sha256 hash, an
+                                    'x' suffix marks executable files
+    ~/.p/cas/entries/<key>          JSON manifest of a stored run, its modification
+                                    time is the last time it was used
+
+Restores use reflinks where possible and plain copies otherwise. Restored outputs are
+never hardlinked: a later build writing an output in place would change the stored
+object under every entry referring to it. The store is kept below a configured size by
+evicting the least recently used entries.
+
+Several p processes may share the store. Stores and garbage collections are serialized
+by the writer lock of the caches (see cache.py), so the collection never sees the
+temporary files or the unreferenced objects of a store in progress. Restores do not
+lock: an object evicted by a concurrent collection during a restore is a cache miss.
+
+API:
+    get_key(script, variables, root, inputs)    Returns the cache key of a command run.
+    contains(key)           Checks whether a run is cached without restoring it.
+    restore(key, root)      Restores the outputs of a cached run. Returns False on miss.
+    store(key, root, outputs)   Stores the outputs of a successful run.
+    gc(max_size)            Evicts the least recently used entries above max_size bytes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+
+from projects import cache
+from projects import config
+from projects import files
+
+_FORMAT_VERSION = 1
+_CHUNK_SIZE = 1024 * 1024
+
+_file_hashes = {}
+
+
+def get_key(script, variables, root, inputs):
+    """ Computes the cache key of a command run.
+
+    :param script: {str} the command text that will be executed
+    :param variables: {dict} resolved variables used by the command
+    :param root: {str} directory the input paths are relative to
+    :param inputs: {list} input files or directories
+    :return: {str} hex digest identifying the run
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([_FORMAT_VERSION, script, sorted(variables.items())]).encode('utf-8'))
+    for rel_path, digest in _fingerprint(root, inputs):
+        h.update(rel_path.encode('utf-8') + b'\0' + digest.encode('ascii') + b'\0')
+    return h.hexdigest()
+
+
+def contains(key):
+    """ Checks whether restore() would hit, without touching the outputs or the entry.
+
+    :param key: {str} cache key of the run
+    :return: {bool} True if the run and all of its objects are stored
+    """
+    return _get_complete_manifest(key) is not None
+
+
+def restore(key, root):
+    """ Restores the outputs of a cached run into root.
+
+    :param key: {str} cache key of the run
+    :param root: {str} directory the outputs are relative to
+    :return: {bool} True on cache hit
+    """
+    entry_path = _get_entry_path(key)
+    manifest = _get_complete_manifest(key)
+    if manifest is None:
+        return False
+    for output in manifest['outputs']:
+        _remove(os.path.join(root, output))
+    for directory in manifest['dirs']:
+        _makedirs(os.path.join(root, directory))
+    for rel_path, blob in manifest['files']:
+        dst = os.path.join(root, rel_path)
+        _makedirs(os.path.dirname(dst))
+        try:
+            files.clone(_get_object_path(blob), dst)
+        except OSError:
+            if os.path.isfile(_get_object_path(blob)):
+                raise
+            # evicted by a concurrent gc, the partially restored outputs are removed
+            for output in manifest['outputs']:
+                _remove(os.path.join(root, output))
+            return False
+        os.chmod(dst, _get_mode(blob) | stat.S_IWUSR)
+    _touch(entry_path)
+    return True
+
+
+def store(key, root, outputs):
+    """ Stores the declared outputs of a successful run.
+
+    Raises:
+        OSError     if a declared output does not exist
+    :param key: {str} cache key of the run
+    :param root: {str} directory the outputs are relative to
+    :param outputs: {list} output files or directories
+    :return: None
+    """
+    with _lock():
+        _store(key, root, outputs)
+
+
+def gc(max_size):
+    """ Evicts the least recently used entries until the objects fit into max_size.
+
+    :param max_size: {int} maximum total size of the stored objects in bytes
+    :return: {int} number of evicted entries
+    """
+    with _lock():
+        return _gc(max_size)
+
+
+def _store(key, root, outputs):
+    manifest = {'version': _FORMAT_VERSION, 'outputs': list(outputs), 'dirs': [], 'files': []}
+    for output in outputs:
+        path = os.path.join(root, output)
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                manifest['dirs'].append(os.path.relpath(dir_path, root))
+                for name in sorted(file_names):
+                    manifest['files'].append(_store_file(root, os.path.join(dir_path, name)))
+        elif os.path.isfile(path):
+            manifest['files'].append(_store_file(root, path))
+        else:
+            raise OSError('Declared output "{}" was not created.'.format(output))
+    entry_path = _get_entry_path(key)
+    _makedirs(os.path.dirname(entry_path))
+    _write_atomic(entry_path, json.dumps(manifest).encode('utf-8'))
+
+
+def _gc(max_size):
+    entries = []
+    references = {}
+    entries_dir = _get_cas_path('entries')
+    if os.path.isdir(entries_dir):
+        for name in os.listdir(entries_dir):
+            path = os.path.join(entries_dir, name)
+            manifest = _read_manifest(path)
+            if manifest is None:
+                continue
+            blobs = set(blob for _, blob in manifest['files'])
+            for blob in blobs:
+                references[blob] = references.get(blob, 0) + 1
+            entries.append((os.stat(path).st_mtime, path, blobs))
+
+    sizes = _get_object_sizes()
+    total = 0
+    for blob, size in sizes.items():
+        if blob in references:
+            total += size
+        else:
+            _remove(_get_object_path(blob))
+
+    evicted = 0
+    for _, path, blobs in sorted(entries):
+        if total <= max_size:
+            break
+        _remove(path)
+        evicted += 1
+        for blob in blobs:
+            references[blob] -= 1
+            if references[blob] == 0 and blob in sizes:
+                _remove(_get_object_path(blob))
+                total -= sizes[blob]
+    return evicted
+
+
+def _get_cas_path(*parts):
+    return config.data_path('cas', *parts)
+
+
+def _get_entry_path(key):
+    return _get_cas_path('entries', key)
+
+
+def _get_object_path(blob):
+    return _get_cas_path('objects', blob[:2], blob)
+
+
+def _lock():
+    _makedirs(_get_cas_path())
+    return cache._writer_lock(_get_cas_path('objects.lock'))
+
+
+def _get_mode(blob):
+    return 0o555 if blob.endswith('x') else 0o444
+
+
+def _get_object_sizes():
+    sizes = {}
+    objects_dir = _get_cas_path('objects')
+    if not os.path.isdir(objects_dir):
+        return sizes
+    for prefix in os.listdir(objects_dir):
+        prefix_dir = os.path.join(objects_dir, prefix)
+        for blob in os.listdir(prefix_dir):
+            if not blob.startswith('.') and not blob.endswith('.tmp'):
+                sizes[blob] = os.lstat(os.path.join(prefix_dir, blob)).st_size
+    return sizes
+
+
+def _fingerprint(root, inputs):
+    result = []
+    for name in sorted(inputs):
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    file_path = os.path.join(dir_path, file_name)
+                    result.append((os.path.relpath(file_path, root), _hash_file(file_path)))
+        elif os.path.isfile(path):
+            result.append((name, _hash_file(path)))
+        else:
+            result.append((name, 'missing'))
+    return result
+
+
+def _hash_file(path):
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime, st.st_ino)
+    if memo_key not in _file_hashes:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                h.update(chunk)
+        _file_hashes[memo_key] = h.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def _store_file(root, path):
+    blob = _hash_file(path)
+    if os.stat(path).st_mode & stat.S_IXUSR:
+        blob += 'x'
+    object_path = _get_object_path(blob)
+    if not os.path.isfile(object_path):
+        _makedirs(os.path.dirname(object_path))
+        temp_path = '{}.{}.tmp'.format(object_path, os.getpid())
+        _remove(temp_path)
+        files.clone(path, temp_path)
+        os.chmod(temp_path, _get_mode(blob))
+        os.rename(temp_path, object_path)
+    return [os.path.relpath(path, root), blob]
+
+
+def _read_manifest(path):
+    try:
+        with open(path, 'rb') as f:
+            manifest = json.loads(f.read().decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        return None
+    if manifest.get('version') != _FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _get_complete_manifest(key):
+    manifest = _read_manifest(_get_entry_path(key))
+    if manifest is None:
+        return None
+    for _, blob in manifest['files']:
+        if not os.path.isfile(_get_object_path(blob)):
+            return None
+    return manifest
+
+
+def _write_atomic(path, content):
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.rename(temp_path, path)
+
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _makedirs(path):
+    if path and not os.path.isdir(path):
+        os.makedirs(path)
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
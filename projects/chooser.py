@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the interactive project chooser. The terminal is switched to raw
+mode and the project list is filtered as the user types.
+
+Filtering is incremental: the matcher keeps the candidate set of every query prefix, so
+a typed character only re-ranks the candidates of the previous query, and a backspace
+returns the already computed candidates of the shorter query. Matching is a case
+insensitive subsequence match, consecutive characters and word starts rank higher.
+
+All bytes available on the input are processed before the next redraw, so a burst of
+keys over a slow link results in a single frame. Redraws go through the project list
+renderer (see render.py), which only rewrites the changed lines.
+
+A terminal resize redraws the list as well. The resize listener (see terminalsize.py)
+writes to a pipe that is watched together with the input, since the interrupted select
+would otherwise just be resumed.
+
+An escape sequence split between two reads is kept until the next read. A lone escape
+is only taken as the escape key if nothing follows it within a short timeout. Complete
+escape sequences of other keys, like left/right or home/end, are ignored.
+
+Keys:
+    printable       extends the filter
+    backspace       shortens the filter
+    up/down         moves the selection
+    pgup/pgdown     pages the list
+    enter           chooses the selected project
+    esc, ctrl-c     cancels
+
+API:
+    choose(names, conf)     Runs the chooser and returns the chosen name or None.
+    Matcher(names)
+        .update(query)      Returns the matching names, best first.
+    Chooser(names, renderer)
+        .feed(data)         Processes a chunk of input keys.
+        .flush()            Processes an incomplete escape sequence after a timeout.
+        .draw()             Redraws the changed lines of the list.
+"""
+
+import os
+import select
+import sys
+
+from projects import render
+from projects import terminalsize
+
+try:
+    import fcntl
+    import termios
+    import tty
+except ImportError:
+    fcntl = None
+    termios = None
+    tty = None
+
+_PROMPT = 'Which project do you want to enter? {}'
+_NO_MATCH = 'No project matches "{}".'
+
+_ENTER_ALTERNATE_SCREEN = '\x1b[?1049h'
+_LEAVE_ALTERNATE_SCREEN = '\x1b[?1049l'
+
+_KEY_UP = '\x1b[A'
+_KEY_DOWN = '\x1b[B'
+_KEY_PAGE_UP = '\x1b[5~'
+_KEY_PAGE_DOWN = '\x1b[6~'
+_KEY_ESCAPE = '\x1b'
+_KEY_ENTER = ('\r', '\n')
+_KEY_BACKSPACE = ('\x7f', '\x08')
+_KEY_CANCEL = ('\x03', '\x04')
+_CSI = '\x1b['
+_SS3 = '\x1bO'
+# seconds to wait for the rest of an escape sequence
+_ESCAPE_TIMEOUT = 0.1
+
+_WORD_SEPARATORS = '-_. /'
+
+
+def choose(names, conf, stream=None, fd=None):
+    """ Runs the interactive chooser on the terminal.
+
+    :param names: {list} project names in display order
+    :param conf: {dict} loaded configuration
+    :param stream: {file} output stream, stderr by default so stdout stays clean
+    :param fd: {int} input file descriptor, stdin by default
+    :return: {str} chosen project name, None if cancelled
+    """
+    stream = stream or sys.stderr
+    fd = sys.stdin.fileno() if fd is None else fd
+    renderer = render.ProjectList(names, render.get_color(conf, 'number-color'),
+                                  render.get_color(conf, 'highlight-color'), stream)
+    chooser = Chooser(names, renderer)
+    old_settings = termios.tcgetattr(fd)
+    wakeup, notify = os.pipe()
+    _set_nonblocking(notify)
+
+    def listener(size):
+        _wake_up(notify)
+
+    terminalsize.on_resize(listener)
+    stream.write(_ENTER_ALTERNATE_SCREEN)
+    try:
+        tty.setraw(fd)
+        chooser.draw()
+        while not chooser.done:
+            ready = select.select([fd, wakeup], [], [], _ESCAPE_TIMEOUT if chooser.pending else None)[0]
+            if wakeup in ready:
+                os.read(wakeup, 1024)
+            if fd in ready:
+                data = os.read(fd, 1024)
+                if not data:
+                    break
+                chooser.feed(data.decode('utf-8', 'ignore'))
+            elif not ready:
+                chooser.flush()
+            chooser.draw()
+    finally:
+        terminalsize.off_resize(listener)
+        os.close(wakeup)
+        os.close(notify)
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+        stream.write(_LEAVE_ALTERNATE_SCREEN)
+        stream.flush()
+    return chooser.result
+
+
+class Matcher(object):
+    """ Incremental subsequence matcher. """
+
+    def __init__(self, names):
+        """
+        :param names: {list} candidate names
+        """
+        self._names = list(names)
+        self._stack = [('', list(range(len(self._names))))]
+
+    def update(self, query):
+        """ Matches the query, starting from the candidates of its longest known prefix.
+
+        :param query: {str} filter text
+        :return: {list} matching names, best first
+        """
+        while not query.startswith(self._stack[-1][0]):
+            self._stack.pop()
+        if self._stack[-1][0] != query:
+            lowered = query.lower()
+            scored = []
+            for index in self._stack[-1][1]:
+                score = _score(lowered, self._names[index])
+                if score is not None:
+                    scored.append((-score, len(self._names[index]), index))
+            scored.sort()
+            self._stack.append((query, [index for _, _, index in scored]))
+        return [self._names[index] for index in self._stack[-1][1]]
+
+
+class Chooser(object):
+    """ Input handling and state of the interactive chooser. """
+
+    def __init__(self, names, renderer):
+        """
+        :param names: {list} project names in display order
+        :param renderer: {render.ProjectList} renderer used for drawing
+        """
+        self._matcher = Matcher(names)
+        self._renderer = renderer
+        self.query = ''
+        self.matches = list(names)
+        self.selected = 0
+        self.done = False
+        self.result = None
+        self.pending = ''
+
+    def feed(self, data):
+        """ Processes a chunk of input, which can hold several keys.
+
+        :param data: {str} decoded input
+        :return: None
+        """
+        data = self.pending + data
+        self.pending = ''
+        position = 0
+        while position < len(data) and not self.done:
+            key = _get_key(data, position)
+            if key is None:
+                self.pending = data[position:]
+                break
+            position += len(key)
+            self._handle_key(key)
+
+    def flush(self):
+        """ Processes the incomplete escape sequence kept by feed() when no more input
+        arrived. A lone escape is the escape key, other incomplete sequences are dropped.
+
+        :return: None
+        """
+        pending = self.pending
+        self.pending = ''
+        if pending == _KEY_ESCAPE:
+            self._handle_key(_KEY_ESCAPE)
+
+    def draw(self):
+        if self.matches:
+            self._renderer.set_header(_PROMPT.format(self.query))
+        else:
+            self._renderer.set_header(_NO_MATCH.format(self.query))
+        self._renderer.select(self.selected if self.matches else None)
+        return self._renderer.draw()
+
+    def _handle_key(self, key):
+        if key in _KEY_ENTER:
+            if self.matches:
+                self.result = self.matches[self.selected]
+            self.done = True
+        elif key in _KEY_CANCEL or key == _KEY_ESCAPE:
+            self.done = True
+        elif key in _KEY_BACKSPACE:
+            if self.query:
+                self._set_query(self.query[:-1])
+        elif key == _KEY_UP:
+            self.selected = max(self.selected - 1, 0)
+        elif key == _KEY_DOWN:
+            self.selected = min(self.selected + 1, max(len(self.matches) - 1, 0))
+        elif key == _KEY_PAGE_UP:
+            self.selected = max(self.selected - self._renderer.get_page_size(), 0)
+        elif key == _KEY_PAGE_DOWN:
+            self.selected = min(self.selected + self._renderer.get_page_size(), max(len(self.matches) - 1, 0))
+        elif len(key) == 1 and key >= ' ':
+            self._set_query(self.query + key)
+
+    def _set_query(self, query):
+        self.query = query
+        self.matches = self._matcher.update(query)
+        self.selected = 0
+        self._renderer.set_names(self.matches)
+
+
+def _set_nonblocking(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+
+def _wake_up(fd):
+    # called from the signal handler, a full pipe already has a wakeup pending
+    try:
+        os.write(fd, b'\0')
+    except OSError:
+        pass
+
+
+def _get_key(data, position):
+    # returns None if the data ends within an escape sequence
+    if data[position] != _KEY_ESCAPE:
+        return data[position]
+    if data.startswith(_CSI, position):
+        for end in range(position + len(_CSI), len(data)):
+            # parameter and intermediate bytes are below '@', the final byte ends the sequence
+            if '@' <= data[end] <= '~':
+                return data[position:end + 1]
+        return None
+    if data.startswith(_SS3, position):
+        end = position + len(_SS3)
+        return data[position:end + 1] if end < len(data) else None
+    if position + 1 == len(data) or data[position + 1] in '[O':
+        return None
+    return _KEY_ESCAPE
+
+
+def _score(query, name):
+    lowered = name.lower()
+    score = 0
+    position = 0
+    previous = -2
+    for char in query:
+        index = lowered.find(char, position)
+        if index < 0:
+            return None
+        if index == previous + 1:
+            score += 5
+        if index == 0 or lowered[index - 1] in _WORD_SEPARATORS:
+            score += 3
+        score -= index - position
+        previous = index
+        position = index + 1
+    if query in lowered:
+        score += 10
+    return score
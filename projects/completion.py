@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the shell completion support. The bash and zsh completion scripts
+read a flat completion cache file (~/.p/completion), so pressing Tab never starts Python
+as long as the cache is fresh.
+
+Cache format, one tab separated record per line:
+
+    :roots          <projects path>...
+    :subcommands    <builtin subcommand>...
+    :projects       <project name>...
+    <directory>     <command or alias>...      one line per known Projectfile
+
+The commands of a Projectfile are the commands of its merged namespace (see
+hierarchy.py), so the commands inherited from the parent Projectfiles are completed as
+well. The scripts consider the cache stale if a projects path, the Projectfile that
+applies to the current directory or any Projectfile above it is newer than the cache,
+or if the applying Projectfile is not in the cache yet. Only then is
+'p complete-refresh' invoked to regenerate it. Directories are recorded and looked up
+by their physical paths, so a projects path behind a symlink is completed as well.
+
+Installation:
+
+    bash:   eval "$(p completion bash)"     in ~/.bashrc
+    zsh:    eval "$(p completion zsh)"      in ~/.zshrc
+
+API:
+    generate(conf, subcommands, cwd)    Regenerates the completion cache.
+    get_script(shell)                   Returns the completion script of a shell.
+"""
+
+import os
+
+from projects import config
+from projects import hierarchy
+from projects import paths
+from projects import projectfile
+
+
+class CompletionError(Exception):
+    pass
+
+
+_UNSUPPORTED_SHELL_ERROR = 'Unsupported shell "{}"! Supported shells: bash, zsh.'
+
+_ROOTS_KEY = ':roots'
+_SUBCOMMANDS_KEY = ':subcommands'
+_PROJECTS_KEY = ':projects'
+
+_COMMON_SCRIPT = r'''
+_p_completion_words() {
+    local cache="${P_COMPLETION_CACHE:-$HOME/.p/completion}"
+    local dir="$(pwd -P)" projectfile_dir="" stale="" found="" line key rest root
+    [ -f "$cache" ] || stale=1
+    while [ -n "$dir" ]; do
+        if [ -f "$dir/Projectfile" ]; then
+            # the parent Projectfiles are merged into the commands of the nearest one
+            [ -n "$projectfile_dir" ] && [ "$dir/Projectfile" -nt "$cache" ] && stale=1
+            [ -z "$projectfile_dir" ] && projectfile_dir="$dir"
+        fi
+        [ "$dir" = "/" ] && break
+        dir="${dir%/*}"
+        [ -z "$dir" ] && dir="/"
+    done
+    if [ -z "$stale" ]; then
+        while IFS= read -r line; do
+            key="${line%%	*}"
+            rest="${line#*	}"
+            if [ "$key" = ":roots" ]; then
+                rest="$rest	"
+                while [ -n "$rest" ]; do
+                    root="${rest%%	*}"
+                    rest="${rest#*	}"
+                    [ -n "$root" ] && [ "$root" -nt "$cache" ] && stale=1
+                done
+            elif [ -n "$projectfile_dir" ] && [ "$key" = "$projectfile_dir" ]; then
+                found=1
+                [ "$projectfile_dir/Projectfile" -nt "$cache" ] && stale=1
+            fi
+        done < "$cache"
+        [ -n "$projectfile_dir" ] && [ -z "$found" ] && stale=1
+    fi
+    if [ -n "$stale" ]; then
+        command p complete-refresh >/dev/null 2>&1 || return 1
+    fi
+    _p_words=""
+    while IFS= read -r line; do
+        key="${line%%	*}"
+        rest="${line#*	}"
+        if [ "$key" = ":subcommands" ]; then
+            _p_words="$_p_words ${rest//	/ }"
+        elif [ -n "$projectfile_dir" ] && [ "$key" = "$projectfile_dir" ]; then
+            _p_words="$_p_words ${rest//	/ }"
+        elif [ -z "$projectfile_dir" ] && [ "$key" = ":projects" ]; then
+            _p_words="$_p_words ${rest//	/ }"
+        fi
+    done < "$cache"
+}
+'''
+
+_BASH_SCRIPT = _COMMON_SCRIPT + r'''
+_p_complete() {
+    [ "$COMP_CWORD" -eq 1 ] || return 0
+    _p_completion_words || return 0
+    COMPREPLY=($(compgen -W "$_p_words" -- "${COMP_WORDS[COMP_CWORD]}"))
+}
+complete -F _p_complete p
+'''
+
+_ZSH_SCRIPT = _COMMON_SCRIPT + r'''
+_p_complete() {
+    (( CURRENT == 2 )) || return 0
+    _p_completion_words || return 0
+    compadd -- ${=_p_words}
+}
+compdef _p_complete p
+'''
+
+_SCRIPTS = {
+    'bash': _BASH_SCRIPT,
+    'zsh': _ZSH_SCRIPT
+}
+
+
+def generate(conf, subcommands, cwd):
+    """ Regenerates the completion cache.
+
+    Every Projectfile in the root of a project is included, and the Projectfile applying
+    to the current directory as well. Projectfiles with syntax errors are recorded
+    without commands, so the scripts do not consider the cache stale because of them.
+
+    :param conf: {dict} loaded configuration
+    :param subcommands: {list} builtin subcommand names
+    :param cwd: {str} current working directory
+    :return: {str} path of the written cache file
+    """
+    projects = paths.list_projects(conf['projects-path'])
+    names = sorted(projects)
+    projectfile_dirs = [projects[name] for name in names
+                        if os.path.isfile(os.path.join(projects[name], projectfile._PROJECTFILE))]
+    project_roots = dict((directory, directory) for directory in projectfile_dirs)
+    nearest = _find_projectfile_dir(cwd)
+    if nearest is not None and nearest not in projectfile_dirs:
+        projectfile_dirs.append(nearest)
+        project_roots[nearest] = _get_project_root(conf, cwd, nearest)
+
+    records = [
+        [_ROOTS_KEY] + paths.get_roots(conf['projects-path']),
+        [_SUBCOMMANDS_KEY] + sorted(subcommands),
+        [_PROJECTS_KEY] + names
+    ]
+    for directory in projectfile_dirs:
+        try:
+            namespace = hierarchy.get_namespace(project_roots[directory],
+                                                os.path.join(directory, projectfile._PROJECTFILE))
+        except (IOError, OSError, projectfile.ProjectfileError):
+            records.append([directory])
+            continue
+        records.append([directory] + hierarchy.get_command_names(namespace))
+
+    path = _get_completion_path()
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'w') as f:
+        for record in records:
+            f.write(record[0] + '\t' + '\t'.join(record[1:]) + '\n')
+    os.rename(temp_path, path)
+    return path
+
+
+def get_script(shell):
+    """ Completion script of a shell.
+
+    Raises:
+        CompletionError     on unsupported shell
+    :param shell: {str} 'bash' or 'zsh'
+    :return: {str} script to be evaluated by the shell
+    """
+    if shell not in _SCRIPTS:
+        raise CompletionError(_UNSUPPORTED_SHELL_ERROR.format(shell))
+    return _SCRIPTS[shell]
+
+
+def _get_completion_path():
+    return config.data_path('completion')
+
+
+def _get_project_root(conf, cwd, directory):
+    # outside of the projects the nearest Projectfile is merged with nothing
+    resolved = paths.resolve(conf['projects-path'], cwd)
+    if resolved is None or resolved[1] is None:
+        return directory
+    project_root = os.path.join(resolved[0], resolved[1])
+    if directory != project_root and not directory.startswith(project_root + os.sep):
+        return directory
+    return project_root
+
+
+def _find_projectfile_dir(cwd):
+    directory = os.path.realpath(cwd)
+    while True:
+        if os.path.isfile(os.path.join(directory, projectfile._PROJECTFILE)):
+            return directory
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
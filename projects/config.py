@@ -4,7 +4,8 @@
 """
 This file contains the configuration management functions. It handles the configuration
 file (~/.prc) and configuration folder (~/.p). The configuration file contains the
-projects root path. This is the only mandatory settings the user should have.
+projects root path. This is the only mandatory settings the user should have. It can be
+a single path or a list of paths if the projects are kept in several roots.
 
 There are optional parameters as well:
 
@@ -13,13 +14,23 @@ There are optional parameters as well:
 
         possible colors: red, green, yellow, blue, magenta, cyan, white
 
+    cache-size        Maximum size of the command output cache (~/.p/cas) in megabytes.
+
     plugins           Projects contains an extensive plugin system. You can define here
                       your custom projects in a list, and put the project files into the
                       ~/.p/plugins directory.
 
+    hook-timeout      Deadline of a single plugin hook in seconds.
+
+    log-max-age       Days the captured command output (~/.p/logs) is kept for.
+    log-max-size      Maximum size of the captured command output in megabytes. The
+                      capture is off (0) by default, captured commands write to pipes
+                      instead of the terminal.
+
 API:
     get()           Returns the validated configuration as a dictionary. In case of error throws
                     a ConfigError with a displayable error message.
+    data_path()     Returns a path inside the configuration folder (~/.p).
 
 Raises:
     ConfigError     in case of config related problems:
@@ -67,7 +78,17 @@ def get():
     return config
 
 
+def data_path(*parts):
+    """ Path of an item inside the configuration folder.
+
+    :param parts: {str} path components relative to the configuration folder
+    :return: {str} expanded absolute path
+    """
+    return os.path.join(os.path.expanduser(_CONFIG_FOLDER), *parts)
+
+
 _CONFIG_FILE = '~/.prc'
+_CONFIG_FOLDER = '~/.p'
 _FILE_CREATION_ERROR = 'Config file ({}) cannot be created. IOError: {{}}'.format(_CONFIG_FILE)
 _JSON_SYNTAX_ERROR = 'Invalid JSON format in config file ({}). SyntaxError: {{}}'.format(_CONFIG_FILE)
 _MANDATORY_KEY_ERROR = 'Missing mandatory key "{{}}" in config file ({}).'.format(_CONFIG_FILE)
@@ -81,7 +102,11 @@ _default_config = {
 _optional_config = {
     'number-color': 'yellow',
     'highlight-color': 'yellow',
-    'plugins': []
+    'cache-size': 1024,
+    'plugins': [],
+    'hook-timeout': 2,
+    'log-max-age': 14,
+    'log-max-size': 0
 }
 
 
@@ -118,10 +143,21 @@ def _validate(config):
     for key in config.keys():
         if key not in full_config:
             raise SyntaxError(key)
-        elif not isinstance(config[key], full_config[key].__class__):
+        elif not isinstance(config[key], full_config[key].__class__) and not _is_path_list(key, config[key]) \
+                and not _is_number(key, config[key]):
             raise ValueError(key)
 
 
+def _is_path_list(key, value):
+    return key == 'projects-path' and isinstance(value, list) and len(value) > 0 and \
+        all(isinstance(item, str) for item in value)
+
+
+def _is_number(key, value):
+    # sizes and durations can be given as fractions as well
+    return isinstance(_optional_config.get(key), (int, float)) and isinstance(value, (int, float))
+
+
 def _create_default_config():
     """ Writes the full default configuration to the appropriate place.
     Raises:
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the cached environment snapshots. A Projectfile can declare setup
+scripts that every command of the project needs, like a virtualenv activation or a
+large environment script:
+
+    from v1.0.0
+    source venv/bin/activate
+    source tools/env.sh
+
+Sourcing these scripts before every command is slow, so they are sourced only once in
+a separate shell and the environment variables they set or unset are stored as a diff
+in the 'environments' cache. The commands get the cached diff applied to their own
+environment directly.
+
+The snapshot is keyed by the directory, the script paths, the contents of the scripts
+and the base variables the scripts usually build on (see _KEY_VARIABLES). Editing a
+declared script takes a new snapshot. Files sourced by the declared scripts are not
+tracked, touching a declared script refreshes the snapshot after changing them. Only
+the latest snapshots are kept.
+
+API:
+    get_diff(scripts, cwd)      Returns the environment diff of the setup scripts.
+    apply(diff, environ)        Returns the environment with the diff applied.
+
+Raises:
+    EnvironmentSetupError   in case of a missing or failing setup script
+"""
+
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import time
+
+from projects import cache
+
+
+class EnvironmentSetupError(Exception):
+    pass
+
+
+_MISSING_SCRIPT_ERROR = 'Environment setup script "{}" does not exist!'
+_SETUP_FAILED_ERROR = 'Environment setup failed with exit code {}.'
+
+_CACHE_NAME = 'environments'
+_FORMAT_VERSION = 1
+_KEPT_SNAPSHOTS = 32
+_KEY_VARIABLES = ('HOME', 'LANG', 'PATH', 'SHELL', 'USER')
+# variables maintained by the shell itself are never part of the diff
+_IGNORED_VARIABLES = ('_', 'OLDPWD', 'PWD', 'SHLVL')
+# an entry without "=" cannot be printed by env, it separates the two listings
+_SEPARATOR = '--p-environment--'
+
+
+def get_diff(scripts, cwd):
+    """ Environment diff of the setup scripts, captured on the first use only.
+
+    Raises:
+        EnvironmentSetupError   on missing or failing setup script
+    :param scripts: {list} setup script paths, relative to cwd or absolute
+    :param cwd: {str} directory the scripts are sourced in
+    :return: {dict} diff with the 'set' {dict} and 'unset' {list} keys
+    """
+    scripts = [os.path.join(cwd, script) for script in scripts]
+    key = _get_key(scripts, cwd)
+    snapshot = cache.load(_CACHE_NAME).get(key)
+    if snapshot is None:
+        # captured without holding the cache lock, the setup may take seconds
+        snapshot = _capture(scripts, cwd)
+    snapshot['used'] = time.time()
+
+    def add(snapshots):
+        snapshots[key] = snapshot
+        for stale in sorted(snapshots, key=lambda k: snapshots[k].get('used', 0))[:-_KEPT_SNAPSHOTS]:
+            del snapshots[stale]
+        return snapshots
+
+    cache.update(_CACHE_NAME, add)
+    return {'set': snapshot['set'], 'unset': snapshot['unset']}
+
+
+def apply(diff, environ):
+    """ Applies an environment diff.
+
+    :param diff: {dict} diff returned by get_diff()
+    :param environ: {dict} environment the commands would get without setup
+    :return: {dict} new environment
+    """
+    environment = dict(environ)
+    environment.update(diff['set'])
+    for name in diff['unset']:
+        environment.pop(name, None)
+    return environment
+
+
+def _get_key(scripts, cwd):
+    h = hashlib.sha256()
+    base = [(name, os.environ.get(name)) for name in _KEY_VARIABLES]
+    h.update(json.dumps([_FORMAT_VERSION, cwd, scripts, base]).encode('utf-8'))
+    for script in scripts:
+        try:
+            with open(script, 'rb') as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        except (IOError, OSError):
+            raise EnvironmentSetupError(_MISSING_SCRIPT_ERROR.format(script))
+    return h.hexdigest()
+
+
+def _capture(scripts, cwd):
+    # the messages of the scripts go to stderr, stdout carries the listings only
+    lines = ['env -0', "printf '%s\\0' {}".format(_SEPARATOR)]
+    lines.extend('. {} >&2'.format(shlex.quote(script)) for script in scripts)
+    lines.append('env -0')
+    process = subprocess.Popen([shutil.which('bash') or '/bin/sh', '-c', '\n'.join(['set -e'] + lines)],
+                               cwd=cwd, stdout=subprocess.PIPE)
+    output = process.communicate()[0].decode('utf-8', 'surrogateescape')
+    if process.returncode != 0:
+        raise EnvironmentSetupError(_SETUP_FAILED_ERROR.format(process.returncode))
+    entries = output.split('\0')
+    separator = entries.index(_SEPARATOR)
+    before = _parse_entries(entries[:separator])
+    after = _parse_entries(entries[separator + 1:])
+    changed = dict((name, value) for name, value in after.items()
+                   if before.get(name) != value and name not in _IGNORED_VARIABLES)
+    removed = sorted(name for name in before if name not in after and name not in _IGNORED_VARIABLES)
+    return {'set': changed, 'unset': removed}
+
+
+def _parse_entries(entries):
+    return dict(entry.split('=', 1) for entry in entries if '=' in entry)
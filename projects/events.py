@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the machine readable output of the --json mode. Every event is a
+JSON object on its own line (newline-delimited JSON) with its type in the 'event' key.
+Events are written and flushed as soon as they happen, so a consumer can process the
+results of a long run incrementally. Nothing is rendered for the terminal in this mode
+and the output of the executed commands goes to stderr.
+
+Event schemas, the keys are never removed or renamed within a schema version:
+
+    project     name, path                  a listed project
+    status      name, path, branch, dirty, ahead, behind, error
+                                            git status of a repository (see gitstatus.py)
+    projectfile path                        a discovered Projectfile
+    problem     path, line, error           a lint problem (see lint.py)
+    step        name, stage, dependencies, estimate, history, skipped, critical, unknown
+                                            a step of a plan (see plan.py)
+    plan        stages, critical-path, duration
+                                            the summary of a plan
+    start       command                     a command was started
+    restored    command                     the outputs of a command were restored
+    retry       command, attempt, retries, error
+                                            a failed command is executed again
+    finish      command, status, duration, run
+                                            a command finished, status 0 on success,
+                                            run is the id of its output log (see logs.py)
+    lockfile    path                        a Projectfile was compiled (see lockfile.py)
+    plugin-stats    hook, calls, total, max, timeouts, errors
+                                            statistics of a plugin hook (see plugins.py)
+    run         run, project, command, started, status, size, bytes
+                                            a captured command run (see logs.py)
+    log         run, output                 the captured output of a run
+    error       message                     the invocation failed
+    result      status                      the last event, the exit status of p
+
+Every event carries the schema version in the 'version' key.
+
+API:
+    enable(stream)          Switches to the JSON mode.
+    enabled()               Returns True in the JSON mode.
+    emit(event, fields)     Writes an event.
+"""
+
+import json
+import sys
+import threading
+
+_VERSION = 1
+
+_lock = threading.Lock()
+_stream = None
+
+
+def enable(stream=None):
+    """ Switches to the JSON mode.
+
+    :param stream: {file} stream the events are written to, stdout by default
+    :return: None
+    """
+    global _stream
+    _stream = stream or sys.stdout
+
+
+def enabled():
+    return _stream is not None
+
+
+def emit(event, fields=None):
+    """ Writes an event as a single line and flushes it. Safe to call from any thread.
+
+    :param event: {str} event type
+    :param fields: {dict} event data
+    :return: None
+    """
+    record = dict(fields or {})
+    record['event'] = event
+    record['version'] = _VERSION
+    line = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    with _lock:
+        _stream.write(line + '\n')
+        _stream.flush()
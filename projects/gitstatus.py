@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the git status dashboard. It queries the branch, the dirty state and
+the ahead/behind counts of every git repository under the projects path.
+
+The repositories are queried with asyncio subprocesses, at most `jobs` at a time, and
+every query has its own timeout, so a single slow repository cannot hold up the others.
+Results are reported as soon as they arrive. The results are cached in the 'git-status'
+cache keyed by the modification times of .git/index and .git/HEAD, so repositories that
+did not change since the last run are not queried again.
+
+Status format:
+
+    {
+        'path': '/home/user/projects/p',
+        'branch': 'master',         None on detached HEAD
+        'dirty': 2,                 number of changed and untracked entries
+        'ahead': 1,                 None without an upstream branch
+        'behind': 0,                None without an upstream branch
+        'error': None               'timeout' or the git error message
+    }
+
+API:
+    stream(paths, callback, jobs, timeout)  Calls callback with every status as it arrives.
+    get_repositories(projects_path)         Returns the git repositories of a projects path.
+    format_status(name, status)             Returns the dashboard line of a status.
+"""
+
+import asyncio
+import os
+
+from projects import cache
+from projects import paths
+
+_CACHE_NAME = 'git-status'
+_DEFAULT_JOBS = 16
+_DEFAULT_TIMEOUT = 10.0
+
+_TIMEOUT_ERROR = 'timeout'
+
+
+def stream(repositories, callback, jobs=_DEFAULT_JOBS, timeout=_DEFAULT_TIMEOUT):
+    """ Queries the status of the repositories and reports them as they arrive.
+
+    Cached statuses of unchanged repositories are reported first without starting any
+    process.
+
+    :param repositories: {list} repository paths
+    :param callback: {callable} called with every status dictionary
+    :param jobs: {int} maximum number of concurrently running git processes
+    :param timeout: {float} per-repository timeout in seconds
+    :return: {list} all statuses in the order of arrival
+    """
+    cached = cache.load(_CACHE_NAME)
+    fresh = {}
+    results = []
+    pending = []
+    for path in repositories:
+        key = _get_cache_key(path)
+        entry = cached.get(path)
+        if key is not None and entry is not None and entry['key'] == key:
+            fresh[path] = entry
+            results.append(entry['status'])
+            callback(entry['status'])
+        else:
+            pending.append((path, key))
+
+    if pending:
+        loop = asyncio.new_event_loop()
+        try:
+            statuses = loop.run_until_complete(_query_all(pending, callback, jobs, timeout))
+        finally:
+            loop.close()
+        for (path, key), status in statuses:
+            results.append(status)
+            if key is not None and status['error'] is None:
+                fresh[path] = {'key': key, 'status': status}
+
+    if fresh != cached:
+        cache.dump(_CACHE_NAME, fresh)
+    return results
+
+
+def get_repositories(projects_path):
+    """ Lists the git repositories directly under the projects path.
+
+    :param projects_path: {str|list} projects path from the configuration
+    :return: {list} repository paths sorted by project name
+    """
+    result = []
+    for name, path in sorted(paths.list_projects(projects_path).items()):
+        if os.path.exists(os.path.join(path, '.git')):
+            result.append(path)
+    return result
+
+
+def format_status(name, status):
+    """ Formats a status as a single dashboard line.
+
+    :param name: {str} displayed project name
+    :param status: {dict} status dictionary
+    :return: {str} formatted line
+    """
+    if status['error'] is not None:
+        return '{}  error: {}'.format(name, status['error'])
+    parts = [name, status['branch'] or '(detached)']
+    if status['dirty']:
+        parts.append('*{}'.format(status['dirty']))
+    if status['ahead']:
+        parts.append('+{}'.format(status['ahead']))
+    if status['behind']:
+        parts.append('-{}'.format(status['behind']))
+    return '  '.join(parts)
+
+
+def _get_git_dir(path):
+    git_path = os.path.join(path, '.git')
+    if os.path.isfile(git_path):
+        with open(git_path, 'r') as f:
+            content = f.read().strip()
+        if content.startswith('gitdir:'):
+            return os.path.join(path, content[len('gitdir:'):].strip())
+    return git_path
+
+
+def _get_cache_key(path):
+    git_dir = _get_git_dir(path)
+    key = []
+    for name in ('index', 'HEAD'):
+        try:
+            key.append(os.stat(os.path.join(git_dir, name)).st_mtime)
+        except OSError:
+            if name == 'HEAD':
+                return None
+            key.append(None)
+    return key
+
+
+async def _query_all(pending, callback, jobs, timeout):
+    semaphore = asyncio.Semaphore(jobs)
+    results = []
+
+    async def query(path, key):
+        async with semaphore:
+            status = await _query(path, timeout)
+        results.append(((path, key), status))
+        callback(status)
+
+    await asyncio.gather(*[query(path, key) for path, key in pending])
+    return results
+
+
+async def _query(path, timeout):
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'git', 'status', '--porcelain=v2', '--branch',
+            cwd=path, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except OSError as e:
+        return _get_error_status(path, str(e))
+    try:
+        out, err = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return _get_error_status(path, _TIMEOUT_ERROR)
+    if process.returncode != 0:
+        return _get_error_status(path, err.decode('utf-8', 'replace').strip())
+    return _parse_porcelain(path, out.decode('utf-8', 'replace'))
+
+
+def _get_error_status(path, error):
+    return {'path': path, 'branch': None, 'dirty': 0, 'ahead': None, 'behind': None, 'error': error}
+
+
+def _parse_porcelain(path, output):
+    status = {'path': path, 'branch': None, 'dirty': 0, 'ahead': None, 'behind': None, 'error': None}
+    for line in output.splitlines():
+        if line.startswith('# branch.head '):
+            head = line[len('# branch.head '):]
+            status['branch'] = None if head == '(detached)' else head
+        elif line.startswith('# branch.ab '):
+            ahead, behind = line[len('# branch.ab '):].split()
+            status['ahead'] = int(ahead)
+            status['behind'] = -int(behind)
+        elif line and not line.startswith('#'):
+            status['dirty'] += 1
+    return status
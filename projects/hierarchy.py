@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the merging of nested Projectfiles. The Projectfiles of a project
+form a tree by their directories, and every Projectfile sees a command namespace merged
+from its own commands and the commands of its ancestors:
+
+    - a command defined in a nested Projectfile shadows the one with the same name in
+      the parent Projectfiles
+    - every command keeps the scope it was defined in: it is executed in the directory
+      of its Projectfile, its variables are the variables of its Projectfile merged over
+      the variables of the ancestors, and its aliases and dependencies refer to the
+      commands visible from its own Projectfile
+    - the environment setup scripts of a Projectfile (see environment.py) are sourced
+      after the scripts of its ancestors
+
+A command that is shadowed but still referenced by an inherited command is kept in the
+namespace under the qualified name '<directory>:<command>'. The colon cannot appear in
+a command name, so the qualified names never collide with the visible ones.
+
+Precompiled Projectfiles (see lockfile.py) are used instead of parsing the sources when
+they are up to date. Merged namespaces are stored in the 'projectfile-tree' cache. A
+cached namespace is reused as long as its Projectfile and all of its ancestors are
+unchanged, so after an edit only the namespaces of the subtree below the changed
+Projectfile are rebuilt.
+
+Namespace format, a parsed Projectfile (see projectfile.py) extended with:
+
+    commands/<name>/directory   directory of the defining Projectfile
+    scopes/<directory>          merged variables of a Projectfile directory
+    environments/<directory>    absolute setup script paths of a Projectfile directory
+
+API:
+    get_namespace(project_root, path)   Returns the merged namespace of a Projectfile.
+    get_namespaces(project_root)        Returns the merged namespace of every Projectfile.
+    get_command_names(namespace)        Returns the visible command names.
+
+Raises:
+    ProjectfileError    if one of the merged Projectfiles is invalid
+"""
+
+import os
+
+from projects import cache
+from projects import lockfile
+from projects import lookup
+from projects import projectfile
+
+_CACHE_NAME = 'projectfile-tree'
+_QUALIFIED_NAME = '{}:{}'
+
+
+def get_namespace(project_root, path):
+    """ Merged namespace of a Projectfile and its ancestors up to the project root.
+
+    Raises:
+        ProjectfileError    on invalid Projectfile
+    :param project_root: {str} directory of the project
+    :param path: {str} path of the Projectfile
+    :return: {dict} merged namespace
+    """
+    project_root = os.path.abspath(project_root)
+    chain = [os.path.abspath(path)]
+    directory = os.path.dirname(chain[0])
+    while directory != project_root and os.path.dirname(directory) != directory:
+        found = lookup.find_projectfile(os.path.dirname(directory), project_root)
+        if found is None:
+            break
+        chain.insert(0, found)
+        directory = os.path.dirname(found)
+    pairs = [(path, parent) for parent, path in zip([None] + chain[:-1], chain)]
+    return _merge_all(pairs)[chain[-1]]
+
+
+def get_namespaces(project_root):
+    """ Merged namespace of every Projectfile in a project.
+
+    Raises:
+        ProjectfileError    on invalid Projectfile
+    :param project_root: {str} directory of the project
+    :return: {dict} Projectfile directory to merged namespace
+    """
+    project_root = os.path.abspath(project_root)
+    paths = projectfile._get_projectfile_list_for_project_root(project_root)
+    directories = set(os.path.dirname(path) for path in paths)
+    # parents have fewer path components, so they are merged before their children
+    pairs = [(path, _find_parent(os.path.dirname(path), project_root, directories))
+             for path in sorted(paths, key=lambda path: path.count(os.sep))]
+    merged = _merge_all(pairs)
+    return dict((os.path.dirname(path), namespace) for path, namespace in merged.items())
+
+
+def get_command_names(namespace):
+    """ Command names visible in a namespace, without the qualified shadowed ones.
+
+    :param namespace: {dict} merged namespace
+    :return: {list} sorted command names
+    """
+    return sorted(name for name in namespace['commands'] if ':' not in name)
+
+
+def _find_parent(directory, project_root, directories):
+    while directory != project_root and os.path.dirname(directory) != directory:
+        directory = os.path.dirname(directory)
+        if directory in directories:
+            return os.path.join(directory, projectfile._PROJECTFILE)
+    return None
+
+
+def _merge_all(pairs):
+    cached = cache.load(_CACHE_NAME)
+    fresh = {}
+    keys = {}
+    result = {}
+    for path, parent in pairs:
+        st = os.stat(path)
+        # the key of the parent carries the keys of all ancestors, so a namespace cached
+        # for one child is never reused by its siblings after an ancestor changed
+        key = [st.st_mtime, st.st_size, parent, keys.get(parent)]
+        keys[path] = key
+        entry = cached.get(path)
+        if entry is None or entry['key'] != key:
+            parent_namespace = result[parent] if parent is not None else None
+            entry = {'key': key, 'namespace': _merge(parent_namespace, lockfile.get(path),
+                                                     os.path.dirname(path))}
+            fresh[path] = entry
+        result[path] = entry['namespace']
+    if fresh:
+        cache.merge(_CACHE_NAME, fresh)
+    return result
+
+
+def _merge(parent, data, directory):
+    if parent is None:
+        parent = {'variables': {}, 'commands': {}, 'scopes': {}}
+    variables = dict(parent['variables'])
+    variables.update(data['variables'])
+    namespace = dict(data)
+    namespace['variables'] = variables
+    namespace['scopes'] = dict(parent['scopes'])
+    namespace['scopes'][directory] = variables
+    environment = list(parent.get('environment', []))
+    environment.extend(os.path.join(directory, script) for script in data.get('environment', []))
+    namespace['environment'] = environment
+    namespace['environments'] = dict(parent.get('environments', {}))
+    namespace['environments'][directory] = environment
+    commands = dict(parent['commands'])
+
+    shadowed = {}
+    for name in data['commands']:
+        if name in commands:
+            qualified = _QUALIFIED_NAME.format(commands[name].get('directory', directory), name)
+            shadowed[name] = qualified
+            commands[qualified] = commands[name]
+    if shadowed:
+        for name, command in list(commands.items()):
+            if name not in data['commands']:
+                commands[name] = _rename_references(command, shadowed)
+
+    for name, command in data['commands'].items():
+        command = dict(command)
+        command['directory'] = directory
+        commands[name] = command
+    namespace['commands'] = commands
+    return namespace
+
+
+def _rename_references(command, renames):
+    command = dict(command)
+    if 'alias' in command:
+        command['alias'] = renames.get(command['alias'], command['alias'])
+    if 'dependencies' in command:
+        command['dependencies'] = [renames.get(name, name) for name in command['dependencies']]
+    return command
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the run history. Every executed command is recorded in a SQLite
+database (~/.p/history.db) with its project, duration, exit status and the fingerprint
+of its script and inputs. Only the latest runs of every command are kept, so the
+database stays small.
+
+The recorded durations are used to estimate how long a command will take, which lets
+the runner start the longest chain of the dependency graph first. The history is only
+an optimization: a database that cannot be opened or written is silently ignored.
+
+Concurrent p processes share the database. It is used in write-ahead log mode, so the
+readers estimating durations never wait for a process recording a run, and the writers
+wait for each other instead of failing.
+
+API:
+    record(project, command, duration, status, fingerprint)    Records a finished run.
+    get_estimates(project, commands)    Returns the estimated durations of commands.
+    get_runs(project, command)          Returns the recorded runs of a command.
+"""
+
+import contextlib
+import os
+import sqlite3
+import time
+
+from projects import config
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    project TEXT NOT NULL,
+    command TEXT NOT NULL,
+    duration REAL NOT NULL,
+    status INTEGER NOT NULL,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_command ON runs (project, command, id);
+'''
+
+# runs kept per command and runs averaged for an estimate
+_KEPT_RUNS = 50
+_ESTIMATE_RUNS = 5
+# seconds a writer waits for the other writers
+_BUSY_TIMEOUT = 10
+
+
+def record(project, command, duration, status, fingerprint=None):
+    """ Records a finished command run and drops the oldest runs of the command.
+
+    :param project: {str} project directory
+    :param command: {str} command name
+    :param duration: {float} run time in seconds
+    :param status: {int} exit status, 0 on success
+    :param fingerprint: {str} fingerprint of the script and the inputs
+    :return: None
+    """
+    try:
+        with _connect() as connection:
+            connection.execute('INSERT INTO runs (started, project, command, duration, status, fingerprint) '
+                               'VALUES (?, ?, ?, ?, ?, ?)',
+                               (time.time() - duration, project, command, duration, status, fingerprint))
+            connection.execute('DELETE FROM runs WHERE project = ? AND command = ? AND id NOT IN '
+                               '(SELECT id FROM runs WHERE project = ? AND command = ? ORDER BY id DESC LIMIT ?)',
+                               (project, command, project, command, _KEPT_RUNS))
+            connection.commit()
+    except sqlite3.Error:
+        pass
+
+
+def get_estimates(project, commands):
+    """ Estimated durations from the latest successful runs of the commands.
+
+    :param project: {str} project directory
+    :param commands: {list} command names
+    :return: {dict} command name to estimated seconds, only for commands with history
+    """
+    estimates = {}
+    try:
+        with _connect() as connection:
+            for command in commands:
+                rows = connection.execute('SELECT duration FROM runs WHERE project = ? AND command = ? '
+                                          'AND status = 0 ORDER BY id DESC LIMIT ?',
+                                          (project, command, _ESTIMATE_RUNS)).fetchall()
+                if rows:
+                    estimates[command] = sum(row[0] for row in rows) / len(rows)
+    except sqlite3.Error:
+        return {}
+    return estimates
+
+
+def get_runs(project, command):
+    """ Recorded runs of a command, the latest first.
+
+    :param project: {str} project directory
+    :param command: {str} command name
+    :return: {list} dicts with the 'started', 'duration', 'status' and 'fingerprint' keys
+    """
+    try:
+        with _connect() as connection:
+            rows = connection.execute('SELECT started, duration, status, fingerprint FROM runs '
+                                      'WHERE project = ? AND command = ? ORDER BY id DESC',
+                                      (project, command)).fetchall()
+    except sqlite3.Error:
+        return []
+    return [{'started': row[0], 'duration': row[1], 'status': row[2], 'fingerprint': row[3]} for row in rows]
+
+
+def _get_history_path():
+    return config.data_path('history.db')
+
+
+@contextlib.contextmanager
+def _connect():
+    path = _get_history_path()
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    connection = sqlite3.connect(path, timeout=_BUSY_TIMEOUT)
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(_SCHEMA)
+        yield connection
+    finally:
+        connection.close()
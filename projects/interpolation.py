@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the variable interpolation engine for the Projectfile variables.
+Variables can be referenced from command lines and from other variables with the
+{{name}} syntax:
+
+    host = example.com
+    deploy_url = 'https://{{host}}/deploy'
+    revision = `git rev-parse --short HEAD`
+
+    publish:
+      upload {{deploy_url}}/{{revision}}
+
+Values wrapped in backticks are shell-evaluated variables. They are evaluated lazily,
+only when referenced, and at most once per invocation.
+
+A variable name starts with a letter, a digit or an underscore, so the templates of
+other tools like docker ps --format '{{.Names}}' are left alone. Any other literal {{
+is written as \\{{ and the backslash is removed:
+
+    names:
+      kubectl get pods -o go-template='\\{{range .items}}\\{{.metadata.name}} \\{{end}}'
+
+Every line is compiled into a template only once. A template is a tuple where the even
+indexes hold literal text and the odd indexes hold variable names, so rendering is a
+single join without any pattern matching. Resolved values are memoized per resolver,
+references are resolved in dependency order and circular references are detected.
+
+API:
+    get_template(text)      Returns the compiled template of a line.
+    get_references(text)    Returns the variable names referenced by a line.
+    Resolver(variables, cwd)
+        .resolve(name)      Returns the value of a variable.
+        .render(text)       Returns the line with all references substituted.
+        .needs_shell(names) Checks whether resolving the variables runs a shell.
+
+Raises:
+    InterpolationError  in case of interpolation related problems:
+                            - undefined variable
+                            - circular variable reference
+                            - failing shell-evaluated variable
+"""
+
+import re
+import subprocess
+
+
+class InterpolationError(Exception):
+    pass
+
+
+_UNDEFINED_VARIABLE_ERROR = 'Undefined variable "{}"!'
+_CIRCULAR_REFERENCE_ERROR = 'Circular variable reference: {}!'
+_SHELL_VARIABLE_ERROR = 'Shell-evaluated variable "{}" failed with exit code {}.'
+
+_TOKEN = re.compile(r'\\(\{\{)|\{\{\s*(\w[\w\.-]*)\s*\}\}')
+
+_templates = {}
+
+
+def get_template(text):
+    """ Compiles a line into a template. Every distinct line is compiled only once.
+
+    :param text: {str} line with optional {{name}} references
+    :return: {tuple} literal text on even, variable names on odd indexes
+    """
+    template = _templates.get(text)
+    if template is None:
+        parts = ['']
+        position = 0
+        for match in _TOKEN.finditer(text):
+            parts[-1] += text[position:match.start()]
+            if match.group(1):
+                # escaped braces are kept as literal text
+                parts[-1] += match.group(1)
+            else:
+                parts.extend([match.group(2), ''])
+            position = match.end()
+        parts[-1] += text[position:]
+        template = tuple(parts)
+        _templates[text] = template
+    return template
+
+
+def get_references(text):
+    """ Names of the variables referenced directly by a line.
+
+    :param text: {str} line with optional {{name}} references
+    :return: {tuple} referenced variable names in order of appearance
+    """
+    return get_template(text)[1::2]
+
+
+class Resolver(object):
+    """ Resolves variable references for a single invocation. """
+
+    def __init__(self, variables, cwd=None):
+        """
+        :param variables: {dict} raw variable values of the parsed Projectfile
+        :param cwd: {str} working directory of the shell-evaluated variables
+        """
+        self._variables = variables
+        self._cwd = cwd
+        self._values = {}
+        self._resolving = []
+
+    def resolve(self, name):
+        """ Returns the memoized value of a variable, resolving it on first use.
+
+        Raises:
+            InterpolationError  on undefined, circular or failing variable
+        :param name: {str} variable name
+        :return: {str} resolved value
+        """
+        if name in self._values:
+            return self._values[name]
+        if name not in self._variables:
+            raise InterpolationError(_UNDEFINED_VARIABLE_ERROR.format(name))
+        if name in self._resolving:
+            chain = self._resolving[self._resolving.index(name):] + [name]
+            raise InterpolationError(_CIRCULAR_REFERENCE_ERROR.format(' -> '.join(chain)))
+        self._resolving.append(name)
+        try:
+            raw = self._variables[name]
+            if _is_shell_evaluated(raw):
+                value = self._evaluate(name, self.render(raw[1:-1]))
+            else:
+                value = self.render(raw)
+        finally:
+            self._resolving.pop()
+        self._values[name] = value
+        return value
+
+    def render(self, text):
+        """ Substitutes every variable reference in the line.
+
+        :param text: {str} line with optional {{name}} references
+        :return: {str} rendered line
+        """
+        template = get_template(text)
+        if len(template) == 1:
+            return template[0]
+        parts = list(template)
+        for index in range(1, len(parts), 2):
+            parts[index] = self.resolve(parts[index])
+        return ''.join(parts)
+
+    def needs_shell(self, names):
+        """ Checks whether resolving the variables would evaluate a shell-evaluated
+        variable that was not evaluated yet, without resolving anything.
+
+        :param names: {iterable} variable names
+        :return: {bool} True if a shell would be started
+        """
+        pending = list(names)
+        seen = set()
+        while pending:
+            name = pending.pop()
+            if name in seen or name in self._values or name not in self._variables:
+                continue
+            seen.add(name)
+            raw = self._variables[name]
+            if _is_shell_evaluated(raw):
+                return True
+            pending.extend(get_references(raw))
+        return False
+
+    def _evaluate(self, name, command):
+        process = subprocess.Popen(command, shell=True, cwd=self._cwd, stdout=subprocess.PIPE)
+        output = process.communicate()[0]
+        if process.returncode != 0:
+            raise InterpolationError(_SHELL_VARIABLE_ERROR.format(name, process.returncode))
+        return output.decode('utf-8').strip()
+
+
+def _is_shell_evaluated(raw):
+    return len(raw) > 1 and raw.startswith('`') and raw.endswith('`')
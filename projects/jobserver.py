@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains a GNU make compatible jobserver. A jobserver is a pipe holding one
+token less than the allowed number of parallel jobs, every process owns one implicit
+token on top of that. A job is started only after a token was taken from the pipe and
+the token is written back when the job finishes. Child processes find the pipe in the
+MAKEFLAGS environment variable, so make, ninja and nested p processes share the tokens
+and the parallelism of the whole process tree stays at the top level -j value.
+
+When p is started by make or another p, the inherited jobserver is used instead of
+creating a new one. Both the pipe (--jobserver-auth=R,W and the older
+--jobserver-fds=R,W) and the named pipe (--jobserver-auth=fifo:PATH) formats are
+understood. Inherited file descriptors are only used if they are really open, make
+closes them for commands that are not marked as recursive.
+
+API:
+    create(jobs)                Creates a jobserver for the given number of jobs.
+    inherit(environ)            Returns the jobserver of the environment or None.
+    Jobserver
+        .acquire(cancelled)     Takes a token, blocking until one is available.
+        .release(token)         Gives back a token.
+        .get_environment(environ)   Returns the environment of the child processes.
+        .get_fds()              Returns the file descriptors the children must inherit.
+        .close()                Closes the jobserver.
+"""
+
+import os
+import re
+import select
+import threading
+
+_TOKEN = b'+'
+_POLL_INTERVAL = 0.1
+
+_AUTH_PATTERN = re.compile(r'--jobserver-(?:auth|fds)=(?:fifo:(\S+)|(\d+),(\d+))')
+_JOBS_PATTERN = re.compile(r'(?:^|\s)-j(\d+)')
+_FLAGS_TO_REPLACE = re.compile(r'(?:^|\s)(?:-j\d*|--jobserver-(?:auth|fds)=\S+)(?=\s|$)')
+_MAKEFLAGS = 'MAKEFLAGS'
+
+
+def create(jobs):
+    """ Creates a new jobserver pipe filled with jobs - 1 tokens.
+
+    :param jobs: {int} number of jobs allowed to run in parallel
+    :return: {Jobserver}
+    """
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, _TOKEN * (jobs - 1))
+    return Jobserver(read_fd, write_fd, jobs, owned=True)
+
+
+def inherit(environ):
+    """ Jobserver passed down by a parent make or p process.
+
+    :param environ: {dict} environment of the current process
+    :return: {Jobserver} inherited jobserver, None if there is no usable one
+    """
+    makeflags = environ.get(_MAKEFLAGS, '')
+    match = _AUTH_PATTERN.search(makeflags)
+    if not match:
+        return None
+    jobs_match = _JOBS_PATTERN.search(makeflags)
+    jobs = int(jobs_match.group(1)) if jobs_match else (os.cpu_count() or 1)
+    if match.group(1):
+        try:
+            fd = os.open(match.group(1), os.O_RDWR)
+        except OSError:
+            return None
+        return Jobserver(fd, fd, jobs, owned=True, makeflags=makeflags)
+    read_fd, write_fd = int(match.group(2)), int(match.group(3))
+    try:
+        os.fstat(read_fd)
+        os.fstat(write_fd)
+    except OSError:
+        return None
+    return Jobserver(read_fd, write_fd, jobs, owned=False, makeflags=makeflags)
+
+
+class Jobserver(object):
+    """ Token pipe shared with the child processes. """
+
+    def __init__(self, read_fd, write_fd, jobs, owned, makeflags=None):
+        """
+        :param read_fd: {int} file descriptor the tokens are read from
+        :param write_fd: {int} file descriptor the tokens are written back to
+        :param jobs: {int} total number of parallel jobs
+        :param owned: {bool} the file descriptors are closed by close()
+        :param makeflags: {str} inherited MAKEFLAGS passed on unchanged
+        """
+        self.jobs = jobs
+        self._read_fd = read_fd
+        self._write_fd = write_fd
+        self._owned = owned
+        self._makeflags = makeflags
+        self._lock = threading.Lock()
+        self._implicit_free = True
+
+    def acquire(self, cancelled=None):
+        """ Takes the implicit token or a token from the pipe.
+
+        :param cancelled: {threading.Event} stops waiting for a token when set
+        :return: {bytes} token to be released, None if waiting was cancelled
+        """
+        with self._lock:
+            if self._implicit_free:
+                self._implicit_free = False
+                return b''
+        while cancelled is None or not cancelled.is_set():
+            readable, _, _ = select.select([self._read_fd], [], [], _POLL_INTERVAL)
+            if not readable:
+                continue
+            try:
+                token = os.read(self._read_fd, 1)
+            except BlockingIOError:
+                # make may set the pipe non-blocking, another process was faster
+                continue
+            if token:
+                return token
+        return None
+
+    def release(self, token):
+        """ Gives back a token taken by acquire().
+
+        :param token: {bytes} token returned by acquire()
+        :return: None
+        """
+        if token is None:
+            return
+        if token == b'':
+            with self._lock:
+                self._implicit_free = True
+            return
+        os.write(self._write_fd, token)
+
+    def get_environment(self, environ):
+        """ Environment of the child processes with the jobserver in MAKEFLAGS.
+
+        :param environ: {dict} environment of the current process
+        :return: {dict} new environment
+        """
+        environment = dict(environ)
+        if self._makeflags is not None:
+            environment[_MAKEFLAGS] = self._makeflags
+            return environment
+        flags = _FLAGS_TO_REPLACE.sub('', environ.get(_MAKEFLAGS, '')).strip()
+        environment[_MAKEFLAGS] = '{} -j{} --jobserver-auth={},{}'.format(
+            flags, self.jobs, self._read_fd, self._write_fd).strip()
+        return environment
+
+    def get_fds(self):
+        return tuple(sorted(set([self._read_fd, self._write_fd])))
+
+    def close(self):
+        if not self._owned:
+            return
+        for fd in set([self._read_fd, self._write_fd]):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._owned = False
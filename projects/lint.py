@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the batch Projectfile linter used by 'p lint'. The parser is CPU
+bound, so the Projectfiles are parsed in a pool of worker processes and the runtime
+scales with the number of cores.
+
+Checked problems:
+
+    syntax errors           every error the parser reports, with its line number
+    name collisions         a command or alias name defined twice in a Projectfile
+    undefined names         aliases and dependencies referring to unknown commands
+    cycles                  circular aliases and dependencies
+
+Nested Projectfiles are checked in their merged namespace (see hierarchy.py), so a
+dependency may refer to a command of a parent Projectfile. A semantic problem is only
+reported for the Projectfile introducing it, not for its nested Projectfiles.
+
+Every problem is a dictionary with the 'path', 'line' and 'error' keys. The line is
+None for the problems of the command graph.
+
+API:
+    discover(directories)   Returns the Projectfiles under the given directories.
+    lint(paths, jobs, report)   Returns the problems of the given Projectfiles.
+"""
+
+import os
+from concurrent import futures
+
+from projects import hierarchy
+from projects import projectfile
+
+_NAME_COLLISION_ERROR = 'Command name "{}" is already defined on line {}!'
+
+# files are sent to the workers in chunks to amortize the inter process communication
+_CHUNKS_PER_WORKER = 4
+
+
+def discover(directories):
+    """ Finds every Projectfile under the given directories.
+
+    :param directories: {list} directories to search recursively
+    :return: {list} sorted absolute Projectfile paths
+    """
+    result = set()
+    for directory in directories:
+        directory = os.path.abspath(directory)
+        result.update(projectfile._get_projectfile_list_for_project_root(directory))
+    return sorted(result)
+
+
+def lint(paths, jobs=None, report=None):
+    """ Lints Projectfiles in parallel.
+
+    :param paths: {list} Projectfile paths
+    :param jobs: {int} number of worker processes, the number of cores by default
+    :param report: {callable} called with every problem as soon as it is found
+    :return: {list} problems sorted by path and line
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    problems = []
+    parsed = {}
+
+    def collect(found):
+        for problem in found:
+            problems.append(problem)
+            if report is not None:
+                report(problem)
+
+    if len(paths) > 1:
+        jobs = jobs or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (jobs * _CHUNKS_PER_WORKER))
+        with futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            # the results are consumed while the remaining chunks are still parsed
+            for path, (data, file_problems) in zip(paths, executor.map(_lint_file, paths, chunksize=chunksize)):
+                collect(file_problems)
+                if data is not None:
+                    parsed[path] = data
+    else:
+        for path in paths:
+            data, file_problems = _lint_file(path)
+            collect(file_problems)
+            if data is not None:
+                parsed[path] = data
+    collect(_check_graphs(parsed))
+    problems.sort(key=lambda problem: (problem['path'], problem['line'] or 0, problem['error']))
+    return problems
+
+
+def _lint_file(path):
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().split('\n')
+    except (IOError, OSError) as e:
+        return None, [_problem(path, None, str(e))]
+    data = {}
+    state = projectfile._state_start
+    defined = {}
+    problems = []
+    for index, line in enumerate(lines):
+        previous = dict(data.get('commands', {}))
+        try:
+            state = state(data, line)
+        except SyntaxError as e:
+            return None, [_problem(path, index + 1, e.args[0])]
+        # a repeated name replaces the previously parsed command object
+        for name, command in data.get('commands', {}).items():
+            if name not in previous:
+                defined[name] = index + 1
+            elif previous[name] is not command:
+                problems.append(_problem(path, index + 1, _NAME_COLLISION_ERROR.format(name, defined[name])))
+    error = projectfile._check_final_state(state)
+    if error:
+        return None, [_problem(path, len(lines), error)]
+    return projectfile._finalize(data), problems
+
+
+def _check_graphs(parsed):
+    problems = []
+    directories = set(os.path.dirname(path) for path in parsed)
+    namespaces = {}
+    errors = {}
+    # parents have fewer path components, so they are merged before their children
+    for path in sorted(parsed, key=lambda path: path.count(os.sep)):
+        parent = hierarchy._find_parent(os.path.dirname(path), None, directories)
+        namespaces[path] = hierarchy._merge(namespaces.get(parent), parsed[path], os.path.dirname(path))
+        errors[path] = set(projectfile.validate(namespaces[path]))
+        for error in sorted(errors[path] - errors.get(parent, set())):
+            problems.append(_problem(path, None, error))
+    return problems
+
+
+def _problem(path, line, error):
+    return {'path': path, 'line': line, 'error': error}
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the precompiled Projectfile format. 'p compile' parses and validates
+a Projectfile and writes the result next to it as Projectfile.lock, so later runs load
+the command graph without running the parser.
+
+The lock file is a marshal dump of a tuple:
+
+    (magic, format version, python version, source mtime in ns, source size,
+     source sha256, data)
+
+A lock file is used only if it was written by the same lock format and python version
+and the source Projectfile still has the recorded content. If its modification time and
+size are unchanged that check costs a single stat call. Otherwise the source is hashed,
+so a fresh checkout or a copy of an unchanged Projectfile keeps its lock usable. If the
+hash differs as well the Projectfile is parsed as usual.
+
+API:
+    write(path, data)   Writes the lock file of a parsed Projectfile.
+    load(path)          Returns the locked data of a Projectfile or None if stale.
+    get(path)           Returns the locked data or parses the Projectfile.
+"""
+
+import hashlib
+import marshal
+import os
+import sys
+
+from projects import projectfile
+
+_LOCK_SUFFIX = '.lock'
+_MAGIC = 'p-lock'
+_FORMAT_VERSION = 2
+
+
+def write(path, data):
+    """ Writes the lock file of a Projectfile atomically.
+
+    :param path: {str} path of the source Projectfile
+    :param data: {dict} parsed and validated Projectfile
+    :return: {str} path of the lock file
+    """
+    st = os.stat(path)
+    digest = _get_digest(path)
+    lock_path = _get_lock_path(path)
+    temp_path = '{}.{}.tmp'.format(lock_path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        marshal.dump((_MAGIC, _FORMAT_VERSION, _python_version(), st.st_mtime_ns, st.st_size, digest, data), f)
+    os.rename(temp_path, lock_path)
+    return lock_path
+
+
+def load(path):
+    """ Loads the locked data of a Projectfile.
+
+    :param path: {str} path of the source Projectfile
+    :return: {dict} locked data, None if there is no usable lock file
+    """
+    try:
+        st = os.stat(path)
+        with open(_get_lock_path(path), 'rb') as f:
+            lock = marshal.load(f)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(lock, tuple) or len(lock) != 7:
+        return None
+    if lock[:3] != (_MAGIC, _FORMAT_VERSION, _python_version()):
+        return None
+    if lock[3:5] == (st.st_mtime_ns, st.st_size):
+        return lock[6]
+    if lock[4] != st.st_size:
+        return None
+    try:
+        if lock[5] != _get_digest(path):
+            return None
+    except (IOError, OSError):
+        return None
+    return lock[6]
+
+
+def get(path):
+    """ Locked data of a Projectfile, parsed from the source if the lock is unusable.
+
+    Raises:
+        ProjectfileError    on invalid syntax in the parsed source
+    :param path: {str} path of the Projectfile
+    :return: {dict} parsed Projectfile data
+    """
+    data = load(path)
+    if data is None:
+        data = projectfile.get(path)
+    return data
+
+
+def _get_lock_path(path):
+    return path + _LOCK_SUFFIX
+
+
+def _get_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def _python_version():
+    return tuple(sys.version_info[:2])
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the captured command output. The stdout and stderr of every command
+run are passed through to the terminal and written to a log of the run as well:
+
+    ~/.p/logs/<run>.log.gz      the output compressed while it is written
+    ~/.p/logs/<run>.idx         index of the gzip members of the log
+
+The output is compressed in chunks, every chunk is a separate gzip member. The
+concatenated members form a valid gzip file, so a log can be read with zcat as well.
+The index holds the uncompressed and compressed end offsets of every member, so the
+tail of a log is read by decompressing the last members only, independent of the size
+of the whole log. A chunk is written when it is full or when it is older than a
+second, a flusher thread writes the chunk of a command that went quiet as well, so the
+log of a running command can be followed.
+
+The capture is off by default (see the 'log-max-size' configuration key), because the
+output of a captured command goes through pipes: the commands do not see a terminal
+anymore and turn off colors, progress bars and interactive prompts.
+
+The runs are catalogued in the 'logs' cache (see cache.py) with their project, command,
+start time, exit status and sizes. Logs are rotated before every run: the runs older
+than the configured age are removed first, then the oldest runs until the logs fit in
+the configured total size. Unfinished runs are only removed by age.
+
+API:
+    create(project, command)        Starts the log of a run and returns it.
+    RunLog
+        .write(data)                Appends output to the log. Thread safe.
+        .close(status)              Finishes the log with the exit status of the run.
+    get_runs(project, command)      Returns the catalogued runs, the latest first.
+    find_run(name, project)         Returns the run with the given id or the latest run
+                                    of the given command.
+    tail(run, lines)                Returns the last lines of the output of a run.
+    read(run)                       Yields the whole output of a run in chunks.
+    rotate(max_age, max_size)       Removes the runs over the age and size limits.
+"""
+
+import binascii
+import gzip
+import os
+import struct
+import threading
+import time
+
+from projects import cache
+from projects import config
+
+_CACHE_NAME = 'logs'
+_LOG_SUFFIX = '.log.gz'
+_INDEX_SUFFIX = '.idx'
+# uncompressed and compressed end offset of a gzip member
+_INDEX_ENTRY = struct.Struct('<QQ')
+_CHUNK_SIZE = 256 * 1024
+_FLUSH_INTERVAL = 1.0
+_COMPRESS_LEVEL = 6
+_DAY = 24 * 60 * 60
+
+
+def create(project, command):
+    """ Starts the log of a command run.
+
+    :param project: {str} project directory
+    :param command: {str} command name
+    :return: {RunLog} log to write the output of the run to
+    """
+    directory = _get_logs_path()
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+    run = '{}-{}'.format(time.strftime('%Y%m%d-%H%M%S'), binascii.hexlify(os.urandom(3)).decode('ascii'))
+    cache.merge(_CACHE_NAME, {run: {'project': project, 'command': command, 'started': time.time(),
+                                    'status': None, 'size': 0, 'bytes': 0}})
+    return RunLog(run)
+
+
+class RunLog(object):
+    """ Compressed log of a single command run. """
+
+    def __init__(self, run):
+        """
+        :param run: {str} run id
+        """
+        self.run = run
+        self._log = open(_get_log_path(run), 'ab')
+        self._index = open(_get_index_path(run), 'ab')
+        self._lock = threading.Lock()
+        self._chunk = []
+        self._chunk_size = 0
+        self._chunk_started = None
+        self._bytes = 0
+        self._size = 0
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically)
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def write(self, data):
+        """ Appends output to the log.
+
+        :param data: {bytes} output of the command
+        :return: None
+        """
+        with self._lock:
+            if self._log.closed:
+                # output of a background process outliving the command
+                return
+            if self._chunk_started is None:
+                self._chunk_started = time.time()
+            self._chunk.append(data)
+            self._chunk_size += len(data)
+            if self._chunk_size >= _CHUNK_SIZE or time.time() - self._chunk_started >= _FLUSH_INTERVAL:
+                self._flush()
+
+    def close(self, status):
+        """ Writes the remaining output and records the exit status of the run.
+
+        :param status: {int} exit status, None if the run was cancelled
+        :return: None
+        """
+        self._closed.set()
+        self._flusher.join()
+        with self._lock:
+            self._flush()
+            self._log.close()
+            self._index.close()
+
+        def finish(runs):
+            if self.run not in runs:
+                # rotated away by a concurrent process
+                return None
+            runs[self.run].update({'status': status, 'size': self._size, 'bytes': self._bytes})
+            return runs
+
+        cache.update(_CACHE_NAME, finish)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(_FLUSH_INTERVAL):
+            with self._lock:
+                if self._chunk_started is not None and time.time() - self._chunk_started >= _FLUSH_INTERVAL:
+                    self._flush()
+
+    def _flush(self):
+        if not self._chunk:
+            return
+        member = gzip.compress(b''.join(self._chunk), _COMPRESS_LEVEL)
+        self._log.write(member)
+        self._log.flush()
+        self._bytes += self._chunk_size
+        self._size += len(member)
+        # the index entry is written after its member, readers never see a partial member
+        self._index.write(_INDEX_ENTRY.pack(self._bytes, self._size))
+        self._index.flush()
+        self._chunk = []
+        self._chunk_size = 0
+        self._chunk_started = None
+
+
+def get_runs(project=None, command=None):
+    """ Catalogued runs, optionally filtered by project and command.
+
+    :param project: {str} project directory, None for every project
+    :param command: {str} command name, None for every command
+    :return: {list} dicts with the 'run', 'project', 'command', 'started', 'status',
+                    'size' and 'bytes' keys, the latest first
+    """
+    runs = []
+    for run, entry in cache.load(_CACHE_NAME).items():
+        if project is not None and entry['project'] != project:
+            continue
+        if command is not None and entry['command'] != command:
+            continue
+        record = dict(entry)
+        record['run'] = run
+        runs.append(record)
+    runs.sort(key=lambda record: (record['started'], record['run']), reverse=True)
+    return runs
+
+
+def find_run(name, project=None):
+    """ Run with the given id, or the latest run of the given command.
+
+    :param name: {str} run id or command name
+    :param project: {str} project directory the command is looked up in
+    :return: {str} run id, None if there is no such run
+    """
+    if name in cache.load(_CACHE_NAME):
+        return name
+    runs = get_runs(project, name)
+    return runs[0]['run'] if runs else None
+
+
+def tail(run, lines=10):
+    """ Last lines of the output of a run, only the last gzip members are decompressed.
+
+    :param run: {str} run id
+    :param lines: {int} number of lines
+    :return: {bytes} the last lines
+    """
+    if lines <= 0:
+        return b''
+    offsets = [0] + [end for _, end in _read_index(run)]
+    output = b''
+    with open(_get_log_path(run), 'rb') as f:
+        for start, end in reversed(list(zip(offsets, offsets[1:]))):
+            f.seek(start)
+            output = gzip.decompress(f.read(end - start)) + output
+            # one more line than needed, the output may not end with a newline
+            if output.count(b'\n') > lines:
+                break
+    trailing = output.endswith(b'\n')
+    result = output.split(b'\n')
+    if trailing:
+        result = result[:-1]
+    return b'\n'.join(result[-lines:]) + (b'\n' if trailing else b'')
+
+
+def read(run):
+    """ Whole output of a run, decompressed member by member.
+
+    :param run: {str} run id
+    :return: {generator} output chunks as bytes
+    """
+    offsets = [0] + [end for _, end in _read_index(run)]
+    with open(_get_log_path(run), 'rb') as f:
+        for start, end in zip(offsets, offsets[1:]):
+            f.seek(start)
+            yield gzip.decompress(f.read(end - start))
+
+
+def rotate(max_age, max_size):
+    """ Removes the runs older than max_age and the oldest runs above max_size.
+
+    :param max_age: {float} maximum age of a run in days
+    :param max_size: {int} maximum total size of the compressed logs in bytes
+    :return: {list} ids of the removed runs
+    """
+    removed = []
+
+    def select(runs):
+        now = time.time()
+        for run, entry in list(runs.items()):
+            if now - entry['started'] > max_age * _DAY:
+                removed.append(run)
+                del runs[run]
+        total = sum(entry['size'] for entry in runs.values())
+        for run in sorted(runs, key=lambda run: runs[run]['started']):
+            if total <= max_size:
+                break
+            if runs[run]['status'] is None:
+                continue
+            total -= runs[run]['size']
+            removed.append(run)
+            del runs[run]
+        return runs if removed else None
+
+    cache.update(_CACHE_NAME, select)
+    for run in removed:
+        for path in (_get_log_path(run), _get_index_path(run)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return removed
+
+
+def _get_logs_path():
+    return config.data_path('logs')
+
+
+def _get_log_path(run):
+    return os.path.join(_get_logs_path(), run + _LOG_SUFFIX)
+
+
+def _get_index_path(run):
+    return os.path.join(_get_logs_path(), run + _INDEX_SUFFIX)
+
+
+def _read_index(run):
+    with open(_get_index_path(run), 'rb') as f:
+        data = f.read()
+    # a partially written entry of a running command is ignored
+    count = len(data) // _INDEX_ENTRY.size
+    return [_INDEX_ENTRY.unpack_from(data, i * _INDEX_ENTRY.size) for i in range(count)]
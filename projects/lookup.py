@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the Projectfile lookup. The Projectfile applying to a directory is
+the nearest one found by walking up from the directory, without leaving the project.
+
+Adding or removing a file changes the modification time of its directory, so the
+presence of a Projectfile in a directory is remembered together with the directory
+mtime in the 'projectfile-lookup' cache. Both positive and negative results are kept,
+and a cached directory costs a single stat call, so the lookup from deep inside a large
+project touches only the directories on the way up.
+
+API:
+    find_projectfile(path, project_root)    Returns the nearest Projectfile or None.
+"""
+
+import os
+
+from projects import cache
+from projects import projectfile
+
+_CACHE_NAME = 'projectfile-lookup'
+
+
+def find_projectfile(path, project_root):
+    """ Finds the nearest Projectfile, walking up from a directory to the project root.
+
+    :param path: {str} directory to start from
+    :param project_root: {str} directory of the project, the lookup stops there
+    :return: {str} path of the Projectfile, None if there is none up to the project root
+    """
+    cached = cache.load(_CACHE_NAME)
+    fresh = {}
+    directory = os.path.abspath(path)
+    project_root = os.path.abspath(project_root)
+    result = None
+    while True:
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            break
+        entry = cached.get(directory)
+        if entry is None or entry[0] != mtime:
+            entry = [mtime, os.path.isfile(os.path.join(directory, projectfile._PROJECTFILE))]
+            fresh[directory] = entry
+        if entry[1]:
+            result = os.path.join(directory, projectfile._PROJECTFILE)
+            break
+        parent = os.path.dirname(directory)
+        if directory == project_root or parent == directory:
+            break
+        directory = parent
+    if fresh:
+        cache.merge(_CACHE_NAME, fresh)
+    return result
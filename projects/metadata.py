@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the incremental project metadata scanner. It collects the disk usage,
+the file counts by extension and the most recent modification time of every project
+under the projects path.
+
+The directory trees are walked with os.scandir on a thread pool. The result of every
+directory is stored in the 'metadata' cache together with the modification time of the
+directory. A directory whose modification time did not change is not listed again, its
+cached file statistics are reused and only its known subdirectories are checked. Since a
+directory's modification time changes only when entries are added, removed or renamed,
+in-place modifications of existing files are picked up when their directory changes.
+
+The project list and the chooser (p without a project name) can be sorted and filtered
+by the metadata with the --sort, --reverse, --ext, --min-size and --active options.
+
+Project metadata format:
+
+    {
+        'size': 1234567,                disk usage in bytes
+        'files': {'.py': 12, '': 3},    file counts by lowercase extension
+        'latest': 1469913600.0          most recent modification time
+    }
+
+API:
+    scan(projects_path, jobs)       Returns the metadata of every project.
+    sort_projects(names, metadata, key, reverse)
+                                    Sorts project names by a metadata key.
+    filter_projects(names, metadata, extension, min_size, active_since)
+                                    Filters project names by metadata.
+"""
+
+import os
+from concurrent import futures
+
+from projects import cache
+from projects import paths
+
+_CACHE_NAME = 'metadata'
+_DEFAULT_JOBS = 8
+
+_SORT_KEYS = {
+    'name': lambda name, data: name.lower(),
+    'size': lambda name, data: data['size'],
+    'files': lambda name, data: sum(data['files'].values()),
+    'latest': lambda name, data: data['latest']
+}
+
+
+def scan(projects_path, jobs=_DEFAULT_JOBS):
+    """ Scans every project under the projects path, reusing unchanged directories.
+
+    :param projects_path: {str|list} projects path from the configuration
+    :param jobs: {int} number of scanner threads
+    :return: {dict} project name to project metadata
+    """
+    cached = cache.load(_CACHE_NAME)
+    nodes = {}
+    result = {}
+    projects = {}
+    for name, path in paths.list_projects(projects_path).items():
+        if not os.path.islink(path):
+            projects[path] = name
+            result[name] = {'size': 0, 'files': {}, 'latest': 0.0}
+
+    with futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = dict((executor.submit(_scan_directory, path, cached.get(path)), projects[path])
+                       for path in projects)
+        while pending:
+            done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                path, node = future.result()
+                if node is None:
+                    continue
+                nodes[path] = node
+                _add_node(result[name], node)
+                for child in node['dirs']:
+                    child_path = os.path.join(path, child)
+                    pending[executor.submit(_scan_directory, child_path, cached.get(child_path))] = name
+
+    if nodes != cached:
+        cache.dump(_CACHE_NAME, nodes)
+    return result
+
+
+def sort_projects(names, metadata, key='name', reverse=False):
+    """ Sorts project names by a metadata key.
+
+    :param names: {list} project names
+    :param metadata: {dict} result of scan()
+    :param key: {str} one of 'name', 'size', 'files', 'latest'
+    :param reverse: {bool} descending order
+    :return: {list} sorted project names, unscanned projects come last
+    """
+    sort_key = _SORT_KEYS[key]
+    known = [name for name in names if name in metadata]
+    unknown = [name for name in names if name not in metadata]
+    known.sort(key=lambda name: sort_key(name, metadata[name]), reverse=reverse)
+    return known + unknown
+
+
+def filter_projects(names, metadata, extension=None, min_size=None, active_since=None):
+    """ Filters project names by their metadata.
+
+    :param names: {list} project names
+    :param metadata: {dict} result of scan()
+    :param extension: {str} keep projects containing files with this extension
+    :param min_size: {int} keep projects at least this large in bytes
+    :param active_since: {float} keep projects modified after this timestamp
+    :return: {list} matching project names in the original order
+    """
+    result = []
+    for name in names:
+        data = metadata.get(name)
+        if data is None:
+            continue
+        if extension is not None and not data['files'].get(extension.lower()):
+            continue
+        if min_size is not None and data['size'] < min_size:
+            continue
+        if active_since is not None and data['latest'] < active_since:
+            continue
+        result.append(name)
+    return result
+
+
+def _scan_directory(path, cached_node):
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return path, None
+    if cached_node is not None and cached_node['mtime'] == mtime:
+        return path, cached_node
+    node = {'mtime': mtime, 'size': 0, 'files': {}, 'latest': mtime, 'dirs': []}
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return path, node
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                node['dirs'].append(entry.name)
+                continue
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        node['size'] += _get_disk_usage(st)
+        node['latest'] = max(node['latest'], st.st_mtime)
+        if entry.is_file(follow_symlinks=False):
+            extension = os.path.splitext(entry.name)[1].lower()
+            node['files'][extension] = node['files'].get(extension, 0) + 1
+    node['dirs'].sort()
+    return path, node
+
+
+def _get_disk_usage(st):
+    blocks = getattr(st, 'st_blocks', None)
+    if blocks is None:
+        return st.st_size
+    return blocks * 512
+
+
+def _add_node(project, node):
+    project['size'] += node['size']
+    project['latest'] = max(project['latest'], node['latest'])
+    for extension, count in node['files'].items():
+        project['files'][extension] = project['files'].get(extension, 0) + count
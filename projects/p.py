@@ -1,18 +1,506 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import sys
+import time
+
 from projects import paths
 from projects import config
+from projects import events
+from projects import plugins
+from projects import projectfile
+
+# The subsystems are imported by the subcommands using them, so the prompt and the
+# completion paths do not pay for asyncio, sqlite3 or the process pools.
+
+_MEGABYTE = 1024 * 1024
+# exit status of a process interrupted by SIGINT, as reported by the shells
+_INTERRUPTED_STATUS = 128 + 2
+_NO_PROJECTFILE_ERROR = 'No Projectfile found!'
+_LINT_FORMAT = '{path}:{line}: {error}'
+_LINT_GRAPH_FORMAT = '{path}: {error}'
+_INVALID_JOBS_ERROR = 'Invalid number of jobs!'
+_PLAN_USAGE_ERROR = 'Usage: p plan [--dot] <command>'
+_PLAN_STAGE_FORMAT = 'Stage {}'
+_PLAN_STEP_FORMAT = '  {} {:<{}}  {}'
+_PLAN_CRITICAL_PATH_FORMAT = 'Critical path: {} ({:.1f}s)'
+_NEW_USAGE_ERROR = 'Usage: p new [--template <template>] [--link] <name> [variable=value ...]'
+_LOGS_USAGE_ERROR = 'Usage: p logs [-n <lines> | --all] [<run> | <command>]'
+_UNKNOWN_RUN_ERROR = 'No log found for "{}"!'
+_LOGS_RUN_FORMAT = '{run}  {started}  {command:<{width}}  {status}'
+_LOGS_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+_LOGS_DEFAULT_LINES = 20
+_LIST_USAGE_ERROR = ('Usage: p [--sort name|size|files|latest] [--reverse] [--ext <extension>] '
+                     '[--min-size <megabytes>] [--active <days>]')
+_DAY = 24 * 60 * 60
+_PLUGIN_STATS_FORMAT = '{}  calls: {}  mean: {:.3f}s  max: {:.3f}s  timeouts: {}  errors: {}'
 
 
 def main(args):
+    # --json can be given anywhere, the output of every subcommand becomes an event stream
+    if '--json' in args:
+        args = [arg for arg in args if arg != '--json']
+        events.enable()
+    status = _main(args)
+    if events.enabled():
+        events.emit('result', {'status': status or 0})
+    return status
+
+
+def _main(args):
     try:
         conf = config.get()
-    except:
-        pass
+    except config.ConfigError as e:
+        _error(e.args[0])
+        return 1
+    try:
+        return _dispatch(conf, args)
+    except plugins.PluginError as e:
+        _error(e.args[0])
+        return 1
+
+
+def _error(message):
+    if events.enabled():
+        events.emit('error', {'message': str(message)})
+    else:
+        # stdout only carries results, like the path printed for cd "$(p ...)"
+        print(message, file=sys.stderr)
+
+
+def _dispatch(conf, args):
+    if args and args[0] in _SUBCOMMANDS:
+        return _SUBCOMMANDS[args[0]](conf, args[1:])
+    if args and args[0] in plugins.get_subcommands(conf):
+        return plugins.run_subcommand(conf, args[0], args[1:])
     if paths.inside_project(conf['projects-path']):
-        # print('Inside')
-        pass
+        if args:
+            return _run_command(conf, args[0], args[1:])
+    elif not args or args[0].startswith('--'):
+        return _choose_project(conf, args)
+    else:
+        return _enter_project(conf, args[0])
+
+
+def _find_projectfile(conf, directory):
+    from projects import lookup
+
+    resolved = paths.resolve(conf['projects-path'], directory)
+    if resolved is None or resolved[1] is None:
+        path = os.path.join(directory, projectfile._PROJECTFILE)
+        return None, path if os.path.isfile(path) else None
+    project_root = os.path.join(resolved[0], resolved[1])
+    return project_root, lookup.find_projectfile(directory, project_root)
+
+
+def _parse_jobs(args):
+    if args[:1] in (['-j'], ['--jobs']):
+        try:
+            jobs = int(args[1])
+        except (IndexError, ValueError):
+            return None
+        return jobs if jobs > 0 else None
+    return 1
+
+
+def _run_command(conf, name, args=()):
+    from projects import hierarchy
+    from projects import jobserver
+    from projects import logs
+    from projects import runner
+
+    jobs = _parse_jobs(list(args))
+    if jobs is None:
+        _error(_INVALID_JOBS_ERROR)
+        return 1
+    project_root, path = _find_projectfile(conf, os.getcwd())
+    if path is None:
+        _error(_NO_PROJECTFILE_ERROR)
+        return 1
+    # commands run in the directory of the Projectfile defining them
+    cwd = os.path.dirname(path)
+    try:
+        data = hierarchy.get_namespace(project_root, path)
+        cache_size = conf.get('cache-size', config._optional_config['cache-size']) * _MEGABYTE
+        log_size = conf.get('log-max-size', config._optional_config['log-max-size']) * _MEGABYTE
+        if log_size:
+            logs.rotate(conf.get('log-max-age', config._optional_config['log-max-age']), log_size)
+        plugins.call_hook(conf, 'run', cwd, name)
+        # a jobserver of a parent make or p process limits the parallelism instead of -j
+        tokens = jobserver.inherit(os.environ)
+        if tokens is None:
+            tokens = jobserver.create(jobs)
+        try:
+            runner.run(data, name, cwd, cache_size, tokens.jobs, tokens, project_root or cwd,
+                       events.emit if events.enabled() else None, log_size > 0)
+        except (runner.RunnerError, KeyboardInterrupt):
+            plugins.call_hook(conf, 'finish', cwd, name, False)
+            raise
+        finally:
+            tokens.close()
+        plugins.call_hook(conf, 'finish', cwd, name, True)
+    except (IOError, OSError) as e:
+        _error(e)
+        return 1
+    except projectfile.ProjectfileError as e:
+        _error('Projectfile line {line}: {error}'.format(**e.args[0]))
+        return 1
+    except runner.RunnerError as e:
+        _error(e.args[0])
+        return 1
+    except KeyboardInterrupt:
+        # the runner has stopped the process groups of the commands by now
+        return _INTERRUPTED_STATUS
+    return 0
+
+
+def _compile(conf, args):
+    from projects import hierarchy
+    from projects import lockfile
+
+    if args:
+        project_root, path = _find_projectfile(conf, os.path.abspath(args[0]))
+    else:
+        project_root, path = _find_projectfile(conf, os.getcwd())
+    if path is None:
+        _error(_NO_PROJECTFILE_ERROR)
+        return 1
+    try:
+        data = projectfile.get(path)
+        # dependencies may refer to the commands of the parent Projectfiles
+        namespace = hierarchy.get_namespace(project_root, path) if project_root else data
+    except (IOError, OSError) as e:
+        _error(e)
+        return 1
+    except projectfile.ProjectfileError as e:
+        _error('Projectfile line {line}: {error}'.format(**e.args[0]))
+        return 1
+    errors = projectfile.validate(namespace)
+    for error in errors:
+        _error(error)
+    if errors:
+        return 1
+    lock_path = lockfile.write(path, data)
+    if events.enabled():
+        events.emit('lockfile', {'path': lock_path})
+    else:
+        print(lock_path)
+    return 0
+
+
+def _plan(conf, args):
+    from projects import hierarchy
+    from projects import lockfile
+    from projects import plan
+    from projects import runner
+
+    args = list(args)
+    as_dot = '--dot' in args
+    names = [arg for arg in args if arg != '--dot']
+    if len(names) != 1:
+        _error(_PLAN_USAGE_ERROR)
+        return 1
+    project_root, path = _find_projectfile(conf, os.getcwd())
+    if path is None:
+        _error(_NO_PROJECTFILE_ERROR)
+        return 1
+    cwd = os.path.dirname(path)
+    try:
+        # outside of the projects there is no hierarchy to merge
+        data = hierarchy.get_namespace(project_root, path) if project_root else lockfile.get(path)
+        result = plan.get_plan(data, names[0], cwd, project_root or cwd)
+    except (IOError, OSError) as e:
+        _error(e)
+        return 1
+    except projectfile.ProjectfileError as e:
+        _error('Projectfile line {line}: {error}'.format(**e.args[0]))
+        return 1
+    except runner.RunnerError as e:
+        _error(e.args[0])
+        return 1
+    if events.enabled():
+        for step in result['steps']:
+            events.emit('step', step)
+        events.emit('plan', {'stages': result['stages'], 'critical-path': result['critical-path'],
+                             'duration': result['duration']})
+        return 0
+    if as_dot:
+        print(plan.get_dot(result))
+        return 0
+    width = max(len(step['name']) for step in result['steps'])
+    steps = dict((step['name'], step) for step in result['steps'])
+    for index, stage in enumerate(result['stages']):
+        print(_PLAN_STAGE_FORMAT.format(index + 1))
+        for name in stage:
+            step = steps[name]
+            print(_PLAN_STEP_FORMAT.format('*' if step['critical'] else ' ', name, width, plan.format_state(step)))
+    print(_PLAN_CRITICAL_PATH_FORMAT.format(' -> '.join(result['critical-path']), result['duration']))
+    return 0
+
+
+def _new(conf, args):
+    from projects import scaffold
+
+    template = scaffold._DEFAULT_TEMPLATE
+    hardlink = False
+    names = []
+    variables = {}
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in ('-t', '--template'):
+            if not args:
+                _error(_NEW_USAGE_ERROR)
+                return 1
+            template = args.pop(0)
+        elif arg == '--link':
+            hardlink = True
+        elif '=' in arg:
+            key, value = arg.split('=', 1)
+            variables[key.strip()] = value.strip()
+        else:
+            names.append(arg)
+    if len(names) != 1:
+        _error(_NEW_USAGE_ERROR)
+        return 1
+    try:
+        path = scaffold.create(conf, names[0], template, variables, hardlink)
+    except scaffold.ScaffoldError as e:
+        _error(e.args[0])
+        return 1
+    except (IOError, OSError) as e:
+        _error(e)
+        return 1
+    _print_project(names[0], path)
+    return 0
+
+
+def _logs(conf, args):
+    from projects import logs
+
+    lines = _LOGS_DEFAULT_LINES
+    names = []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg == '-n':
+            try:
+                lines = int(args.pop(0))
+            except (IndexError, ValueError):
+                _error(_LOGS_USAGE_ERROR)
+                return 1
+        elif arg == '--all':
+            lines = None
+        else:
+            names.append(arg)
+    if len(names) > 1:
+        _error(_LOGS_USAGE_ERROR)
+        return 1
+    # inside a project the runs of the project are looked up, elsewhere every run
+    project_root, path = _find_projectfile(conf, os.getcwd())
+    project = project_root or (os.path.dirname(path) if path else None)
+    if not names:
+        runs = logs.get_runs(project)
+        width = max([len(run['command']) for run in runs] or [0])
+        for run in runs:
+            if events.enabled():
+                events.emit('run', run)
+                continue
+            started = time.strftime(_LOGS_TIME_FORMAT, time.localtime(run['started']))
+            status = 'running' if run['status'] is None else run['status']
+            print(_LOGS_RUN_FORMAT.format(run=run['run'], started=started, command=run['command'], width=width,
+                                          status=status))
+        return 0
+    run = logs.find_run(names[0], project)
+    if run is None:
+        _error(_UNKNOWN_RUN_ERROR.format(names[0]))
+        return 1
+    try:
+        # the whole log is streamed member by member, only the tail is read at once
+        chunks = logs.read(run) if lines is None else [logs.tail(run, lines)]
+        if events.enabled():
+            events.emit('log', {'run': run, 'output': b''.join(chunks).decode('utf-8', 'replace')})
+            return 0
+        stream = getattr(sys.stdout, 'buffer', sys.stdout)
+        for chunk in chunks:
+            stream.write(chunk)
+        stream.flush()
+    except (IOError, OSError) as e:
+        _error(e)
+        return 1
+    return 0
+
+
+def _parse_list_options(args):
+    options = {'sort': None, 'reverse': False, 'extension': None, 'min_size': None, 'active_since': None}
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg == '--reverse':
+            options['reverse'] = True
+            continue
+        if arg not in ('--sort', '--ext', '--min-size', '--active') or not args:
+            return None
+        value = args.pop(0)
+        try:
+            if arg == '--sort':
+                if value not in ('name', 'size', 'files', 'latest'):
+                    return None
+                options['sort'] = value
+            elif arg == '--ext':
+                options['extension'] = value if value.startswith('.') else '.' + value
+            elif arg == '--min-size':
+                options['min_size'] = float(value) * _MEGABYTE
+            else:
+                options['active_since'] = time.time() - float(value) * _DAY
+        except ValueError:
+            return None
+    return options
+
+
+def _choose_project(conf, args=()):
+    from projects import chooser
+
+    options = _parse_list_options(args)
+    if options is None:
+        _error(_LIST_USAGE_ERROR)
+        return 1
+    projects = paths.list_projects(conf['projects-path'])
+    names = sorted(projects)
+    if args:
+        from projects import metadata
+
+        # the metadata is only scanned if it is used, the plain list stays instant
+        data = metadata.scan(conf['projects-path'])
+        if any(options[key] is not None for key in ('extension', 'min_size', 'active_since')):
+            names = metadata.filter_projects(names, data, options['extension'], options['min_size'],
+                                             options['active_since'])
+        if options['sort'] is not None or options['reverse']:
+            names = metadata.sort_projects(names, data, options['sort'] or 'name', options['reverse'])
+    plugins.call_hook(conf, 'list', conf['projects-path'], names)
+    if events.enabled():
+        for name in names:
+            events.emit('project', {'name': name, 'path': projects[name]})
+        return 0
+    if not sys.stdin.isatty():
+        for name in names:
+            print(name)
+        return 0
+    name = chooser.choose(names, conf)
+    if name is None:
+        return 1
+    print(projects[name])
+    return 0
+
+
+def _enter_project(conf, name):
+    path = paths.list_projects(conf['projects-path']).get(name)
+    if path is None:
+        _error('Unknown project "{}"!'.format(name))
+        return 1
+    _print_project(name, path)
+    return 0
+
+
+def _print_project(name, path):
+    if events.enabled():
+        events.emit('project', {'name': name, 'path': path})
+    else:
+        print(path)
+
+
+def _completion(conf, args):
+    from projects import completion
+
+    try:
+        print(completion.get_script(args[0] if args else 'bash'))
+    except completion.CompletionError as e:
+        _error(e.args[0])
+        return 1
+    return 0
+
+
+def _complete_refresh(conf, args):
+    from projects import completion
+
+    subcommands = list(_SUBCOMMANDS) + list(plugins.get_subcommands(conf))
+    completion.generate(conf, subcommands, os.getcwd())
+    return 0
+
+
+def _lint(conf, args):
+    from projects import lint
+
+    jobs = None
+    targets = []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in ('-j', '--jobs'):
+            try:
+                jobs = int(args.pop(0))
+            except (IndexError, ValueError):
+                _error(_INVALID_JOBS_ERROR)
+                return 1
+        else:
+            targets.append(arg)
+    files = [target for target in targets if os.path.isfile(target)]
+    directories = [target for target in targets if not os.path.isfile(target)]
+    if not targets:
+        directories = sorted(paths.list_projects(conf['projects-path']).values())
+    if events.enabled():
+        discovered = files + lint.discover(directories)
+        for path in discovered:
+            events.emit('projectfile', {'path': os.path.abspath(path)})
+        problems = lint.lint(discovered, jobs, lambda problem: events.emit('problem', problem))
     else:
-        # print('Outside')
-        pass
+        problems = lint.lint(files + lint.discover(directories), jobs)
+        for problem in problems:
+            print((_LINT_FORMAT if problem['line'] else _LINT_GRAPH_FORMAT).format(**problem))
+    return 1 if problems else 0
+
+
+def _status(conf, args):
+    from projects import gitstatus
+
+    def report(status):
+        name = os.path.basename(status['path'])
+        if events.enabled():
+            record = dict(status)
+            record['name'] = name
+            events.emit('status', record)
+            return
+        print(gitstatus.format_status(name, status))
+        sys.stdout.flush()
+
+    repositories = gitstatus.get_repositories(conf['projects-path'])
+    statuses = gitstatus.stream(repositories, report)
+    return 1 if any(status['error'] for status in statuses) else 0
+
+
+def _plugin_stats(conf, args):
+    statistics = plugins.get_statistics()
+    rows = sorted(statistics.items(), key=lambda item: item[1]['total'] / max(item[1]['calls'], 1), reverse=True)
+    for key, entry in rows:
+        if events.enabled():
+            record = dict(entry)
+            record['hook'] = key
+            events.emit('plugin-stats', record)
+            continue
+        print(_PLUGIN_STATS_FORMAT.format(key, entry['calls'], entry['total'] / max(entry['calls'], 1),
+                                          entry['max'], entry['timeouts'], entry['errors']))
+    return 0
+
+
+_SUBCOMMANDS = {
+    'compile': _compile,
+    'completion': _completion,
+    'complete-refresh': _complete_refresh,
+    'lint': _lint,
+    'logs': _logs,
+    'new': _new,
+    'plan': _plan,
+    'plugin-stats': _plugin_stats,
+    'status': _status
+}
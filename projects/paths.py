@@ -1,15 +1,142 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+"""
+This file contains the project path resolution. The 'projects-path' configuration key
+holds a single projects root or a list of roots. Every direct subdirectory of a root is
+a project.
+
+A path is resolved to its root, project and subdirectory through a trie of the real
+root paths. The trie is built once per invocation and a lookup walks the path components
+once, so the cost depends only on the depth of the path. Matching is done on whole path
+components, so ~/projects2 is not mistaken for a directory inside ~/projects, and roots
+given through symlinks match the physical paths returned by os.getcwd().
+
+API:
+    get_roots(projects_path)            Returns the real paths of the projects roots.
+    resolve(projects_path, path)        Returns the (root, project, subpath) of a path.
+    inside_project(projects_path)       Tells whether the current directory is in a project.
+    list_projects(projects_path)        Returns the projects of every root.
+    list_dir_for_path(path)             Lists a directory.
+"""
+
 import os
 
+# path components are never empty, so the value of a node is stored under the None key
+_VALUE = None
+
+_tries = {}
+
+
+class PathTrie(object):
+    """ Trie of normalized absolute paths keyed by path components. """
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, path, value):
+        """ Stores a value for a path. Nested paths are allowed.
+
+        :param path: {str} normalized absolute path
+        :param value: value returned by lookup() for the path and its descendants
+        :return: None
+        """
+        node = self._root
+        for part in _split(path):
+            node = node.setdefault(part, {})
+        node[_VALUE] = value
+
+    def lookup(self, path):
+        """ Finds the deepest inserted path containing the path.
+
+        :param path: {str} normalized absolute path
+        :return: {tuple} (value, list of the remaining components) or None
+        """
+        node = self._root
+        parts = _split(path)
+        match = None
+        if _VALUE in node:
+            match = node[_VALUE], 0
+        for depth, part in enumerate(parts):
+            node = node.get(part)
+            if node is None:
+                break
+            if _VALUE in node:
+                match = node[_VALUE], depth + 1
+        if match is None:
+            return None
+        return match[0], parts[match[1]:]
+
+
+def get_roots(projects_path):
+    """ Real paths of the configured projects roots.
+
+    :param projects_path: {str|list} projects path from the configuration
+    :return: {list} absolute real paths in configuration order
+    """
+    if not isinstance(projects_path, list):
+        projects_path = [projects_path]
+    return [os.path.realpath(os.path.expanduser(path)) for path in projects_path]
+
+
+def resolve(projects_path, path=None):
+    """ Resolves a path to its projects root, project and subdirectory.
+
+    :param projects_path: {str|list} projects path from the configuration
+    :param path: {str} path to resolve, the current directory by default
+    :return: {tuple} (root, project, subpath), project is None for the root itself and
+             subpath is '' for the project directory. None outside of every root.
+    """
+    path = os.getcwd() if path is None else os.path.realpath(path)
+    match = _get_trie(projects_path).lookup(path)
+    if match is None:
+        return None
+    root, rest = match
+    if not rest:
+        return root, None, ''
+    return root, rest[0], os.path.join(*rest[1:]) if len(rest) > 1 else ''
+
+
+def inside_project(projects_path):
+    """ Tells whether the current directory is a project or is inside of one.
+
+    :param projects_path: {str|list} projects path from the configuration
+    :return: {bool}
+    """
+    resolved = resolve(projects_path)
+    return resolved is not None and resolved[1] is not None
+
+
+def list_projects(projects_path):
+    """ Projects of every root. A name shadows the same name in the later roots.
+
+    :param projects_path: {str|list} projects path from the configuration
+    :return: {dict} project name to project path
+    """
+    result = {}
+    for root in get_roots(projects_path):
+        if not os.path.isdir(root):
+            continue
+        for name in list_dir_for_path(root):
+            path = os.path.join(root, name)
+            if name not in result and os.path.isdir(path):
+                result[name] = path
+    return result
+
+
 def list_dir_for_path(path):
     return os.listdir(os.path.expanduser(path))
 
 
-def inside_project(projects_path):
-    current_path = os.getcwd()
-    if projects_path == current_path:
-        return False
-    else:
-        return current_path.startswith(projects_path)
\ No newline at end of file
+def _get_trie(projects_path):
+    key = tuple(projects_path) if isinstance(projects_path, list) else projects_path
+    if key not in _tries:
+        trie = PathTrie()
+        for root in get_roots(projects_path):
+            trie.insert(root, root)
+        _tries[key] = trie
+    return _tries[key]
+
+
+def _split(path):
+    return [part for part in os.path.normpath(path).split(os.sep) if part]
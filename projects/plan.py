@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the dry run of a command used by 'p plan'. The plan resolves the
+aliases and dependencies of a command exactly like the runner does (see runner.py),
+but nothing is executed and nothing is restored.
+
+Every step of the plan has a stage: the steps of a stage only depend on the steps of
+the earlier stages, so a stage can run in parallel once the previous ones finished.
+A step with declared outputs is up to date if the artifact cache (see cas.py) holds
+its outputs for the current inputs, the runner would restore it instead of running it.
+The cache key depends on the rendered command lines, so it is not computed for a step
+referring to shell-evaluated variables: the cache state of such a step is unknown and
+it is planned as if it would run. A step depending on a step that will run may still be
+rebuilt if its inputs change during the run.
+
+The duration of a step is estimated from the run history (see history.py). Steps
+without history get the average of the known steps and up to date steps are counted
+as instant. The critical path is the chain of dependent steps with the longest
+estimated duration, it is the lower bound of the run time with any number of jobs.
+
+API:
+    get_plan(data, name, cwd, project)  Returns the execution plan of a command.
+    get_dot(plan)                       Returns the plan as a Graphviz DOT graph.
+    format_estimate(step)               Returns the estimated duration of a step.
+    format_state(step)                  Returns the cache state or estimate of a step.
+
+Raises:
+    RunnerError     in case of an unknown command, a circular dependency or an
+                    undefined variable of a step with outputs
+"""
+
+from projects import cas
+from projects import history
+from projects import runner
+
+_DOT_HEADER = 'digraph plan {'
+_DOT_NODE = '  "{}" [label="{}\\n{}"{}];'
+_DOT_EDGE = '  "{}" -> "{}"{};'
+_DOT_CRITICAL = 'color=red, penwidth=2'
+_DOT_SKIPPED = 'style=dashed'
+
+
+def get_plan(data, name, cwd, project=None):
+    """ Execution plan of a command without executing anything.
+
+    Raises:
+        RunnerError     on unknown command, circular dependency or undefined variable
+    :param data: {dict} parsed Projectfile
+    :param name: {str} command name or alias to plan
+    :param cwd: {str} directory of the commands without their own directory
+    :param project: {str} project the durations are estimated for from the history
+    :return: {dict} plan with the 'steps', 'stages', 'critical-path' and 'duration' keys,
+                    every step is a dict with the 'name', 'stage', 'dependencies',
+                    'estimate', 'history', 'skipped', 'unknown' and 'critical' keys
+    """
+    order = runner._get_execution_order(data, name)
+    dependencies = runner._get_dependencies(data, order)
+    known = history.get_estimates(project, order) if project is not None else {}
+    default = sum(known.values()) / len(known) if known else 0.0
+    resolvers = {}
+    steps = []
+    stages = {}
+    estimates = {}
+    for command_name in order:
+        key, unknown = _get_key(data, command_name, cwd, resolvers)
+        skipped = key is not None and cas.contains(key)
+        stages[command_name] = max([stages[d] + 1 for d in dependencies[command_name]] or [0])
+        estimates[command_name] = 0.0 if skipped else known.get(command_name, default)
+        steps.append({
+            'name': command_name,
+            'stage': stages[command_name],
+            'dependencies': sorted(dependencies[command_name]),
+            'estimate': estimates[command_name],
+            'history': command_name in known,
+            'skipped': skipped,
+            'unknown': unknown
+        })
+    path = _get_critical_path(order, dependencies, estimates)
+    for step in steps:
+        step['critical'] = step['name'] in path
+    stage_list = [[] for _ in range(max(stages.values()) + 1)]
+    for command_name in order:
+        stage_list[stages[command_name]].append(command_name)
+    return {
+        'steps': steps,
+        'stages': stage_list,
+        'critical-path': path,
+        'duration': sum(estimates[command_name] for command_name in path)
+    }
+
+
+def get_dot(plan):
+    """ Graphviz DOT representation of a plan, the critical path is highlighted.
+
+    :param plan: {dict} plan returned by get_plan()
+    :return: {str} DOT source
+    """
+    critical = set(zip(plan['critical-path'], plan['critical-path'][1:]))
+    lines = [_DOT_HEADER, '  rankdir=LR;']
+    for step in plan['steps']:
+        attributes = []
+        if step['critical']:
+            attributes.append(_DOT_CRITICAL)
+        if step['skipped']:
+            attributes.append(_DOT_SKIPPED)
+        lines.append(_DOT_NODE.format(step['name'], step['name'], format_state(step),
+                                      ', ' + ', '.join(attributes) if attributes else ''))
+    for step in plan['steps']:
+        for dependency in step['dependencies']:
+            on_path = (dependency, step['name']) in critical
+            lines.append(_DOT_EDGE.format(dependency, step['name'], ' [' + _DOT_CRITICAL + ']' if on_path else ''))
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def format_estimate(step):
+    """ Human readable estimate of a step, marked with ~ if it has no history.
+
+    :param step: {dict} step of a plan
+    :return: {str} formatted duration
+    """
+    return '{}{:.1f}s'.format('' if step['history'] else '~', step['estimate'])
+
+
+def format_state(step):
+    """ Human readable cache state of a step, or its estimate if it would run.
+
+    :param step: {dict} step of a plan
+    :return: {str} formatted state
+    """
+    if step['skipped']:
+        return 'up to date'
+    if step['unknown']:
+        return '{}, cache unknown'.format(format_estimate(step))
+    return format_estimate(step)
+
+
+def _get_key(data, name, cwd, resolvers):
+    # only the steps with outputs have a key, and rendering them must not start a shell
+    command = data['commands'][name]
+    if not command.get('outputs'):
+        return None, False
+    resolver = runner._get_resolver(data, command.get('directory', cwd), resolvers)
+    if resolver.needs_shell(runner._get_references(command)):
+        return None, True
+    return runner._get_key(data, name, cwd, resolvers)[1], False
+
+
+def _get_critical_path(order, dependencies, estimates):
+    # the priority of a step is the longest estimated chain starting with it
+    priorities = runner._get_priorities(order, dependencies, estimates)
+    dependents = dict((name, [n for n in order if name in dependencies[n]]) for name in order)
+    roots = [name for name in order if not dependencies[name]]
+    # max() keeps the first of equal priorities, so the declaration order breaks ties
+    current = max(roots, key=lambda name: priorities[name])
+    path = [current]
+    while dependents[current]:
+        current = max(dependents[current], key=lambda name: priorities[name])
+        path.append(current)
+    return path
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the plugin loader. Plugins are python files in the ~/.p/plugins
+directory and they are enabled by listing their names in the 'plugins' configuration key:
+
+    ~/.prc                  {"projects-path": "~/projects", "plugins": ["deploy"]}
+    ~/.p/plugins/deploy.py
+
+A plugin provides subcommands and hooks with plain module level functions:
+
+    def command_upload(conf, args):     provides the 'p upload' subcommand
+    def on_run(cwd, command):           hook called before a command is run
+
+Hooks:
+    on_list(projects_path, names)       the project list is displayed
+    on_run(cwd, command)                a Projectfile command is about to run
+    on_finish(cwd, command, success)    a Projectfile command has finished
+
+The provided subcommands and hooks are read from the plugin sources without importing
+them and are stored in a manifest in the 'plugins' cache. The manifest entry of a plugin
+is only rebuilt when the plugin file changes. A plugin module is imported only when one
+of its subcommands or hooks is actually invoked.
+
+Hooks are executed in a reusable pool of worker processes, so the hooks of different
+plugins run concurrently and a hung plugin cannot stall p. Every hook has a deadline
+(the 'hook-timeout' configuration key). A hook that overruns its deadline or raises an
+exception is skipped with a warning, and the workers are replaced after a timeout. Hook
+arguments and return values therefore have to be picklable. The latency of every hook
+call is recorded in the 'plugin-stats' cache to help identifying slow plugins.
+
+API:
+    get_manifest(conf)              Returns the manifest of the enabled plugins.
+    get_subcommands(conf)           Returns the plugin subcommands.
+    run_subcommand(conf, name, args)    Runs a plugin subcommand.
+    call_hook(conf, hook, *args)    Calls a hook of every plugin providing it.
+    get_statistics()                Returns the recorded hook latency statistics.
+
+Raises:
+    PluginError     in case of plugin related problems:
+                        - missing plugin file
+                        - plugin with invalid syntax
+                        - plugin failing to import
+"""
+
+import ast
+import os
+import sys
+import time
+
+from projects import cache
+from projects import config
+
+try:
+    from importlib import util as importlib_util
+except ImportError:
+    importlib_util = None
+
+
+class PluginError(Exception):
+    pass
+
+
+_MISSING_PLUGIN_ERROR = 'Plugin "{}" cannot be found in {}.'
+_PLUGIN_SYNTAX_ERROR = 'Plugin "{}" has invalid syntax: {}'
+_PLUGIN_IMPORT_ERROR = 'Plugin "{}" cannot be loaded: {}'
+_HOOK_TIMEOUT_WARNING = 'Warning: hook "{}" of plugin "{}" exceeded its {}s deadline and was skipped.'
+_HOOK_FAILED_WARNING = 'Warning: hook "{}" of plugin "{}" failed and was skipped: {}'
+
+_CACHE_NAME = 'plugins'
+_STATISTICS_CACHE_NAME = 'plugin-stats'
+_COMMAND_PREFIX = 'command_'
+_HOOK_PREFIX = 'on_'
+_MIN_WORKERS = 4
+
+_modules = {}
+_pool = None
+
+
+def get_manifest(conf):
+    """ Manifest of the enabled plugins, rebuilt only for changed plugin files.
+
+    Raises:
+        PluginError     on missing plugin or invalid plugin syntax
+    :param conf: {dict} loaded configuration
+    :return: {dict} plugin name to {'path', 'subcommands', 'hooks'}
+    """
+    if not conf.get('plugins'):
+        return {}
+    cached = cache.load(_CACHE_NAME)
+    manifest = {}
+    for name in conf['plugins']:
+        path = _get_plugin_path(name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            raise PluginError(_MISSING_PLUGIN_ERROR.format(name, _get_plugins_path()))
+        key = [st.st_mtime, st.st_size]
+        entry = cached.get(name)
+        if entry is None or entry['path'] != path or entry['key'] != key:
+            entry = _scan(name, path)
+            entry['key'] = key
+        manifest[name] = entry
+    if manifest != cached:
+        cache.dump(_CACHE_NAME, manifest)
+    return manifest
+
+
+def get_subcommands(conf):
+    """ Subcommands provided by the enabled plugins.
+
+    :param conf: {dict} loaded configuration
+    :return: {dict} subcommand name to plugin name
+    """
+    result = {}
+    for name, entry in sorted(get_manifest(conf).items()):
+        for subcommand in entry['subcommands']:
+            result.setdefault(subcommand, name)
+    return result
+
+
+def run_subcommand(conf, subcommand, args):
+    """ Imports the providing plugin and runs the subcommand.
+
+    Raises:
+        PluginError     if the plugin cannot be loaded
+        KeyError        if no plugin provides the subcommand
+    :param conf: {dict} loaded configuration
+    :param subcommand: {str} subcommand name
+    :param args: {list} remaining command line arguments
+    :return: return value of the plugin function
+    """
+    name = get_subcommands(conf)[subcommand]
+    entry = get_manifest(conf)[name]
+    function = getattr(_import(name, entry['path']), _COMMAND_PREFIX + subcommand.replace('-', '_'))
+    return function(conf, args)
+
+
+def call_hook(conf, hook, *args):
+    """ Calls a hook of every enabled plugin that provides it in the worker pool.
+
+    Plugins without the hook are not imported and no worker is started if no plugin
+    provides the hook. Skipped hooks are missing from the result.
+
+    :param conf: {dict} loaded configuration
+    :param hook: {str} hook name without the 'on_' prefix, for example 'run'
+    :param args: picklable arguments passed to the hook functions
+    :return: {dict} plugin name to hook return value
+    """
+    providers = [(name, entry) for name, entry in sorted(get_manifest(conf).items())
+                 if hook in entry['hooks']]
+    if not providers:
+        return {}
+    # imported only when a hook runs, so p without hooks does not pay for them
+    from concurrent import futures
+
+    timeout = conf.get('hook-timeout', config._optional_config['hook-timeout'])
+    pool = _get_pool(len(providers))
+    deadline = time.time() + timeout
+    pending = [(name, pool.submit(_run_hook, name, entry['path'], hook, args)) for name, entry in providers]
+
+    results = {}
+    records = []
+    timed_out = False
+    for name, future in pending:
+        try:
+            result, elapsed = future.result(timeout=max(0.0, deadline - time.time()))
+        except futures.TimeoutError:
+            _warn(_HOOK_TIMEOUT_WARNING.format(hook, name, timeout))
+            records.append((name, hook, timeout, 'timeouts'))
+            timed_out = True
+            continue
+        except Exception as e:
+            _warn(_HOOK_FAILED_WARNING.format(hook, name, e))
+            records.append((name, hook, 0.0, 'errors'))
+            continue
+        results[name] = result
+        records.append((name, hook, elapsed, None))
+    if timed_out:
+        _reset_pool()
+
+    # the statistics of concurrently running p processes are added up
+    def add(statistics):
+        for record in records:
+            _record(statistics, *record)
+        return statistics
+
+    cache.update(_STATISTICS_CACHE_NAME, add)
+    return results
+
+
+def get_statistics():
+    """ Recorded hook latency statistics.
+
+    :return: {dict} 'plugin:hook' to {'calls', 'total', 'max', 'timeouts', 'errors'}
+    """
+    return cache.load(_STATISTICS_CACHE_NAME)
+
+
+def _get_plugins_path():
+    return config.data_path('plugins')
+
+
+def _get_plugin_path(name):
+    package = os.path.join(_get_plugins_path(), name, '__init__.py')
+    if os.path.isfile(package):
+        return package
+    return os.path.join(_get_plugins_path(), name + '.py')
+
+
+def _scan(name, path):
+    with open(path, 'rb') as f:
+        source = f.read()
+    try:
+        tree = ast.parse(source, path)
+    except SyntaxError as e:
+        raise PluginError(_PLUGIN_SYNTAX_ERROR.format(name, e))
+    entry = {'path': path, 'subcommands': [], 'hooks': []}
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        if node.name.startswith(_COMMAND_PREFIX):
+            entry['subcommands'].append(node.name[len(_COMMAND_PREFIX):].replace('_', '-'))
+        elif node.name.startswith(_HOOK_PREFIX):
+            entry['hooks'].append(node.name[len(_HOOK_PREFIX):])
+    return entry
+
+
+def _run_hook(name, path, hook, args):
+    started = time.time()
+    function = getattr(_import(name, path), _HOOK_PREFIX + hook)
+    result = function(*args)
+    return result, time.time() - started
+
+
+def _get_pool(workers):
+    global _pool
+    from concurrent import futures
+
+    if _pool is None:
+        _pool = futures.ProcessPoolExecutor(max_workers=max(workers, _MIN_WORKERS))
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    import multiprocessing
+
+    if _pool is None:
+        return
+    # a hung hook keeps its worker busy forever, so the workers have to be killed
+    processes = list(getattr(_pool, '_processes', {}).values())
+    _pool.shutdown(wait=False)
+    for process in processes:
+        if isinstance(process, multiprocessing.Process) and process.is_alive():
+            process.terminate()
+    _pool = None
+
+
+def _record(statistics, name, hook, elapsed, failure=None):
+    entry = statistics.setdefault('{}:{}'.format(name, hook),
+                                  {'calls': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0, 'errors': 0})
+    entry['calls'] += 1
+    entry['total'] += elapsed
+    entry['max'] = max(entry['max'], elapsed)
+    if failure is not None:
+        entry[failure] += 1
+
+
+def _warn(message):
+    sys.stderr.write(message + '\n')
+
+
+def _import(name, path):
+    if name not in _modules:
+        try:
+            spec = importlib_util.spec_from_file_location('projects_plugin_' + name, path)
+            module = importlib_util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except Exception as e:
+            raise PluginError(_PLUGIN_IMPORT_ERROR.format(name, e))
+        _modules[name] = module
+    return _modules[name]
@@ -6,10 +6,46 @@ class ProjectfileError(Exception):
     pass
 
 
+def get(path):
+    """ Loads and parses the Projectfile at the given path.
+
+    Raises:
+        ProjectfileError    on invalid syntax with the offending line number
+    :param path: {str} path of the Projectfile
+    :return: {dict} parsed Projectfile data
+    """
+    return _parse_lines(_load(path))
+
+
+def validate(data):
+    """ Checks the command graph of a parsed Projectfile.
+
+    :param data: {dict} parsed Projectfile or merged namespace
+    :return: {list} error messages, empty for a valid command graph
+    """
+    commands = data.get('commands', {})
+    errors = []
+    for name in sorted(commands):
+        try:
+            _resolve_alias(commands, name)
+        except ValueError as e:
+            errors.append(e.args[0])
+            continue
+        for dependency in commands[name].get('dependencies', []):
+            if dependency not in commands:
+                errors.append(_UNDEFINED_DEPENDENCY_ERROR.format(name, dependency))
+    cycle = _find_cycle(commands)
+    if cycle:
+        errors.append(_DEPENDENCY_CYCLE_ERROR.format(' -> '.join(cycle)))
+    return errors
+
+
 _PROJECTFILE = 'Projectfile'
 
 _COMMENT_DELIMITER_UNEXPECTED_ERROR = 'Unexpected comment delimiter (""")!'
 _COMMAND_DELIMITER_UNEXPECTED_ERROR = 'Unexpected command delimiter (===)!'
+_PARALLEL_BLOCK_UNCLOSED_ERROR = 'Parallel block (|||) is not closed!'
+_PARALLEL_BLOCK_EMPTY_ERROR = 'Empty parallel block (|||)!'
 
 _VERSION_INDENTATION_ERROR = 'Whitespaces are not allowed before the "from" keyword!'
 _VERSION_FORMAT_ERROR = 'Invalid version format. The valid one looks like "v1.2.3".'
@@ -20,6 +56,8 @@ _VARIABLE_QUOTE_BEFORE_ERROR = 'No matching quote found at the beginning of valu
 _VARIABLE_QUOTE_AFTER_ERROR = 'No matching quote found at the end of value!'
 _VARIABLE_SYNTAX_ERROR = 'Invalid variable format! It should be "my-variable = 42".'
 
+_SOURCE_INDENTATION_ERROR = 'Environment setup scripts cannot be indented!'
+
 _COMMAND_HEADER_INDENTATION_ERROR = 'Command header cannot be indented!'
 _COMMAND_HEADER_MISSING_COLON_ERROR = 'Missing colon after command name!'
 _COMMAND_HEADER_COLON_ERROR = 'Invalid colon placement! It should be "command:".'
@@ -28,6 +66,86 @@ _COMMAND_HEADER_EMPTY_DEPENDENCY_LIST = 'Empty dependency list!'
 _COMMAND_HEADER_INVALID_DEPENDENCY_LIST = 'Invalid dependency list syntax! It should be: "[dep1, dep2]".'
 _COMMAND_HEADER_SYNTAX_ERROR = 'Invalid command header format! It should be "command|c: [dep1, dep2]".'
 _COMMAND_HEADER_UNEXPECTED_UNINDENTED_ERROR = 'Unexpected unindented line!'
+_COMMAND_HEADER_INVALID_OPTION_LIST = 'Invalid option list syntax! It should be: "{option=value, option2=value}".'
+_COMMAND_HEADER_UNKNOWN_OPTION = 'Unknown command option "{}"!'
+_COMMAND_HEADER_INVALID_OPTION_VALUE = 'Invalid value for command option "{}"!'
+
+_UNDEFINED_ALIAS_ERROR = 'Alias "{}" refers to the undefined command "{}"!'
+_CIRCULAR_ALIAS_ERROR = 'Alias "{}" refers to itself!'
+_UNDEFINED_DEPENDENCY_ERROR = 'Command "{}" depends on the undefined command "{}"!'
+_DEPENDENCY_CYCLE_ERROR = 'Circular dependency: {}!'
+
+
+def _list_option(value):
+    values = value.split()
+    if not values:
+        raise ValueError(value)
+    return values
+
+
+def _timeout_option(value):
+    seconds = float(value)
+    if not seconds > 0:
+        raise ValueError(value)
+    return seconds
+
+
+def _retries_option(value):
+    retries = int(value)
+    if retries < 0:
+        raise ValueError(value)
+    return retries
+
+
+_COMMAND_OPTIONS = {
+    'inputs': _list_option,
+    'outputs': _list_option,
+    'timeout': _timeout_option,
+    'retries': _retries_option
+}
+
+
+def _resolve_alias(commands, name):
+    seen = [name]
+    while 'alias' in commands[name]:
+        target = commands[name]['alias']
+        if target not in commands:
+            raise ValueError(_UNDEFINED_ALIAS_ERROR.format(seen[0], target))
+        if target in seen:
+            raise ValueError(_CIRCULAR_ALIAS_ERROR.format(seen[0]))
+        seen.append(target)
+        name = target
+    return name
+
+
+def _find_cycle(commands):
+    finished = set()
+    path = []
+
+    def visit(name):
+        try:
+            name = _resolve_alias(commands, name)
+        except ValueError:
+            return None
+        if name in finished:
+            return None
+        if name in path:
+            return path[path.index(name):] + [name]
+        path.append(name)
+        for dependency in commands[name].get('dependencies', []):
+            if dependency in commands:
+                cycle = visit(dependency)
+                if cycle:
+                    return cycle
+        path.pop()
+        finished.add(name)
+        return None
+
+    for name in sorted(commands):
+        cycle = visit(name)
+        if cycle:
+            return cycle
+    return None
 
 
 def _get_projectfile_list_for_project_root(project_root):
@@ -45,9 +163,47 @@ def _load(path):
     return raw.split('\n')
 
 
+def _parse_lines(lines):
+    data = {}
+    state = _state_start
+    for index, line in enumerate(lines):
+        try:
+            state = state(data, line)
+        except SyntaxError as e:
+            raise ProjectfileError({'line': index + 1, 'error': e.args[0]})
+    error = _check_final_state(state)
+    if error:
+        raise ProjectfileError({'line': len(lines), 'error': error})
+    return _finalize(data)
+
+
+def _check_final_state(state):
+    if state == _state_start:
+        return _VERSION_MISSING_ERROR
+    if state in (_state_pre_parallel, _state_post_parallel):
+        return _PARALLEL_BLOCK_UNCLOSED_ERROR
+    return None
+
+
+def _finalize(data):
+    data.setdefault('variables', {})
+    data.setdefault('commands', {})
+    if 'description' in data:
+        data['description'] = data['description'].strip()
+    for command in data['commands'].values():
+        if 'alias' in command:
+            continue
+        command.pop('done', None)
+        command.setdefault('pre', [])
+        command.setdefault('post', [])
+        if 'description' in command:
+            command['description'] = command['description'].strip()
+    return data
+
+
 def _get_current_command(data):
     for command in data['commands'].keys():
-        if not data['commands'][command]['done']:
+        if not data['commands'][command].get('done', True):
             return data['commands'][command]
     else:
         return None
@@ -120,6 +276,16 @@ def _parse_variable(line):
         return None
 
 
+def _parse_source(line):
+    m = re.match('^source\s+([^\s=:].*?)\s*$', line)
+    if m:
+        return m.group(1)
+    else:
+        if re.match('^\s+source\s+[^\s=:].*$', line):
+            raise SyntaxError(_SOURCE_INDENTATION_ERROR)
+        return None
+
+
 def _parse_command_divisor(line):
     if re.match('\s*===.*$', line):
         return True
@@ -127,10 +293,17 @@ def _parse_command_divisor(line):
         return False
 
 
+def _parse_parallel_delimiter(line):
+    if re.match('^\s+\|\|\|\s*$', line):
+        return True
+    else:
+        return False
+
+
 def _parse_command_header(line):
     if re.match('^\s+.*:.*', line):
         raise SyntaxError(_COMMAND_HEADER_INDENTATION_ERROR)
-    m = re.match('^([\w\|\.\s-]+):\s*(?:\[([\w\.\s,-]+)\])?\s*$', line)
+    m = re.match('^([\w\|\.\s-]+):\s*(?:\[([\w\.\s,-]+)\])?\s*(?:\{([^{}]*)\})?\s*$', line)
     if m:
         keys = m.group(1).split('|')
         keys = [k.strip() for k in keys]
@@ -149,6 +322,8 @@ def _parse_command_header(line):
         ret = {keys[0]: {'done': False}}
         if deps:
             ret[keys[0]]['dependencies'] = deps
+        if m.group(3) is not None:
+            ret[keys[0]].update(_parse_command_options(m.group(3)))
         if len(keys) > 1:
             for key in keys[1:]:
                 ret[key] = {'alias': keys[0]}
@@ -163,9 +338,27 @@ def _parse_command_header(line):
         if re.search('[\[\]]', line):
             if not re.search('\[[^\[\]]*\]', line) or re.search('\[(\s*,\s*|[^,]*,\s*,[^,]*)\]', line):
                 raise SyntaxError(_COMMAND_HEADER_INVALID_DEPENDENCY_LIST)
+        if re.search('[{}]', line):
+            raise SyntaxError(_COMMAND_HEADER_INVALID_OPTION_LIST)
         raise SyntaxError(_COMMAND_HEADER_SYNTAX_ERROR)
 
 
+def _parse_command_options(raw):
+    options = {}
+    for item in raw.split(','):
+        m = re.match('^\s*([\w-]+)\s*=\s*(.*?)\s*$', item)
+        if not m:
+            raise SyntaxError(_COMMAND_HEADER_INVALID_OPTION_LIST)
+        key, value = m.group(1), m.group(2)
+        if key not in _COMMAND_OPTIONS:
+            raise SyntaxError(_COMMAND_HEADER_UNKNOWN_OPTION.format(key))
+        try:
+            options[key] = _COMMAND_OPTIONS[key](value)
+        except ValueError:
+            raise SyntaxError(_COMMAND_HEADER_INVALID_OPTION_VALUE.format(key))
+    return options
+
+
 def _state_start(data, line):
     v = _parse_version(line)
     if v:
@@ -183,6 +376,10 @@ def _state_before_commands(data, line):
     if _parse_comment_delimiter(line):
         data.update({'description': ''})
         return _state_main_comment
+    s = _parse_source(line)
+    if s:
+        data['environment'] = [s]
+        return _state_variables
     v = _parse_variable(line)
     if v:
         data.update({'variables': v})
@@ -221,6 +418,10 @@ def _state_variables(data, line):
         raise SyntaxError(_COMMENT_DELIMITER_UNEXPECTED_ERROR)
     if 'variables' not in data:
         data['variables'] = {}
+    s = _parse_source(line)
+    if s:
+        data.setdefault('environment', []).append(s)
+        return _state_variables
     v = _parse_variable(line)
     if v:
         data['variables'].update(v)
@@ -244,6 +445,9 @@ def _state_command(data, line):
         current_command['pre'] = []
         current_command['post'] = []
         return _state_post
+    if _parse_parallel_delimiter(line):
+        current_command['pre'] = [[]]
+        return _state_pre_parallel
     l = _parse_indented_line(line)
     if l:
         current_command['pre'] = [l]
@@ -280,6 +484,9 @@ def _state_pre(data, line):
     if _parse_command_divisor(line):
         current_command['post'] = []
         return _state_post
+    if _parse_parallel_delimiter(line):
+        current_command['pre'].append([])
+        return _state_pre_parallel
     l = _parse_indented_line(line)
     if l:
         current_command['pre'].append(l)
@@ -297,6 +504,9 @@ def _state_post(data, line):
     if _parse_command_divisor(line):
         raise SyntaxError(_COMMAND_DELIMITER_UNEXPECTED_ERROR)
     current_command = _get_current_command(data)
+    if _parse_parallel_delimiter(line):
+        current_command['post'].append([])
+        return _state_post_parallel
     l = _parse_indented_line(line)
     if l:
         current_command['post'].append(l)
@@ -307,3 +517,27 @@ def _state_post(data, line):
         data['commands'].update(c)
         return _state_command
 
+
+def _state_pre_parallel(data, line):
+    return _parse_parallel_line(data, line, 'pre', _state_pre, _state_pre_parallel)
+
+
+def _state_post_parallel(data, line):
+    return _parse_parallel_line(data, line, 'post', _state_post, _state_post_parallel)
+
+
+def _parse_parallel_line(data, line, section, closed_state, open_state):
+    if _parse_empty_line(line):
+        return open_state
+    block = _get_current_command(data)[section][-1]
+    if _parse_parallel_delimiter(line):
+        if not block:
+            raise SyntaxError(_PARALLEL_BLOCK_EMPTY_ERROR)
+        return closed_state
+    if _parse_command_divisor(line):
+        raise SyntaxError(_PARALLEL_BLOCK_UNCLOSED_ERROR)
+    l = _parse_indented_line(line)
+    if l:
+        block.append(l)
+        return open_state
+    raise SyntaxError(_PARALLEL_BLOCK_UNCLOSED_ERROR)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the project list renderer. The list is laid out in columns sized to
+the terminal and only the currently visible page is rendered, so the cost of a frame
+does not depend on the number of projects.
+
+Every frame is built in a single buffer and emitted with a single write. The renderer
+remembers the previously emitted frame and only the lines that changed are rewritten
+on a redraw, addressed with absolute cursor positioning. A terminal resize invalidates
+the previous frame and forces a full redraw.
+
+API:
+    ProjectList(names, number_color, highlight_color, stream)
+        .draw()             Emits the changed lines of the current frame.
+        .next_page()        Moves to the next page.
+        .previous_page()    Moves to the previous page.
+        .select(index)      Highlights an item by its index in the full list.
+        .get_page_size()    Returns the number of items fitting on a page.
+        .set_names(names)   Replaces the displayed items.
+        .set_header(text)   Replaces the first line of the frame.
+    get_color(conf, key)    Returns the ANSI sequence of a configured color.
+"""
+
+import sys
+
+from projects import config
+from projects import terminalsize
+
+_COLORS = {
+    'red': '\x1b[31m',
+    'green': '\x1b[32m',
+    'yellow': '\x1b[33m',
+    'blue': '\x1b[34m',
+    'magenta': '\x1b[35m',
+    'cyan': '\x1b[36m',
+    'white': '\x1b[37m'
+}
+_BOLD = '\x1b[1m'
+_REVERSE = '\x1b[7m'
+_RESET = '\x1b[0m'
+_CLEAR_SCREEN = '\x1b[H\x1b[2J'
+_CLEAR_LINE = '\x1b[K'
+_MOVE = '\x1b[{};1H'
+
+_HEADER = 'You have {} projects on your machine.'
+_HEADER_EMPTY = 'You have no projects in your project directory!'
+_FOOTER = 'Page {}/{}'
+
+_COLUMN_GAP = 2
+# header, empty line, empty line, footer
+_RESERVED_LINES = 4
+
+
+def get_color(conf, key):
+    """ Looks up the ANSI sequence of a color configuration key.
+
+    :param conf: {dict} loaded configuration
+    :param key: {str} 'number-color' or 'highlight-color'
+    :return: {str} ANSI escape sequence
+    """
+    name = conf.get(key, config._optional_config[key])
+    return _COLORS.get(name, _COLORS[config._optional_config[key]])
+
+
+class ProjectList(object):
+    """ Paged, column based project list with differential redraw. """
+
+    def __init__(self, names, number_color=_COLORS['yellow'], highlight_color=_COLORS['yellow'],
+                 stream=None):
+        """
+        :param names: {list} project names in display order
+        :param number_color: {str} ANSI sequence of the item numbers
+        :param highlight_color: {str} ANSI sequence of the selected item
+        :param stream: {file} output stream, stdout by default
+        """
+        self._names = list(names)
+        self._longest = max([len(name) for name in self._names] or [0])
+        self._number_color = number_color
+        self._highlight_color = highlight_color
+        self._stream = stream or sys.stdout
+        self._page = 0
+        self._selected = None
+        self._frame = None
+        self._size = None
+        self._header = None
+
+    def set_names(self, names):
+        """ Replaces the displayed items and jumps to the first page.
+
+        :param names: {list} project names in display order
+        :return: None
+        """
+        self._names = list(names)
+        self._longest = max([len(name) for name in self._names] or [0])
+        self._page = 0
+        self._selected = None
+
+    def set_header(self, text):
+        """ Replaces the first line of the frame, None restores the default one.
+
+        :param text: {str} header line
+        :return: None
+        """
+        self._header = text
+
+    def select(self, index):
+        """ Highlights an item and moves to the page containing it.
+
+        :param index: {int} index in the full list or None to clear the selection
+        :return: None
+        """
+        self._selected = index
+        if index is not None:
+            self._page = index // max(1, self._get_layout()[2])
+
+    def get_page_size(self):
+        return self._get_layout()[2]
+
+    def next_page(self):
+        self._page = min(self._page + 1, self._get_page_count() - 1)
+
+    def previous_page(self):
+        self._page = max(self._page - 1, 0)
+
+    def draw(self):
+        """ Emits the current frame with a single write, touching only changed lines.
+
+        :return: {int} number of rewritten lines
+        """
+        size = terminalsize.get_terminal_size()
+        lines = self.get_lines()
+        buffer = []
+        if self._frame is None or size != self._size:
+            buffer.append(_CLEAR_SCREEN)
+            previous = []
+        else:
+            previous = self._frame
+        changed = 0
+        for row in range(max(len(lines), len(previous))):
+            line = lines[row] if row < len(lines) else ''
+            if row < len(previous) and previous[row] == line:
+                continue
+            buffer.append(_MOVE.format(row + 1))
+            buffer.append(line)
+            buffer.append(_CLEAR_LINE)
+            changed += 1
+        self._frame = lines
+        self._size = size
+        if buffer:
+            self._stream.write(''.join(buffer))
+            self._stream.flush()
+        return changed
+
+    def get_lines(self):
+        """ Renders the visible page.
+
+        :return: {list} screen lines including the header and the footer
+        """
+        if not self._names:
+            return [self._header or _HEADER_EMPTY]
+        column_width, columns, page_size = self._get_layout()
+        start = self._page * page_size
+        visible = self._names[start:start + page_size]
+        lines = [self._header or _HEADER.format(len(self._names)), '']
+        for row_start in range(0, len(visible), columns):
+            cells = []
+            for offset, name in enumerate(visible[row_start:row_start + columns]):
+                cells.append(self._render_cell(start + row_start + offset, name, column_width))
+            lines.append(''.join(cells).rstrip())
+        lines.append('')
+        lines.append(_FOOTER.format(self._page + 1, self._get_page_count()))
+        return lines
+
+    def _render_cell(self, index, name, column_width):
+        number = str(index + 1).rjust(len(str(len(self._names))))
+        label = '[{}] {}'.format(number, name)
+        if len(label) > column_width - _COLUMN_GAP:
+            label = label[:column_width - _COLUMN_GAP - 1] + '~'
+        padding = ' ' * (column_width - len(label))
+        number_start = 1
+        number_end = number_start + len(number)
+        if index == self._selected:
+            return '{}{}{}{}{}'.format(self._highlight_color, _REVERSE, label, _RESET, padding)
+        return '[{}{}{}{}]{}{}'.format(self._number_color, _BOLD, label[number_start:number_end], _RESET,
+                                       label[number_end + 1:], padding)
+
+    def _get_layout(self):
+        width, height = terminalsize.get_terminal_size()
+        number_width = len(str(len(self._names)))
+        column_width = min(number_width + self._longest + 3 + _COLUMN_GAP, max(width, 1))
+        columns = max(1, width // column_width)
+        rows = max(1, height - _RESERVED_LINES)
+        return column_width, columns, columns * rows
+
+    def _get_page_count(self):
+        page_size = self._get_layout()[2]
+        return max(1, (len(self._names) + page_size - 1) // page_size)
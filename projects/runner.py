@@ -0,0 +1,505 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the command execution functions. A command is executed after all
+of its dependencies were executed. The pre and post lines of a command are executed
+together in a single shell, so directory changes and shell variables are kept between
+the lines. The first failing line stops the command. Variable references in the lines
+are substituted before execution (see interpolation.py).
+
+The lines of a parallel block (see projectfile.py) are started together as background
+subshells and the block waits for all of them before the next line. The output of every
+line is collected in a temporary file and printed in the order of the lines, so the
+outputs are not interleaved. The block fails if any of its lines failed. Directory
+changes and shell variables of a parallel line are not kept after the block.
+
+Commands of a merged Projectfile hierarchy (see hierarchy.py) are executed in the
+directory of the Projectfile that defines them, with the variables of its scope.
+
+Commands that declare outputs in their header are looked up in the artifact cache
+(see cas.py) first. On a cache hit the outputs are restored instead of running the
+command.
+
+Independent commands of the dependency graph are executed in parallel, up to the given
+number of jobs. Every command runs in its own process group, so the whole process tree
+of a command can be stopped. A command is stopped when it exceeds the timeout declared
+in its header, when a concurrently running command fails, or when the run is
+interrupted with Ctrl-C. The processes get SIGTERM first and SIGKILL if they are still
+running after a grace period. A failing or timed out command is executed again as many
+times as its header allows with the retries option.
+
+A process group outside of the foreground of the terminal is stopped when it reads the
+terminal, so if p runs in the foreground, the terminal is handed to the process group
+of a command while it runs and taken back afterwards. Only one command can own the
+terminal at a time, the commands running in parallel with it stay in the background.
+Ctrl-C then reaches the command instead of p, a command killed by it interrupts p.
+
+If a project is given, every executed command is recorded in the run history (see
+history.py). The ready commands are then started by the estimated length of the longest
+chain of commands depending on them, longest first, so the critical path of the graph
+is not left for the end. Commands without history are estimated with the average of the
+known commands and keep their declaration order among each other.
+
+The environment setup scripts of a Projectfile (see environment.py) are not sourced by
+the commands, the cached environment snapshot of their directory is passed to them.
+
+If a jobserver is given (see jobserver.py), every command holds a token while it runs
+and the jobserver is passed to the commands in MAKEFLAGS, so nested make and p
+processes share the parallelism of the run.
+
+If a report callback is given, it is called with the events of the run (see events.py)
+as they happen, and the output of the commands is sent to stderr, so the standard
+output carries only the events.
+
+If logging is enabled, the stdout and stderr of every executed command are read through
+pipes, passed on to the terminal and captured in a compressed log of the run (see
+logs.py) at the same time. The run id of the log is reported in the finish event.
+
+API:
+    run(data, name, cwd, cache_size, jobs, jobserver, project, report, log)
+                                Runs the given command of the parsed Projectfile.
+
+Raises:
+    RunnerError     in case of execution related problems:
+                        - unknown command or dependency
+                        - circular dependency
+                        - undefined or failing variable
+                        - failing or timed out command
+                        - missing or failing environment setup script
+"""
+
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent import futures
+
+from projects import cas
+from projects import environment
+from projects import history
+from projects import interpolation
+from projects import logs
+
+
+class RunnerError(Exception):
+    pass
+
+
+_UNKNOWN_COMMAND_ERROR = 'Unknown command "{}"!'
+_CIRCULAR_DEPENDENCY_ERROR = 'Circular dependency detected at command "{}"!'
+_COMMAND_FAILED_ERROR = 'Command "{}" failed with exit code {}.'
+_COMMAND_TIMEOUT_ERROR = 'Command "{}" timed out after {} seconds.'
+_COMMAND_CANCELLED_ERROR = 'Command "{}" was cancelled.'
+_MISSING_OUTPUT_ERROR = 'Command "{}" finished but its outputs cannot be cached: {}'
+_RETRY_MESSAGE = '{} Retrying ({}/{})...'
+
+_DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+_POLL_INTERVAL = 0.1
+# exit status recorded in the history for timed out commands
+_TIMEOUT_STATUS = -1
+_KILL_GRACE_PERIOD = 2.0
+_PIPE_BUFFER_SIZE = 64 * 1024
+# process_group is available from Python 3.11, setpgrp in the child is the fallback
+_PROCESS_GROUP = {'process_group': 0} if sys.version_info >= (3, 11) else {'preexec_fn': os.setpgrp}
+
+# the artifact cache is shared by the commands running in parallel
+_cache_lock = threading.Lock()
+# held by the command owning the foreground of the terminal
+_terminal_lock = threading.Lock()
+
+
+def run(data, name, cwd, cache_size=_DEFAULT_CACHE_SIZE, jobs=1, jobserver=None, project=None, report=None,
+        log=False):
+    """ Runs a command with all of its dependencies.
+
+    Raises:
+        RunnerError     on unknown command, circular dependency or failing command
+    :param data: {dict} parsed Projectfile
+    :param name: {str} command name or alias to run
+    :param cwd: {str} directory of the commands without their own directory
+    :param cache_size: {int} size limit of the artifact cache in bytes
+    :param jobs: {int} maximum number of commands running in parallel
+    :param jobserver: {jobserver.Jobserver} token source shared with the commands
+    :param project: {str} project the runs are recorded for in the history
+    :param report: {callable} called with the event name and fields of every event
+    :param log: {bool} capture the output of the commands in the run logs
+    :return: None
+    """
+    order = _get_execution_order(data, name)
+    waiting = _get_dependencies(data, order)
+    estimates = history.get_estimates(project, order) if project is not None else {}
+    priorities = _get_priorities(order, waiting, estimates)
+    resolvers = {}
+    environments = {}
+    options = {}
+    if jobserver is not None:
+        options = {'env': jobserver.get_environment(os.environ), 'pass_fds': jobserver.get_fds()}
+    if report is not None:
+        options['stdout'] = sys.stderr.fileno()
+    cancelled = threading.Event()
+    running = {}
+    error = None
+    with futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        try:
+            while waiting or running:
+                ready = _get_ready(order, waiting, priorities)
+                while error is None and ready and len(running) < max(1, jobs):
+                    command_name = ready.pop(0)
+                    del waiting[command_name]
+                    try:
+                        job = _prepare(data, command_name, cwd, resolvers)
+                        if job is not None:
+                            job['options'] = _get_options(data, job['cwd'], options, environments)
+                    except RunnerError as e:
+                        error = e
+                        cancelled.set()
+                        break
+                    if job is None:
+                        # restored from the artifact cache, its dependents may be ready now
+                        if report is not None:
+                            report('restored', {'command': command_name})
+                        _finish(waiting, command_name)
+                        ready = _get_ready(order, waiting, priorities)
+                        continue
+                    if report is not None:
+                        report('start', {'command': command_name})
+                    if log:
+                        job['log'] = project or cwd
+                    running[executor.submit(_run_job, job, cache_size, cancelled, jobserver, report)] = job
+                if not running:
+                    break
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    if project is not None and job.get('status') is not None:
+                        history.record(project, job['name'], job['duration'], job['status'], job['fingerprint'])
+                    if report is not None:
+                        report('finish', {'command': job['name'], 'status': job.get('status'),
+                                          'duration': job.get('duration'), 'run': job.get('run')})
+                    try:
+                        future.result()
+                    except RunnerError as e:
+                        if error is None:
+                            error = e
+                            cancelled.set()
+                        continue
+                    _finish(waiting, job['name'])
+        except KeyboardInterrupt:
+            cancelled.set()
+            raise
+    if error is not None:
+        raise error
+
+
+def _resolve(data, name):
+    commands = data['commands']
+    if name not in commands:
+        raise RunnerError(_UNKNOWN_COMMAND_ERROR.format(name))
+    if 'alias' in commands[name]:
+        return _resolve(data, commands[name]['alias'])
+    return name
+
+
+def _get_execution_order(data, name):
+    order = []
+    visiting = set()
+
+    def visit(command_name):
+        command_name = _resolve(data, command_name)
+        if command_name in order:
+            return
+        if command_name in visiting:
+            raise RunnerError(_CIRCULAR_DEPENDENCY_ERROR.format(command_name))
+        visiting.add(command_name)
+        for dependency in data['commands'][command_name].get('dependencies', []):
+            visit(dependency)
+        visiting.remove(command_name)
+        order.append(command_name)
+
+    visit(name)
+    return order
+
+
+def _get_dependencies(data, order):
+    return dict((name, set(_resolve(data, dependency) for dependency in
+                           data['commands'][name].get('dependencies', [])))
+                for name in order)
+
+
+def _get_priorities(order, dependencies, estimates):
+    default = sum(estimates.values()) / len(estimates) if estimates else 0.0
+    dependents = dict((name, []) for name in order)
+    for name in order:
+        for dependency in dependencies[name]:
+            dependents[dependency].append(name)
+    priorities = {}
+    # the order lists the dependencies first, so the dependents are already computed
+    for name in reversed(order):
+        longest = max([priorities[dependent] for dependent in dependents[name]] or [0.0])
+        priorities[name] = estimates.get(name, default) + longest
+    return priorities
+
+
+def _get_ready(order, waiting, priorities):
+    ready = [name for name in order if name in waiting and not waiting[name]]
+    # the sort is stable, so commands of equal priority keep their order
+    ready.sort(key=lambda name: -priorities[name])
+    return ready
+
+
+def _finish(waiting, name):
+    for dependencies in waiting.values():
+        dependencies.discard(name)
+
+
+def _get_script(command, resolver):
+    lines = command.get('pre', []) + command.get('post', [])
+    script = ['set -e']
+    for index, line in enumerate(lines):
+        if isinstance(line, list):
+            script.extend(_get_parallel_block(index, [resolver.render(l) for l in line]))
+        else:
+            script.append(resolver.render(line))
+    return '\n'.join(script)
+
+
+def _get_parallel_block(index, lines):
+    # the closing parenthesis is on its own line, so a trailing comment cannot hide it
+    directory = '_p_block_{}'.format(index)
+    script = ['{}=$(mktemp -d)'.format(directory)]
+    for i, line in enumerate(lines):
+        script.extend(['(', line, ') >"${}/{}" 2>&1 &'.format(directory, i),
+                       '_p_pid_{}_{}=$!'.format(index, i)])
+    script.append('_p_failed=0')
+    for i in range(len(lines)):
+        script.extend(['wait $_p_pid_{}_{} || _p_failed=1'.format(index, i),
+                       'cat "${}/{}"'.format(directory, i)])
+    script.extend(['rm -rf "${}"'.format(directory), '[ $_p_failed -eq 0 ]'])
+    return script
+
+
+def _get_resolver(data, directory, resolvers):
+    if directory not in resolvers:
+        variables = data.get('scopes', {}).get(directory, data.get('variables', {}))
+        resolvers[directory] = interpolation.Resolver(variables, directory)
+    return resolvers[directory]
+
+
+def _get_key(data, name, cwd, resolvers):
+    command = data['commands'][name]
+    directory = command.get('directory', cwd)
+    resolver = _get_resolver(data, directory, resolvers)
+    try:
+        script = _get_script(command, resolver)
+    except interpolation.InterpolationError as e:
+        raise RunnerError(e.args[0])
+    key = None
+    if command.get('outputs'):
+        # only the variables of this command, the resolver is shared by every command
+        # of the directory and holds the variables of the other commands as well
+        variables = dict((reference, resolver.resolve(reference))
+                         for reference in _get_references(command))
+        key = cas.get_key(script, variables, directory, command.get('inputs', []))
+    return script, key
+
+
+def _get_references(command):
+    references = set()
+    for line in command.get('pre', []) + command.get('post', []):
+        for text in line if isinstance(line, list) else [line]:
+            references.update(interpolation.get_references(text))
+    return references
+
+
+def _prepare(data, name, cwd, resolvers):
+    command = data['commands'][name]
+    directory = command.get('directory', cwd)
+    script, key = _get_key(data, name, cwd, resolvers)
+    if key is not None:
+        with _cache_lock:
+            if cas.restore(key, directory):
+                return None
+    fingerprint = key or hashlib.sha256(script.encode('utf-8')).hexdigest()
+    return {'name': name, 'command': command, 'script': script, 'cwd': directory, 'key': key,
+            'fingerprint': fingerprint}
+
+
+def _get_options(data, directory, options, environments):
+    if directory not in environments:
+        scripts = data.get('environments', {}).get(directory, data.get('environment', []))
+        try:
+            environments[directory] = environment.get_diff(scripts, directory) if scripts else None
+        except environment.EnvironmentSetupError as e:
+            raise RunnerError(e.args[0])
+    if environments[directory] is None:
+        return options
+    options = dict(options)
+    options['env'] = environment.apply(environments[directory], options.get('env', os.environ))
+    return options
+
+
+def _run_job(job, cache_size, cancelled, jobserver=None, report=None):
+    name = job['name']
+    token = None
+    if jobserver is not None:
+        token = jobserver.acquire(cancelled)
+        if token is None:
+            raise RunnerError(_COMMAND_CANCELLED_ERROR.format(name), None)
+    started = time.time()
+    # every attempt of a command is captured in the same log
+    log = None
+    try:
+        if job.get('log') is not None:
+            log = logs.create(job['log'], name)
+            job['run'] = log.run
+        retries = job['command'].get('retries', 0)
+        for attempt in range(retries + 1):
+            try:
+                _execute(name, job['script'], job['cwd'], job['command'].get('timeout'), cancelled,
+                         job.get('options', {}), log)
+                job['status'] = 0
+                break
+            except RunnerError as e:
+                job['status'] = e.args[1]
+                if cancelled.is_set() or attempt == retries:
+                    raise
+                message = _RETRY_MESSAGE.format(e.args[0], attempt + 1, retries) + '\n'
+                sys.stderr.write(message)
+                if log is not None:
+                    log.write(message.encode('utf-8'))
+                if report is not None:
+                    report('retry', {'command': name, 'attempt': attempt + 1, 'retries': retries,
+                                     'error': e.args[0]})
+    finally:
+        job['duration'] = time.time() - started
+        if log is not None:
+            log.close(job.get('status'))
+        if jobserver is not None:
+            jobserver.release(token)
+    if job['key'] is not None:
+        with _cache_lock:
+            try:
+                cas.store(job['key'], job['cwd'], job['command']['outputs'])
+            except OSError as e:
+                raise RunnerError(_MISSING_OUTPUT_ERROR.format(name, e))
+            cas.gc(cache_size)
+
+
+def _execute(name, script, cwd, timeout=None, cancelled=None, options=None, log=None):
+    options = dict(options or {})
+    pumps = []
+    if log is not None:
+        # the output goes where it would go without the log, standard output by default
+        targets = (options.pop('stdout', sys.__stdout__.fileno()), sys.__stderr__.fileno())
+        options['stdout'] = subprocess.PIPE
+        options['stderr'] = subprocess.PIPE
+    # the shell leads a new process group but stays in the session of the terminal
+    options.update(_PROCESS_GROUP)
+    terminal = _get_terminal()
+    if terminal is not None and not _terminal_lock.acquire(False):
+        terminal = None
+    try:
+        process = subprocess.Popen(script, shell=True, cwd=cwd, **options)
+    except BaseException:
+        if terminal is not None:
+            _terminal_lock.release()
+        raise
+    if terminal is not None:
+        _set_foreground(terminal, process.pid)
+        # the command may have read the terminal before it was handed over
+        _signal_group(process.pid, signal.SIGCONT)
+    if log is not None:
+        for pipe, target in zip((process.stdout, process.stderr), targets):
+            pump = threading.Thread(target=_pump, args=(pipe, target, log))
+            pump.daemon = True
+            pump.start()
+            pumps.append(pump)
+    deadline = None if timeout is None else time.time() + timeout
+    try:
+        while True:
+            try:
+                code = process.wait(timeout=_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if cancelled is not None and cancelled.is_set():
+                _kill(process)
+                raise RunnerError(_COMMAND_CANCELLED_ERROR.format(name), None)
+            if deadline is not None and time.time() >= deadline:
+                _kill(process)
+                raise RunnerError(_COMMAND_TIMEOUT_ERROR.format(name, timeout), _TIMEOUT_STATUS)
+    finally:
+        if terminal is not None:
+            _set_foreground(terminal, os.getpgrp())
+            _terminal_lock.release()
+        # background processes left behind by the command may keep the pipes open
+        for pump in pumps:
+            pump.join(_KILL_GRACE_PERIOD)
+    if code == -signal.SIGINT and terminal is not None:
+        # Ctrl-C went to the foreground command only, p is interrupted as well
+        os.kill(os.getpid(), signal.SIGINT)
+    if code != 0:
+        raise RunnerError(_COMMAND_FAILED_ERROR.format(name, code), code)
+
+
+def _get_terminal():
+    # the commands inherit the standard input descriptor, and the terminal can only be
+    # handed over by the foreground process group
+    try:
+        if os.isatty(0) and os.tcgetpgrp(0) == os.getpgrp():
+            return 0
+    except OSError:
+        pass
+    return None
+
+
+def _set_foreground(fd, group):
+    # a background process changing the foreground group gets SIGTTOU unless it is blocked
+    blocked = signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGTTOU])
+    try:
+        os.tcsetpgrp(fd, group)
+    except OSError:
+        # the process group of the command is already gone
+        pass
+    finally:
+        signal.pthread_sigmask(signal.SIG_SETMASK, blocked)
+
+
+def _signal_group(group, signum):
+    try:
+        os.killpg(group, signum)
+    except OSError:
+        # the process group is already gone
+        pass
+
+
+def _pump(pipe, target, log):
+    try:
+        while True:
+            data = os.read(pipe.fileno(), _PIPE_BUFFER_SIZE)
+            if not data:
+                break
+            log.write(data)
+            try:
+                while data:
+                    data = data[os.write(target, data):]
+            except OSError:
+                # a closed terminal does not stop the capture
+                pass
+    finally:
+        pipe.close()
+
+
+def _kill(process):
+    _signal_group(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=_KILL_GRACE_PERIOD)
+    except subprocess.TimeoutExpired:
+        pass
+    # members of the group ignoring SIGTERM or outliving the shell
+    _signal_group(process.pid, signal.SIGKILL)
+    process.wait()
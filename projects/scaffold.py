@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the project scaffolding used by 'p new'. A new project is created in
+the first projects root from a template directory of ~/.p/templates:
+
+    ~/.p/templates/<template>/...   files and directories of the new project
+
+The files are cloned with files.clone(). Reflinks share the file extents copy-on-write,
+so even templates with large vendored dependencies are cloned almost instantly. Where
+the filesystem does not support reflinks the files are copied in parallel. Hardlinks
+are only used when the caller asks for them: a hardlinked file is shared with the
+template, so it is only suitable for files that are never edited in place.
+
+The Projectfile of the template is rendered instead of cloned. The references of the
+scaffolding variables (see interpolation.py) are substituted, every other reference is
+kept for the runtime:
+
+    project     name of the new project
+    template    name of the template
+
+If the 'default' template is used but it does not exist, the project gets a starter
+Projectfile only.
+
+API:
+    list_templates()            Returns the names of the available templates.
+    create(conf, name, template, variables, hardlink)
+                                Creates a new project and returns its path.
+
+Raises:
+    ScaffoldError   in case of scaffolding related problems:
+                        - invalid project name
+                        - project already exists
+                        - unknown template
+"""
+
+import os
+import shutil
+from concurrent import futures
+
+from projects import config
+from projects import files
+from projects import interpolation
+from projects import paths
+from projects import projectfile
+
+
+class ScaffoldError(Exception):
+    pass
+
+
+_INVALID_NAME_ERROR = 'Invalid project name "{}"!'
+_PROJECT_EXISTS_ERROR = 'Project "{}" already exists!'
+_UNKNOWN_TEMPLATE_ERROR = 'Unknown template "{}"!'
+
+_DEFAULT_TEMPLATE = 'default'
+_STARTER_PROJECTFILE = '''from v1.0.0
+
+"""
+{{project}}
+"""
+
+project = {{project}}
+'''
+_COPY_WORKERS = 8
+
+
+def list_templates():
+    """ Names of the templates in the templates folder.
+
+    :return: {list} sorted template names
+    """
+    directory = _get_templates_path()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if not name.startswith('.') and os.path.isdir(os.path.join(directory, name)))
+
+
+def create(conf, name, template=_DEFAULT_TEMPLATE, variables=None, hardlink=False):
+    """ Creates a new project from a template.
+
+    Raises:
+        ScaffoldError   on invalid name, existing project or unknown template
+    :param conf: {dict} configuration
+    :param name: {str} name of the new project
+    :param template: {str} name of the template
+    :param variables: {dict} extra scaffolding variables, overriding the built in ones
+    :param hardlink: {bool} hardlinking the template files is acceptable
+    :return: {str} path of the new project
+    """
+    if not name or name.startswith('.') or os.sep in name:
+        raise ScaffoldError(_INVALID_NAME_ERROR.format(name))
+    destination = os.path.join(paths.get_roots(conf['projects-path'])[0], name)
+    if os.path.lexists(destination):
+        raise ScaffoldError(_PROJECT_EXISTS_ERROR.format(name))
+    source = os.path.join(_get_templates_path(), template)
+    if not os.path.isdir(source) and template != _DEFAULT_TEMPLATE:
+        raise ScaffoldError(_UNKNOWN_TEMPLATE_ERROR.format(template))
+    values = {'project': name, 'template': template}
+    values.update(variables or {})
+
+    try:
+        if os.path.isdir(source):
+            _clone_tree(source, destination, hardlink)
+        else:
+            os.makedirs(destination)
+        starter = os.path.join(source, projectfile._PROJECTFILE)
+        if os.path.isfile(starter):
+            with open(starter, 'r') as f:
+                text = f.read()
+        else:
+            text = _STARTER_PROJECTFILE
+        with open(os.path.join(destination, projectfile._PROJECTFILE), 'w') as f:
+            f.write(_render(text, values))
+    except (IOError, OSError):
+        # a half created project would block the next attempt
+        shutil.rmtree(destination, ignore_errors=True)
+        raise
+    return destination
+
+
+def _get_templates_path():
+    return config.data_path('templates')
+
+
+def _clone_tree(source, destination, hardlink):
+    # directories are created up front, so the files can be cloned in any order
+    jobs = []
+    directories = []
+    for dir_path, dir_names, file_names in os.walk(source):
+        target = os.path.join(destination, os.path.relpath(dir_path, source))
+        os.makedirs(target)
+        directories.append((dir_path, target))
+        for dir_name in list(dir_names):
+            if os.path.islink(os.path.join(dir_path, dir_name)):
+                # os.walk does not follow links, they are recreated like the file links
+                dir_names.remove(dir_name)
+                file_names.append(dir_name)
+        for file_name in file_names:
+            if dir_path == source and file_name == projectfile._PROJECTFILE:
+                continue
+            jobs.append((os.path.join(dir_path, file_name), os.path.join(target, file_name)))
+    with futures.ThreadPoolExecutor(max_workers=_COPY_WORKERS) as executor:
+        list(executor.map(lambda job: _clone_file(job[0], job[1], hardlink), jobs))
+    # the project directory itself stays writable for the Projectfile
+    for dir_path, target in directories[1:]:
+        shutil.copystat(dir_path, target)
+
+
+def _clone_file(src, dst, hardlink):
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+    else:
+        files.clone(src, dst, hardlink)
+
+
+def _render(text, values):
+    lines = []
+    for line in text.split('\n'):
+        template = interpolation.get_template(line)
+        parts = list(template)
+        for index in range(1, len(parts), 2):
+            parts[index] = values.get(parts[index], '{{' + parts[index] + '}}')
+        lines.append(''.join(parts))
+    return '\n'.join(lines)
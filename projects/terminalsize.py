@@ -1,89 +1,100 @@
 #!/usr/bin/env python
+"""
+This file contains the terminal size service. The size is queried once and cached. On
+platforms with SIGWINCH the cached size is updated from the signal handler whenever the
+terminal is resized, so rendering code can call get_terminal_size() in hot loops for
+free. No processes are spawned to determine the size.
+
+The size is looked up in the following order:
+
+    shutil.get_terminal_size    honors the COLUMNS and LINES environment variables and
+                                queries the terminal connected to stdout
+    os.get_terminal_size        on stderr and stdin, when stdout is redirected
+    default                     80 columns and 25 lines
+
+API:
+    get_terminal_size()     Returns the cached (width, height) tuple.
+    on_resize(callback)     Registers a callback called with (width, height) on resize.
+    off_resize(callback)    Unregisters a resize callback.
+"""
+
 import os
-import shlex
-import struct
-import platform
-import subprocess
- 
- 
+import shutil
+import signal
+
+_DEFAULT_SIZE = (80, 25)
+
+_size = None
+_listeners = []
+_previous_handler = None
+
+
 def get_terminal_size():
-    """ getTerminalSize()
-     - get width and height of console
-     - works on linux,os x,windows,cygwin(windows)
-     originally retrieved from:
-     http://stackoverflow.com/questions/566746/how-to-get-console-window-width-in-python
+    """ Width and height of the terminal.
+
+    :return: {tuple} (width, height) in characters
     """
-    current_os = platform.system()
-    tuple_xy = None
-    if current_os == 'Windows':
-        tuple_xy = _get_terminal_size_windows()
-        if tuple_xy is None:
-            tuple_xy = _get_terminal_size_tput()
-            # needed for window's python in cygwin's xterm!
-    if current_os in ['Linux', 'Darwin'] or current_os.startswith('CYGWIN'):
-        tuple_xy = _get_terminal_size_linux()
-    if tuple_xy is None:
-        print "default"
-        tuple_xy = (80, 25)      # default value
-    return tuple_xy
- 
- 
-def _get_terminal_size_windows():
-    try:
-        from ctypes import windll, create_string_buffer
-        # stdin handle is -10
-        # stdout handle is -11
-        # stderr handle is -12
-        h = windll.kernel32.GetStdHandle(-12)
-        csbi = create_string_buffer(22)
-        res = windll.kernel32.GetConsoleScreenBufferInfo(h, csbi)
-        if res:
-            (bufx, bufy, curx, cury, wattr,
-             left, top, right, bottom,
-             maxx, maxy) = struct.unpack("hhhhHhhhhhh", csbi.raw)
-            sizex = right - left + 1
-            sizey = bottom - top + 1
-            return sizex, sizey
-    except:
-        pass
- 
+    global _size
+    if _size is None:
+        _size = _query()
+        _install_handler()
+    return _size
+
+
+def on_resize(callback):
+    """ Registers a callback that is called after the terminal was resized.
+
+    :param callback: {callable} called with the new (width, height) tuple
+    :return: None
+    """
+    get_terminal_size()
+    _listeners.append(callback)
 
-def _get_terminal_size_tput():
-    # get terminal width
-    # src: http://stackoverflow.com/questions/263890/how-do-i-find-the-width-height-of-a-terminal-window
+
+def off_resize(callback):
+    """ Unregisters a callback registered with on_resize().
+
+    :param callback: {callable} registered callback
+    :return: None
+    """
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def _query():
+    size = shutil.get_terminal_size((0, 0))
+    if size.columns > 0 and size.lines > 0:
+        return size.columns, size.lines
+    for fd in (2, 0):
+        try:
+            size = os.get_terminal_size(fd)
+        except (AttributeError, ValueError, OSError):
+            continue
+        if size.columns > 0 and size.lines > 0:
+            return size.columns, size.lines
+    return _DEFAULT_SIZE
+
+
+def _install_handler():
+    global _previous_handler
+    if not hasattr(signal, 'SIGWINCH'):
+        return
     try:
-        cols = int(subprocess.check_call(shlex.split('tput cols')))
-        rows = int(subprocess.check_call(shlex.split('tput lines')))
-        return (cols, rows)
-    except:
+        _previous_handler = signal.signal(signal.SIGWINCH, _handle_resize)
+    except ValueError:
+        # signal handlers can only be installed from the main thread
         pass
- 
- 
-def _get_terminal_size_linux():
-    def ioctl_GWINSZ(fd):
-        try:
-            import fcntl
-            import termios
-            cr = struct.unpack('hh',
-                               fcntl.ioctl(fd, termios.TIOCGWINSZ, '1234'))
-            return cr
-        except:
-            pass
-    cr = ioctl_GWINSZ(0) or ioctl_GWINSZ(1) or ioctl_GWINSZ(2)
-    if not cr:
-        try:
-            fd = os.open(os.ctermid(), os.O_RDONLY)
-            cr = ioctl_GWINSZ(fd)
-            os.close(fd)
-        except:
-            pass
-    if not cr:
-        try:
-            cr = (os.environ['LINES'], os.environ['COLUMNS'])
-        except:
-            return None
-    return int(cr[1]), int(cr[0])
- 
+
+
+def _handle_resize(signum, frame):
+    global _size
+    _size = _query()
+    for listener in list(_listeners):
+        listener(_size)
+    if callable(_previous_handler):
+        _previous_handler(signum, frame)
+
+
 if __name__ == "__main__":
     sizex, sizey = get_terminal_size()
-    print  'width =', sizex, 'height =', sizey
+    print('width = {} height = {}'.format(sizex, sizey))
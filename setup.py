@@ -18,7 +18,12 @@ setup(name='projects',
             'Operating System :: Microsoft :: Windows',
             'Operating System :: Unix',
             'License :: OSI Approved :: MIT License',
-            'Programming Language :: Python :: 2.7',
+            'Programming Language :: Python :: 3',
+            'Programming Language :: Python :: 3 :: Only',
+            'Programming Language :: Python :: 3.5',
+            'Programming Language :: Python :: 3.6',
+            'Programming Language :: Python :: 3.7',
+            'Programming Language :: Python :: 3.8',
             'Topic :: Text Processing :: Linguistic',
       ],
       url='https://github.com/tiborsimon/projects',
@@ -27,6 +32,7 @@ setup(name='projects',
       author_email='tibor@tiborsimon.io',
       license='MIT',
       packages=['projects'],
+      python_requires='>=3.5',
       test_suite='test',
       scripts=['bin/p', 'bin/pw'],
       include_package_data=True,
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import cache
+
+
+class Storage(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        patcher = mock.patch.object(cache, '_get_cache_path',
+                                    side_effect=lambda name: os.path.join(self.temp, 'cache', name + '.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def test__missing_cache__loads_empty(self):
+        self.assertEqual({}, cache.load('missing'))
+
+    def test__dumped_data_can_be_loaded(self):
+        cache.dump('name', {'a': [1, 2]})
+        self.assertEqual({'a': [1, 2]}, cache.load('name'))
+
+    def test__corrupted_cache__loads_empty(self):
+        os.makedirs(os.path.join(self.temp, 'cache'))
+        with open(os.path.join(self.temp, 'cache', 'broken.json'), 'w') as f:
+            f.write('{"truncated": ')
+        self.assertEqual({}, cache.load('broken'))
+
+    def test__no_temporary_file_is_left_behind(self):
+        cache.dump('name', {})
+        self.assertEqual(['name.json', 'name.lock'], sorted(os.listdir(os.path.join(self.temp, 'cache'))))
+
+    def test__every_write_increments_the_generation(self):
+        self.assertEqual(0, cache.get_generation('name'))
+        cache.dump('name', {'a': 1})
+        cache.merge('name', {'b': 2})
+        self.assertEqual(2, cache.get_generation('name'))
+        self.assertEqual({'a': 1, 'b': 2}, cache.load('name'))
+
+    def test__unchanged_update__is_not_written(self):
+        cache.dump('name', {'a': 1})
+        self.assertEqual({'a': 1}, cache.update('name', lambda data: None))
+        self.assertEqual(1, cache.get_generation('name'))
+
+    def test__failed_update__keeps_the_previous_snapshot(self):
+        cache.dump('name', {'a': 1})
+
+        def fail(data):
+            data['a'] = 2
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            cache.update('name', fail)
+        self.assertEqual({'a': 1}, cache.load('name'))
+        # the writer lock was released
+        cache.merge('name', {'b': 2})
+        self.assertEqual({'a': 1, 'b': 2}, cache.load('name'))
+
+    def test__unserializable_data__leaves_no_temporary_file(self):
+        with self.assertRaises(TypeError):
+            cache.dump('name', {'a': object()})
+        self.assertEqual(['name.lock'], os.listdir(os.path.join(self.temp, 'cache')))
+
+
+def _increment(temp, name, count):
+    with mock.patch.object(cache, '_get_cache_path', side_effect=lambda n: os.path.join(temp, n + '.json')):
+        for _ in range(count):
+            cache.update(name, lambda data: dict(data, counter=data.get('counter', 0) + 1))
+
+
+def _read_continuously(temp, name, duration, results):
+    with mock.patch.object(cache, '_get_cache_path', side_effect=lambda n: os.path.join(temp, n + '.json')):
+        previous = (0, 0)
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            generation = cache.get_generation(name)
+            counter = cache.load(name).get('counter', 0)
+            # the snapshots are whole and never go back in time
+            if generation < previous[0] or counter < previous[1]:
+                results.put('went back')
+                return
+            previous = (generation, counter)
+        results.put('ok')
+
+
+class Concurrency(TestCase):
+
+    _PROCESSES = 8
+    _UPDATES = 50
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp)
+
+    def test__concurrent_writers_lose_no_update_and_readers_see_whole_snapshots(self):
+        results = multiprocessing.Queue()
+        reader = multiprocessing.Process(target=_read_continuously, args=(self.temp, 'stress', 2.0, results))
+        reader.start()
+        writers = [multiprocessing.Process(target=_increment, args=(self.temp, 'stress', self._UPDATES))
+                   for _ in range(self._PROCESSES)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(60)
+            self.assertEqual(0, writer.exitcode)
+        reader.join(60)
+        self.assertEqual('ok', results.get(timeout=10))
+        with mock.patch.object(cache, '_get_cache_path',
+                               side_effect=lambda n: os.path.join(self.temp, n + '.json')):
+            self.assertEqual({'counter': self._PROCESSES * self._UPDATES}, cache.load('stress'))
+            self.assertEqual(self._PROCESSES * self._UPDATES, cache.get_generation('stress'))
+        self.assertEqual(['stress.json', 'stress.lock'], sorted(os.listdir(self.temp)))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import cas
+
+
+def _write(path, content):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _read(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+class CasTestCase(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.store = os.path.join(self.temp, 'cas')
+        self.root = os.path.join(self.temp, 'project')
+        os.makedirs(self.root)
+        patcher = mock.patch.object(cas, '_get_cas_path',
+                                    side_effect=lambda *parts: os.path.join(self.store, *parts))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+
+class Key(CasTestCase):
+
+    def test__same_inputs_produce_the_same_key(self):
+        _write(os.path.join(self.root, 'src', 'a.c'), 'int a;')
+        key_1 = cas.get_key('make', {'v': '1'}, self.root, ['src'])
+        key_2 = cas.get_key('make', {'v': '1'}, self.root, ['src'])
+        self.assertEqual(key_1, key_2)
+
+    def test__changed_input_content_changes_the_key(self):
+        _write(os.path.join(self.root, 'src', 'a.c'), 'int a;')
+        key_1 = cas.get_key('make', {}, self.root, ['src'])
+        _write(os.path.join(self.root, 'src', 'a.c'), 'int b;')
+        key_2 = cas.get_key('make', {}, self.root, ['src'])
+        self.assertNotEqual(key_1, key_2)
+
+    def test__command_text_and_variables_are_part_of_the_key(self):
+        key = cas.get_key('make', {'v': '1'}, self.root, [])
+        self.assertNotEqual(key, cas.get_key('make all', {'v': '1'}, self.root, []))
+        self.assertNotEqual(key, cas.get_key('make', {'v': '2'}, self.root, []))
+
+    def test__key_does_not_depend_on_the_checkout_location(self):
+        other_root = os.path.join(self.temp, 'sibling')
+        _write(os.path.join(self.root, 'src', 'a.c'), 'int a;')
+        _write(os.path.join(other_root, 'src', 'a.c'), 'int a;')
+        self.assertEqual(cas.get_key('make', {}, self.root, ['src']),
+                         cas.get_key('make', {}, other_root, ['src']))
+
+
+class StoreAndRestore(CasTestCase):
+
+    def test__missing_entry__restore_returns_false(self):
+        self.assertFalse(cas.restore('missing', self.root))
+
+    def test__contains_checks_the_entry_without_restoring(self):
+        _write(os.path.join(self.root, 'out.txt'), 'content')
+        self.assertFalse(cas.contains('key'))
+        cas.store('key', self.root, ['out.txt'])
+        os.remove(os.path.join(self.root, 'out.txt'))
+        self.assertTrue(cas.contains('key'))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'out.txt')))
+
+    def test__stored_outputs_can_be_restored(self):
+        _write(os.path.join(self.root, 'build', 'app'), 'binary')
+        _write(os.path.join(self.root, 'build', 'lib', 'x.so'), 'library')
+        cas.store('key', self.root, ['build'])
+        shutil.rmtree(os.path.join(self.root, 'build'))
+        self.assertTrue(cas.restore('key', self.root))
+        self.assertEqual('binary', _read(os.path.join(self.root, 'build', 'app')))
+        self.assertEqual('library', _read(os.path.join(self.root, 'build', 'lib', 'x.so')))
+
+    def test__restore_replaces_stale_outputs(self):
+        _write(os.path.join(self.root, 'out.txt'), 'fresh')
+        cas.store('key', self.root, ['out.txt'])
+        _write(os.path.join(self.root, 'out.txt'), 'stale')
+        cas.restore('key', self.root)
+        self.assertEqual('fresh', _read(os.path.join(self.root, 'out.txt')))
+
+    def test__outputs_can_be_restored_into_a_sibling_checkout(self):
+        other_root = os.path.join(self.temp, 'sibling')
+        os.makedirs(other_root)
+        _write(os.path.join(self.root, 'out.txt'), 'content')
+        cas.store('key', self.root, ['out.txt'])
+        self.assertTrue(cas.restore('key', other_root))
+        self.assertEqual('content', _read(os.path.join(other_root, 'out.txt')))
+
+    def test__executable_bit_is_preserved(self):
+        path = os.path.join(self.root, 'tool')
+        _write(path, '#!/bin/sh')
+        os.chmod(path, 0o755)
+        cas.store('key', self.root, ['tool'])
+        os.remove(path)
+        cas.restore('key', self.root)
+        self.assertTrue(os.access(path, os.X_OK))
+
+    def test__rebuild_in_place_does_not_change_the_stored_outputs(self):
+        source = os.path.join(self.root, 'src')
+        output = os.path.join(self.root, 'out', 'app')
+        _write(source, 'v1')
+        _write(output, 'v1')
+        old_key = cas.get_key('cat src > out/app', {}, self.root, ['src'])
+        cas.store(old_key, self.root, ['out'])
+        cas.restore(old_key, self.root)
+        _write(source, 'v2')
+        with open(output, 'w') as f:
+            f.write('v2')
+        cas.store(cas.get_key('cat src > out/app', {}, self.root, ['src']), self.root, ['out'])
+        self.assertTrue(cas.restore(old_key, self.root))
+        self.assertEqual('v1', _read(output))
+
+    def test__missing_output__raises_error(self):
+        with self.assertRaises(OSError):
+            cas.store('key', self.root, ['not-created'])
+
+
+class GarbageCollection(CasTestCase):
+
+    def _store(self, key, content, mtime):
+        _write(os.path.join(self.root, key), content)
+        cas.store(key, self.root, [key])
+        os.utime(os.path.join(self.store, 'entries', key), (mtime, mtime))
+
+    def test__store_within_limit__nothing_evicted(self):
+        self._store('a', 'x' * 10, 100)
+        self.assertEqual(0, cas.gc(100))
+        self.assertTrue(cas.restore('a', self.root))
+
+    def test__least_recently_used_entries_are_evicted_first(self):
+        self._store('old', 'o' * 10, 100)
+        self._store('new', 'n' * 10, 200)
+        self.assertEqual(1, cas.gc(15))
+        self.assertFalse(cas.restore('old', self.root))
+        self.assertTrue(cas.restore('new', self.root))
+
+    def test__shared_objects_survive_eviction_of_one_entry(self):
+        self._store('old', 'same', 100)
+        self._store('new', 'same', 200)
+        os.remove(os.path.join(self.root, 'new'))
+        cas.gc(0 + len('same'))
+        self.assertTrue(cas.restore('new', self.root))
+        self.assertEqual('same', _read(os.path.join(self.root, 'new')))
+
+    def test__temporary_files_of_a_concurrent_store_are_kept(self):
+        self._store('a', 'x' * 10, 100)
+        temp_path = os.path.join(self.store, 'objects', 'ab', 'abcdef.123.tmp')
+        _write(temp_path, 'in flight')
+        cas.gc(100)
+        self.assertTrue(os.path.exists(temp_path))
+
+    def test__object_evicted_during_restore__is_a_cache_miss(self):
+        self._store('a', 'x' * 10, 100)
+
+        def evicted(src, dst, hardlink=False):
+            shutil.rmtree(os.path.join(self.store, 'objects'))
+            raise OSError('vanished')
+
+        with mock.patch.object(cas.files, 'clone', side_effect=evicted):
+            self.assertFalse(cas.restore('a', self.root))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'a')))
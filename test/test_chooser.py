@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import threading
+import time
+from unittest import TestCase
+from unittest import skipIf
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import chooser
+from projects import render
+from projects import terminalsize
+
+try:
+    import pty
+except ImportError:
+    pty = None
+
+
+class Matching(TestCase):
+
+    def test__subsequence_matches_are_returned(self):
+        matcher = chooser.Matcher(['projects', 'dotfiles', 'parser'])
+        self.assertEqual(['parser', 'projects'], sorted(matcher.update('prs')))
+
+    def test__matching_is_case_insensitive(self):
+        matcher = chooser.Matcher(['MyProject'])
+        self.assertEqual(['MyProject'], matcher.update('myp'))
+
+    def test__consecutive_and_word_start_matches_rank_first(self):
+        matcher = chooser.Matcher(['a-b-c-l-i', 'cli-tool', 'xclix'])
+        self.assertEqual(['cli-tool', 'xclix', 'a-b-c-l-i'], matcher.update('cli'))
+
+    def test__empty_query_keeps_the_original_order(self):
+        matcher = chooser.Matcher(['b', 'a'])
+        self.assertEqual(['b', 'a'], matcher.update(''))
+
+    def test__extended_query_only_scores_previous_candidates(self):
+        names = ['alpha', 'beta', 'alphabet']
+        matcher = chooser.Matcher(names)
+        matcher.update('al')
+        with mock.patch.object(chooser, '_score', wraps=chooser._score) as mock_score:
+            matcher.update('alp')
+        self.assertEqual(2, mock_score.call_count)
+
+    def test__shortened_query_reuses_computed_candidates(self):
+        matcher = chooser.Matcher(['alpha', 'beta'])
+        matcher.update('a')
+        matcher.update('al')
+        with mock.patch.object(chooser, '_score') as mock_score:
+            self.assertEqual(['alpha', 'beta'], matcher.update('a'))
+        self.assertFalse(mock_score.called)
+
+
+class Input(TestCase):
+
+    def setUp(self):
+        self.renderer = mock.Mock()
+        self.renderer.get_page_size.return_value = 10
+        self.chooser = chooser.Chooser(['alpha', 'beta', 'gamma'], self.renderer)
+
+    def test__typing_filters_the_list(self):
+        self.chooser.feed('ga')
+        self.assertEqual('ga', self.chooser.query)
+        self.assertEqual(['gamma'], self.chooser.matches)
+        self.renderer.set_names.assert_called_with(['gamma'])
+
+    def test__backspace_shortens_the_filter(self):
+        self.chooser.feed('gx\x7f')
+        self.assertEqual('g', self.chooser.query)
+        self.assertEqual(['gamma'], self.chooser.matches)
+
+    def test__enter_chooses_the_selected_match(self):
+        self.chooser.feed(chooser._KEY_DOWN + chooser._KEY_DOWN + chooser._KEY_UP + '\r')
+        self.assertTrue(self.chooser.done)
+        self.assertEqual('beta', self.chooser.result)
+
+    def test__keys_after_enter_are_ignored(self):
+        self.chooser.feed('\rb')
+        self.assertEqual('alpha', self.chooser.result)
+        self.assertEqual('', self.chooser.query)
+
+    def test__escape_cancels_when_nothing_follows(self):
+        self.chooser.feed('\x1b')
+        self.assertFalse(self.chooser.done)
+        self.chooser.flush()
+        self.assertTrue(self.chooser.done)
+        self.assertEqual(None, self.chooser.result)
+
+    def test__escape_followed_by_a_key_cancels(self):
+        self.chooser.feed('\x1bb')
+        self.assertTrue(self.chooser.done)
+        self.assertEqual('', self.chooser.query)
+
+    def test__escape_sequence_split_between_reads(self):
+        self.chooser.feed('\x1b')
+        self.chooser.feed('[')
+        self.chooser.feed('B')
+        self.assertFalse(self.chooser.done)
+        self.assertEqual('', self.chooser.pending)
+        self.assertEqual(1, self.chooser.selected)
+
+    def test__unknown_escape_sequences_are_ignored(self):
+        self.chooser.feed('\x1b[C\x1b[1;5D\x1bOH\x1b[2~a')
+        self.chooser.flush()
+        self.assertFalse(self.chooser.done)
+        self.assertEqual('a', self.chooser.query)
+
+    def test__enter_without_matches_cancels(self):
+        self.chooser.feed('xyz\n')
+        self.assertTrue(self.chooser.done)
+        self.assertEqual(None, self.chooser.result)
+
+    def test__page_down_moves_the_selection_by_a_page(self):
+        self.renderer.get_page_size.return_value = 2
+        self.chooser.feed(chooser._KEY_PAGE_DOWN)
+        self.assertEqual(2, self.chooser.selected)
+
+    def test__draw_shows_the_query_in_the_header(self):
+        self.chooser.feed('al')
+        self.chooser.draw()
+        self.renderer.set_header.assert_called_with(chooser._PROMPT.format('al'))
+        self.renderer.select.assert_called_with(0)
+        self.renderer.draw.assert_called_with()
+
+
+@skipIf(pty is None, 'needs a pseudo terminal')
+class Terminal(TestCase):
+
+    def setUp(self):
+        self.master, self.slave = os.openpty()
+        self.addCleanup(os.close, self.master)
+        self.addCleanup(os.close, self.slave)
+        self.stream = io.StringIO()
+        for name, value in (('_size', None), ('_listeners', []), ('_previous_handler', None)):
+            patcher = mock.patch.object(terminalsize, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(terminalsize, '_query', return_value=(80, 25))
+        self.mock_query = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _wait_for_frames(self, count):
+        deadline = time.time() + 5
+        while self.stream.getvalue().count(render._CLEAR_SCREEN) < count and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(count, self.stream.getvalue().count(render._CLEAR_SCREEN))
+
+    def test__resize_redraws_the_list(self):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(
+            chooser.choose(['alpha', 'beta'], {}, self.stream, self.slave)))
+        thread.start()
+        try:
+            self._wait_for_frames(1)
+            self.mock_query.return_value = (40, 10)
+            terminalsize._handle_resize(None, None)
+            self._wait_for_frames(2)
+        finally:
+            os.write(self.master, b'\r')
+            thread.join(5)
+        self.assertEqual(['alpha'], result)
+        self.assertEqual([], terminalsize._listeners)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase, skipIf
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import completion
+
+
+def _write(path, content):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class CompletionTestCase(TestCase):
+
+    def setUp(self):
+        self.temp = os.path.realpath(tempfile.mkdtemp())
+        self.root = os.path.join(self.temp, 'projects')
+        self.cache_path = os.path.join(self.temp, 'completion')
+        _write(os.path.join(self.root, 'alpha', 'Projectfile'), 'from v1.0.0\nbuild|b:\n  make\ntest:\n  make test\n')
+        _write(os.path.join(self.root, 'broken', 'Projectfile'), 'invalid\n')
+        os.makedirs(os.path.join(self.root, 'beta'))
+        patcher = mock.patch.object(completion, '_get_completion_path', return_value=self.cache_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        data_patcher = mock.patch.object(completion.config, 'data_path',
+                                         side_effect=lambda *parts: os.path.join(self.temp, 'data', *parts))
+        data_patcher.start()
+        self.addCleanup(data_patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def _read_cache(self):
+        with open(self.cache_path, 'r') as f:
+            return [line.rstrip('\n').split('\t') for line in f]
+
+
+class Generation(CompletionTestCase):
+
+    def test__cache_contains_projects_subcommands_and_commands(self):
+        completion.generate({'projects-path': self.root}, ['status', 'completion'], self.temp)
+        records = self._read_cache()
+        self.assertIn([':roots', self.root], records)
+        self.assertIn([':subcommands', 'completion', 'status'], records)
+        self.assertIn([':projects', 'alpha', 'beta', 'broken'], records)
+        self.assertIn([os.path.join(self.root, 'alpha'), 'b', 'build', 'test'], records)
+
+    def test__invalid_projectfile_is_recorded_without_commands(self):
+        completion.generate({'projects-path': self.root}, [], self.temp)
+        self.assertIn([os.path.join(self.root, 'broken'), ''], self._read_cache())
+
+    def test__projectfile_of_the_current_directory_is_included(self):
+        nested = os.path.join(self.root, 'beta', 'sub')
+        _write(os.path.join(nested, 'Projectfile'), 'from v1.0.0\ndeploy:\n  echo\n')
+        completion.generate({'projects-path': self.root}, [], os.path.join(nested, 'deep'))
+        self.assertIn([nested, 'deploy'], self._read_cache())
+
+    def test__inherited_commands_are_included(self):
+        nested = os.path.join(self.root, 'alpha', 'sub')
+        _write(os.path.join(nested, 'Projectfile'), 'from v1.0.0\ndeploy:\n  echo\n')
+        completion.generate({'projects-path': self.root}, [], nested)
+        self.assertIn([nested, 'b', 'build', 'deploy', 'test'], self._read_cache())
+
+    def test__unsupported_shell__raises_error(self):
+        with self.assertRaises(completion.CompletionError) as cm:
+            completion.get_script('fish')
+        self.assertEqual(completion._UNSUPPORTED_SHELL_ERROR.format('fish'), cm.exception.args[0])
+
+
+@skipIf(not os.path.exists('/bin/bash'), 'bash is not available')
+class BashScript(CompletionTestCase):
+
+    def setUp(self):
+        super(BashScript, self).setUp()
+        self.bin = os.path.join(self.temp, 'bin')
+        self.calls = os.path.join(self.temp, 'calls')
+        _write(os.path.join(self.bin, 'p'), '#!/bin/sh\necho call >> {}\n{} -c "{}"\n'.format(
+            self.calls, sys.executable,
+            'from projects import completion; '
+            'completion._get_completion_path = lambda: \'{}\'; '
+            'completion.generate({{\'projects-path\': \'{}\'}}, [\'status\'], \'.\')'.format(
+                self.cache_path, self.root)))
+        os.chmod(os.path.join(self.bin, 'p'), 0o755)
+
+    def _complete(self, cwd, word=''):
+        script = completion.get_script('bash') + '\nCOMP_WORDS=(p {}); COMP_CWORD=1; _p_complete; echo "${{COMPREPLY[*]}}"'.format(word)
+        env = dict(os.environ)
+        env['PATH'] = self.bin + os.pathsep + env['PATH']
+        env['P_COMPLETION_CACHE'] = self.cache_path
+        env['HOME'] = self.temp
+        env['PWD'] = cwd
+        env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(completion.__file__)))
+        output = subprocess.check_output(['/bin/bash', '-c', script], cwd=cwd, env=env)
+        return sorted(output.decode('utf-8').split())
+
+    def _python_calls(self):
+        if not os.path.exists(self.calls):
+            return 0
+        with open(self.calls, 'r') as f:
+            return len(f.readlines())
+
+    def test__missing_cache_is_generated_once(self):
+        alpha = os.path.join(self.root, 'alpha')
+        self.assertEqual(['b', 'build', 'status', 'test'], self._complete(alpha))
+        self.assertEqual(['b', 'build'], self._complete(alpha, 'b'))
+        self.assertEqual(1, self._python_calls())
+
+    def test__project_names_are_completed_outside_projects(self):
+        self.assertEqual(['alpha', 'beta', 'broken', 'status'], self._complete(self.temp))
+
+    def test__symlinked_projects_path__cache_is_used(self):
+        link = os.path.join(self.temp, 'link')
+        os.symlink(self.root, link)
+        alpha = os.path.join(link, 'alpha')
+        self.assertEqual(['b', 'build', 'status', 'test'], self._complete(alpha))
+        self.assertEqual(['b', 'build', 'status', 'test'], self._complete(alpha))
+        self.assertEqual(1, self._python_calls())
+
+    def test__changed_projectfile_regenerates_the_cache(self):
+        alpha = os.path.join(self.root, 'alpha')
+        self._complete(alpha)
+        future = time.time() + 10
+        _write(os.path.join(alpha, 'Projectfile'), 'from v1.0.0\nlint:\n  flake8\n')
+        os.utime(os.path.join(alpha, 'Projectfile'), (future, future))
+        self.assertEqual(['lint', 'status'], self._complete(alpha))
+        self.assertEqual(2, self._python_calls())
+
+    def test__changed_parent_projectfile_regenerates_the_cache(self):
+        alpha = os.path.join(self.root, 'alpha')
+        nested = os.path.join(alpha, 'sub')
+        _write(os.path.join(nested, 'Projectfile'), 'from v1.0.0\ndeploy:\n  echo\n')
+        self._complete(nested)
+        future = time.time() + 10
+        _write(os.path.join(alpha, 'Projectfile'), 'from v1.0.0\nlint:\n  flake8\n')
+        os.utime(os.path.join(alpha, 'Projectfile'), (future, future))
+        self.assertEqual(['deploy', 'lint', 'status'], self._complete(nested))
+        self.assertEqual(2, self._python_calls())
@@ -98,6 +98,21 @@ class Validation(TestCase):
             config._validate(invalid_config)
         self.assertEqual(cm.exception.__class__, ValueError)
 
+    def test__list_of_projects_paths__no_exception_raised(self):
+        config._validate({'projects-path': ['~/projects', '~/work']})
+
+    def test__invalid_projects_path_list__raises_value_error(self):
+        for value in ([], ['~/projects', 42]):
+            with self.assertRaises(ValueError):
+                config._validate({'projects-path': value})
+
+    def test__numeric_values_can_be_fractions(self):
+        config._validate({'projects-path': '~/projects', 'hook-timeout': 0.5, 'log-max-age': 1.5, 'cache-size': 512})
+
+    def test__numeric_value_given_as_string__raises_value_error(self):
+        with self.assertRaises(ValueError):
+            config._validate({'projects-path': '~/projects', 'hook-timeout': '0.5'})
+
 
 class Creation(TestCase):
 
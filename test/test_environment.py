@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import environment
+
+
+class EnvironmentTestCase(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp)
+        self.cached = {}
+        cache_patcher = mock.patch.object(environment, 'cache', autospec=True)
+        mock_cache = cache_patcher.start()
+        mock_cache.load.side_effect = lambda name: dict(self.cached)
+        mock_cache.update.side_effect = lambda name, function: setattr(self, 'cached', function(dict(self.cached)))
+        self.addCleanup(cache_patcher.stop)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.temp, name), 'w') as f:
+            f.write(content)
+
+
+class Snapshot(EnvironmentTestCase):
+
+    def test__variables_set_by_the_scripts_are_captured(self):
+        self._write('env.sh', 'export P_TEST_TOOL=/opt/tool\nexport PATH="/opt/tool/bin:$PATH"\necho loaded\n')
+        diff = environment.get_diff(['env.sh'], self.temp)
+        self.assertEqual({'P_TEST_TOOL': '/opt/tool', 'PATH': '/opt/tool/bin:' + os.environ['PATH']}, diff['set'])
+        self.assertEqual([], diff['unset'])
+
+    def test__unset_variables_are_captured(self):
+        self._write('env.sh', 'unset P_TEST_REMOVED\n')
+        with mock.patch.dict(os.environ, {'P_TEST_REMOVED': '1'}):
+            diff = environment.get_diff(['env.sh'], self.temp)
+        self.assertEqual(['P_TEST_REMOVED'], diff['unset'])
+
+    def test__snapshot_is_reused_until_a_script_changes(self):
+        self._write('env.sh', 'export P_TEST_VALUE=1\n')
+        environment.get_diff(['env.sh'], self.temp)
+        with mock.patch.object(environment.subprocess, 'Popen') as mock_popen:
+            diff = environment.get_diff(['env.sh'], self.temp)
+        self.assertFalse(mock_popen.called)
+        self.assertEqual({'P_TEST_VALUE': '1'}, diff['set'])
+        self._write('env.sh', 'export P_TEST_VALUE=2\n')
+        self.assertEqual({'P_TEST_VALUE': '2'}, environment.get_diff(['env.sh'], self.temp)['set'])
+
+    def test__only_the_latest_snapshots_are_kept(self):
+        with mock.patch.object(environment, '_KEPT_SNAPSHOTS', 2):
+            for value in range(3):
+                self._write('env.sh', 'export P_TEST_VALUE={}\n'.format(value))
+                environment.get_diff(['env.sh'], self.temp)
+        self.assertEqual(2, len(self.cached))
+
+    def test__missing_script__raises_error(self):
+        with self.assertRaises(environment.EnvironmentSetupError) as cm:
+            environment.get_diff(['missing.sh'], self.temp)
+        path = os.path.join(self.temp, 'missing.sh')
+        self.assertEqual(environment._MISSING_SCRIPT_ERROR.format(path), cm.exception.args[0])
+
+    def test__failing_script__raises_error(self):
+        self._write('env.sh', 'exit 3\n')
+        with self.assertRaises(environment.EnvironmentSetupError) as cm:
+            environment.get_diff(['env.sh'], self.temp)
+        self.assertEqual(environment._SETUP_FAILED_ERROR.format(3), cm.exception.args[0])
+        self.assertEqual({}, self.cached)
+
+
+class Apply(TestCase):
+
+    def test__diff_is_applied_to_a_copy(self):
+        base = {'HOME': '/home/user', 'OLD': '1', 'PATH': '/bin'}
+        result = environment.apply({'set': {'PATH': '/venv/bin:/bin'}, 'unset': ['OLD']}, base)
+        self.assertEqual({'HOME': '/home/user', 'PATH': '/venv/bin:/bin'}, result)
+        self.assertEqual('1', base['OLD'])
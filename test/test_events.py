@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import threading
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import events
+
+
+class Emit(TestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        stream_patcher = mock.patch.object(events, '_stream', None)
+        stream_patcher.start()
+        self.addCleanup(stream_patcher.stop)
+
+    def _records(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test__disabled_by_default(self):
+        self.assertFalse(events.enabled())
+
+    def test__events_are_written_one_per_line(self):
+        events.enable(self.stream)
+        events.emit('project', {'name': 'p', 'path': '/projects/p'})
+        events.emit('result', {'status': 0})
+        self.assertTrue(events.enabled())
+        self.assertEqual([
+            {'event': 'project', 'version': events._VERSION, 'name': 'p', 'path': '/projects/p'},
+            {'event': 'result', 'version': events._VERSION, 'status': 0}
+        ], self._records())
+
+    def test__every_event_is_flushed_immediately(self):
+        stream = mock.Mock()
+        events.enable(stream)
+        events.emit('start', {'command': 'build'})
+        stream.write.assert_called_once_with('{"command":"build","event":"start","version":1}\n')
+        stream.flush.assert_called_once_with()
+
+    def test__concurrent_events_are_not_interleaved(self):
+        events.enable(self.stream)
+        threads = [threading.Thread(target=lambda i=i: [events.emit('finish', {'command': 'c{}'.format(i)})
+                                                          for _ in range(100)]) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(400, len(self._records()))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import gitstatus
+
+
+def _status(**kwargs):
+    status = {'path': '/p/a', 'branch': 'master', 'dirty': 0, 'ahead': None, 'behind': None, 'error': None}
+    status.update(kwargs)
+    return status
+
+
+class Porcelain(TestCase):
+
+    def test__branch_and_ahead_behind_are_parsed(self):
+        output = '# branch.oid abc\n# branch.head feature\n# branch.upstream origin/feature\n# branch.ab +2 -3\n'
+        result = gitstatus._parse_porcelain('/p/a', output)
+        self.assertEqual(_status(branch='feature', ahead=2, behind=3), result)
+
+    def test__changed_and_untracked_entries_are_counted(self):
+        output = '# branch.head master\n1 .M N... 100644 100644 100644 a a file\n? new_file\n'
+        result = gitstatus._parse_porcelain('/p/a', output)
+        self.assertEqual(2, result['dirty'])
+        self.assertEqual(None, result['ahead'])
+
+    def test__detached_head(self):
+        result = gitstatus._parse_porcelain('/p/a', '# branch.head (detached)\n')
+        self.assertEqual(None, result['branch'])
+
+
+class Formatting(TestCase):
+
+    def test__clean_repository(self):
+        self.assertEqual('a  master', gitstatus.format_status('a', _status()))
+
+    def test__dirty_repository_with_upstream_difference(self):
+        result = gitstatus.format_status('a', _status(dirty=3, ahead=1, behind=2))
+        self.assertEqual('a  master  *3  +1  -2', result)
+
+    def test__error(self):
+        result = gitstatus.format_status('a', _status(error='timeout'))
+        self.assertEqual('a  error: timeout', result)
+
+
+class Streaming(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.cached = {}
+        patcher = mock.patch.object(gitstatus, 'cache', autospec=True)
+        mock_cache = patcher.start()
+        mock_cache.load.side_effect = lambda name: dict(self.cached)
+        mock_cache.dump.side_effect = lambda name, data: self.cached.update(data)
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def _create_repository(self, name):
+        path = os.path.join(self.temp, name)
+        os.makedirs(path)
+        subprocess.check_call(['git', 'init', '-q', '-b', 'main', path])
+        with open(os.path.join(path, 'file'), 'w') as f:
+            f.write('content')
+        return path
+
+    def test__every_repository_is_reported(self):
+        paths = [self._create_repository('a'), self._create_repository('b')]
+        reported = []
+        gitstatus.stream(paths, reported.append, jobs=1)
+        self.assertEqual(sorted(paths), sorted(status['path'] for status in reported))
+        self.assertEqual(['main', 'main'], [status['branch'] for status in reported])
+        self.assertEqual([1, 1], [status['dirty'] for status in reported])
+
+    def test__unchanged_repository_is_served_from_cache(self):
+        path = self._create_repository('a')
+        gitstatus.stream([path], lambda status: None)
+        with mock.patch.object(gitstatus, '_query_all') as mock_query:
+            result = gitstatus.stream([path], lambda status: None)
+        self.assertFalse(mock_query.called)
+        self.assertEqual(path, result[0]['path'])
+
+    def test__hanging_repository_times_out(self):
+        path = self._create_repository('a')
+
+        def slow_exec(*args, **kwargs):
+            return original_exec('sleep', '5', stdout=kwargs['stdout'], stderr=kwargs['stderr'])
+
+        original_exec = gitstatus.asyncio.create_subprocess_exec
+        with mock.patch.object(gitstatus.asyncio, 'create_subprocess_exec', new=slow_exec):
+            result = gitstatus.stream([path], lambda status: None, timeout=0.1)
+        self.assertEqual(gitstatus._TIMEOUT_ERROR, result[0]['error'])
+        self.assertEqual({}, self.cached)
+
+    def test__repositories_are_listed_from_the_projects_path(self):
+        path = self._create_repository('repo')
+        os.makedirs(os.path.join(self.temp, 'not-a-repo'))
+        self.assertEqual([path], gitstatus.get_repositories(self.temp))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import hierarchy
+from projects import runner
+
+_ROOT_PROJECTFILE = '''from v1.0.0
+
+target = all
+name = root
+
+build|b: [compile]
+  echo build {{target}}
+
+compile:
+  echo compile {{name}}
+
+test: [build]
+  echo test
+'''
+
+_CHILD_PROJECTFILE = '''from v1.0.0
+
+name = child
+
+compile:
+  echo child compile {{name}} {{target}}
+
+package: [build]
+  echo package
+'''
+
+
+class HierarchyTestCase(TestCase):
+
+    def setUp(self):
+        self.temp = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp)
+        self.child = os.path.join(self.temp, 'lib', 'child')
+        os.makedirs(os.path.join(self.child, 'src'))
+        self.root_path = self._write(self.temp, _ROOT_PROJECTFILE)
+        self.child_path = self._write(self.child, _CHILD_PROJECTFILE)
+        self.cached = {}
+        for module in (hierarchy, hierarchy.lookup):
+            cache_patcher = mock.patch.object(module, 'cache', autospec=True)
+            mock_cache = cache_patcher.start()
+            mock_cache.load.side_effect = lambda name: dict(self.cached.get(name, {}))
+            mock_cache.dump.side_effect = lambda name, data: self.cached.setdefault(name, {}).update(data)
+            mock_cache.merge.side_effect = lambda name, entries: self.cached.setdefault(name, {}).update(entries)
+            self.addCleanup(cache_patcher.stop)
+
+    def _write(self, directory, source):
+        path = os.path.join(directory, 'Projectfile')
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+
+class Merging(HierarchyTestCase):
+
+    def test__child_sees_parent_commands(self):
+        namespace = hierarchy.get_namespace(self.temp, self.child_path)
+        self.assertEqual(['b', 'build', 'compile', 'package', 'test'], hierarchy.get_command_names(namespace))
+
+    def test__child_command_shadows_parent(self):
+        namespace = hierarchy.get_namespace(self.temp, self.child_path)
+        self.assertEqual(self.child, namespace['commands']['compile']['directory'])
+
+    def test__inherited_command_keeps_its_scope(self):
+        namespace = hierarchy.get_namespace(self.temp, self.child_path)
+        qualified = '{}:compile'.format(self.temp)
+        self.assertEqual([qualified], namespace['commands']['build']['dependencies'])
+        self.assertEqual(self.temp, namespace['commands'][qualified]['directory'])
+
+    def test__variables_are_scoped(self):
+        namespace = hierarchy.get_namespace(self.temp, self.child_path)
+        self.assertEqual({'target': 'all', 'name': 'root'}, namespace['scopes'][self.temp])
+        self.assertEqual({'target': 'all', 'name': 'child'}, namespace['scopes'][self.child])
+
+    def test__environment_scripts_are_inherited(self):
+        self._write(self.temp, _ROOT_PROJECTFILE.replace('target = all', 'source env.sh\ntarget = all'))
+        self._write(self.child, _CHILD_PROJECTFILE.replace('name = child', 'name = child\nsource /opt/env.sh'))
+        namespace = hierarchy.get_namespace(self.temp, self.child_path)
+        self.assertEqual([os.path.join(self.temp, 'env.sh')], namespace['environments'][self.temp])
+        self.assertEqual([os.path.join(self.temp, 'env.sh'), '/opt/env.sh'], namespace['environments'][self.child])
+
+    def test__aliases_refer_to_their_own_scope(self):
+        self._write(self.child, _CHILD_PROJECTFILE + '\nbuild:\n  echo child build\n')
+        namespace = hierarchy.get_namespace(self.temp, self.child_path)
+        self.assertEqual('{}:build'.format(self.temp), namespace['commands']['b']['alias'])
+
+    def test__every_projectfile_of_the_project_is_merged(self):
+        namespaces = hierarchy.get_namespaces(self.temp)
+        self.assertEqual(sorted([self.temp, self.child]), sorted(namespaces))
+        self.assertNotIn('package', namespaces[self.temp]['commands'])
+
+    def test__merged_commands_run_in_their_scope(self):
+        namespace = hierarchy.get_namespace(self.temp, self.child_path)
+        with mock.patch.object(runner, '_execute') as mock_execute:
+            runner.run(namespace, 'package', self.child)
+        calls = [(call[0][0], call[0][1].split('\n')[-1], call[0][2]) for call in mock_execute.call_args_list]
+        self.assertEqual([
+            ('{}:compile'.format(self.temp), 'echo compile root', self.temp),
+            ('build', 'echo build all', self.temp),
+            ('package', 'echo package', self.child)
+        ], calls)
+
+
+class Caching(HierarchyTestCase):
+
+    def test__unchanged_tree_is_not_parsed_again(self):
+        hierarchy.get_namespaces(self.temp)
+        with mock.patch.object(hierarchy.projectfile, 'get') as mock_get:
+            hierarchy.get_namespaces(self.temp)
+            hierarchy.get_namespace(self.temp, self.child_path)
+        self.assertFalse(mock_get.called)
+
+    def test__only_the_changed_subtree_is_rebuilt(self):
+        hierarchy.get_namespaces(self.temp)
+        self._write(self.child, _CHILD_PROJECTFILE + '\nextra:\n  echo extra\n')
+        with mock.patch.object(hierarchy, '_merge', wraps=hierarchy._merge) as mock_merge:
+            namespaces = hierarchy.get_namespaces(self.temp)
+        self.assertEqual(1, mock_merge.call_count)
+        self.assertIn('extra', namespaces[self.child]['commands'])
+
+    def test__changed_parent_rebuilds_its_children(self):
+        hierarchy.get_namespaces(self.temp)
+        self._write(self.temp, _ROOT_PROJECTFILE + '\nlint:\n  echo lint\n')
+        namespace = hierarchy.get_namespace(self.temp, self.child_path)
+        self.assertIn('lint', namespace['commands'])
+
+    def test__changed_parent_rebuilds_every_sibling(self):
+        sibling = os.path.join(self.temp, 'lib', 'sibling')
+        os.makedirs(sibling)
+        sibling_path = self._write(sibling, _CHILD_PROJECTFILE)
+        hierarchy.get_namespace(self.temp, self.child_path)
+        hierarchy.get_namespace(self.temp, sibling_path)
+        self._write(self.temp, _ROOT_PROJECTFILE.replace('target = all', 'target = none'))
+        os.utime(self.root_path, (0, 0))
+        first = hierarchy.get_namespace(self.temp, sibling_path)
+        second = hierarchy.get_namespace(self.temp, self.child_path)
+        self.assertEqual('none', first['variables']['target'])
+        self.assertEqual('none', second['variables']['target'])
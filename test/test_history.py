@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import history
+
+
+class HistoryTestCase(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp)
+        self.path = os.path.join(self.temp, 'p', 'history.db')
+        path_patcher = mock.patch.object(history, '_get_history_path', return_value=self.path)
+        path_patcher.start()
+        self.addCleanup(path_patcher.stop)
+
+
+class Recording(HistoryTestCase):
+
+    def test__runs_are_recorded_latest_first(self):
+        history.record('/project', 'build', 1.5, 0, 'abc')
+        history.record('/project', 'build', 2.5, 2, 'def')
+        runs = history.get_runs('/project', 'build')
+        self.assertEqual([(2.5, 2, 'def'), (1.5, 0, 'abc')],
+                         [(run['duration'], run['status'], run['fingerprint']) for run in runs])
+
+    def test__runs_are_separated_by_project_and_command(self):
+        history.record('/project', 'build', 1.0, 0)
+        history.record('/other', 'build', 1.0, 0)
+        history.record('/project', 'test', 1.0, 0)
+        self.assertEqual(1, len(history.get_runs('/project', 'build')))
+
+    def test__only_the_latest_runs_are_kept(self):
+        with mock.patch.object(history, '_KEPT_RUNS', 3):
+            for duration in range(5):
+                history.record('/project', 'build', duration, 0)
+        self.assertEqual([4, 3, 2], [run['duration'] for run in history.get_runs('/project', 'build')])
+
+    def test__unusable_database__is_ignored(self):
+        os.makedirs(self.path)
+        history.record('/project', 'build', 1.0, 0)
+        self.assertEqual({}, history.get_estimates('/project', ['build']))
+        self.assertEqual([], history.get_runs('/project', 'build'))
+
+
+def _record_runs(path, command, count):
+    with mock.patch.object(history, '_get_history_path', return_value=path):
+        for _ in range(count):
+            history.record('/project', command, 1.0, 0)
+
+
+class Concurrency(HistoryTestCase):
+
+    def test__concurrent_processes_record_every_run(self):
+        history.record('/project', 'setup', 1.0, 0)
+        processes = [multiprocessing.Process(target=_record_runs, args=(self.path, 'command{}'.format(i), 20))
+                     for i in range(6)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        for i in range(6):
+            self.assertEqual(20, len(history.get_runs('/project', 'command{}'.format(i))))
+
+
+class Estimates(HistoryTestCase):
+
+    def test__estimate_is_the_average_of_the_latest_successful_runs(self):
+        with mock.patch.object(history, '_ESTIMATE_RUNS', 2):
+            for duration, status in ((100.0, 0), (2.0, 0), (50.0, 1), (4.0, 0)):
+                history.record('/project', 'build', duration, status)
+            self.assertEqual({'build': 3.0}, history.get_estimates('/project', ['build', 'test']))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import interpolation
+
+
+class Template(TestCase):
+
+    def test__line_without_references__single_literal(self):
+        self.assertEqual(('make all',), interpolation.get_template('make all'))
+
+    def test__references_are_on_odd_indexes(self):
+        result = interpolation.get_template('scp {{file}} {{ host }}:/tmp')
+        self.assertEqual(('scp ', 'file', ' ', 'host', ':/tmp'), result)
+
+    def test__shell_braces_are_left_alone(self):
+        self.assertEqual(('echo ${HOME} {a,b}',), interpolation.get_template('echo ${HOME} {a,b}'))
+
+    def test__templates_of_other_tools_are_left_alone(self):
+        line = "docker ps --format '{{.Names}} {{ .Image }}'"
+        self.assertEqual((line,), interpolation.get_template(line))
+
+    def test__escaped_braces_are_literal(self):
+        result = interpolation.get_template("echo \\{{name}} {{name}} \\{{")
+        self.assertEqual(('echo {{name}} ', 'name', ' {{'), result)
+
+    def test__same_line_is_compiled_only_once(self):
+        line = 'echo {{compiled-once}}'
+        self.assertIs(interpolation.get_template(line), interpolation.get_template(line))
+
+
+class References(TestCase):
+
+    def test__references_are_listed_in_order(self):
+        self.assertEqual(('host', 'path'), interpolation.get_references('{{host}}/{{ path }}'))
+
+    def test__line_without_references(self):
+        self.assertEqual((), interpolation.get_references('echo done'))
+
+
+class Resolving(TestCase):
+
+    def test__plain_variable_is_rendered(self):
+        resolver = interpolation.Resolver({'deploy_url': 'hello_imre'})
+        self.assertEqual('deploy hello_imre', resolver.render('deploy {{deploy_url}}'))
+
+    def test__nested_references_are_resolved(self):
+        resolver = interpolation.Resolver({'url': 'https://{{host}}', 'host': 'example.com'})
+        self.assertEqual('https://example.com', resolver.resolve('url'))
+
+    def test__self_reference__raises_error(self):
+        resolver = interpolation.Resolver({'a': 'x{{a}}'})
+        with self.assertRaises(interpolation.InterpolationError) as cm:
+            resolver.resolve('a')
+        self.assertEqual(interpolation._CIRCULAR_REFERENCE_ERROR.format('a -> a'), cm.exception.args[0])
+
+
+class ShellVariables(TestCase):
+
+    def test__shell_variable_is_evaluated(self):
+        resolver = interpolation.Resolver({'greeting': '`echo hello`'})
+        self.assertEqual('hello', resolver.resolve('greeting'))
+
+    def test__shell_variable_can_reference_other_variables(self):
+        resolver = interpolation.Resolver({'name': 'world', 'greeting': '`echo hello {{name}}`'})
+        self.assertEqual('hello world', resolver.resolve('greeting'))
+
+    @mock.patch.object(interpolation, 'subprocess', autospec=True)
+    def test__shell_variable_is_evaluated_only_once(self, mock_subprocess):
+        mock_subprocess.Popen.return_value.communicate.return_value = (b'abc123\n', None)
+        mock_subprocess.Popen.return_value.returncode = 0
+        resolver = interpolation.Resolver({'rev': '`git rev-parse HEAD`'}, '/project')
+        resolver.render('{{rev}}')
+        resolver.render('tag {{rev}}')
+        self.assertEqual(1, mock_subprocess.Popen.call_count)
+        self.assertEqual('abc123', resolver.resolve('rev'))
+
+    @mock.patch.object(interpolation, 'subprocess', autospec=True)
+    def test__unreferenced_shell_variable_is_never_evaluated(self, mock_subprocess):
+        resolver = interpolation.Resolver({'rev': '`git rev-parse HEAD`', 'a': '1'})
+        resolver.render('{{a}}')
+        self.assertFalse(mock_subprocess.Popen.called)
+
+    @mock.patch.object(interpolation, 'subprocess', autospec=True)
+    def test__nested_shell_variable_is_detected_without_evaluation(self, mock_subprocess):
+        resolver = interpolation.Resolver({'rev': '`git rev-parse HEAD`', 'tag': 'v-{{rev}}', 'a': '1'})
+        self.assertTrue(resolver.needs_shell(['tag']))
+        self.assertFalse(resolver.needs_shell(['a']))
+        self.assertFalse(mock_subprocess.Popen.called)
+
+    def test__failing_shell_variable__raises_error(self):
+        resolver = interpolation.Resolver({'broken': '`exit 3`'})
+        with self.assertRaises(interpolation.InterpolationError) as cm:
+            resolver.resolve('broken')
+        self.assertEqual(interpolation._SHELL_VARIABLE_ERROR.format('broken', 3), cm.exception.args[0])
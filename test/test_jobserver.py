@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+from projects import jobserver
+from projects import runner
+
+
+class Tokens(TestCase):
+
+    def setUp(self):
+        self.server = jobserver.create(3)
+        self.addCleanup(self.server.close)
+
+    def test__implicit_token_is_taken_first(self):
+        self.assertEqual(b'', self.server.acquire())
+        self.assertEqual(b'+', self.server.acquire())
+
+    def test__acquire_blocks_until_cancelled_when_no_token_is_left(self):
+        tokens = [self.server.acquire() for _ in range(3)]
+        cancelled = threading.Event()
+        threading.Timer(0.2, cancelled.set).start()
+        self.assertIsNone(self.server.acquire(cancelled))
+        self.server.release(tokens[1])
+        self.assertEqual(b'+', self.server.acquire())
+
+    def test__released_implicit_token_can_be_taken_again(self):
+        self.server.release(self.server.acquire())
+        self.assertEqual(b'', self.server.acquire())
+
+
+class Environment(TestCase):
+
+    def test__jobserver_is_published_in_makeflags(self):
+        server = jobserver.create(4)
+        self.addCleanup(server.close)
+        read_fd, write_fd = server.get_fds()
+        environment = server.get_environment({'MAKEFLAGS': 'k -j8 --jobserver-auth=9,10', 'HOME': '/home'})
+        self.assertEqual('k -j4 --jobserver-auth={},{}'.format(read_fd, write_fd), environment['MAKEFLAGS'])
+        self.assertEqual('/home', environment['HOME'])
+
+    def test__inherited_pipe_is_used(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+        makeflags = ' -j6 --jobserver-auth={},{}'.format(read_fd, write_fd)
+        server = jobserver.inherit({'MAKEFLAGS': makeflags})
+        self.assertEqual(6, server.jobs)
+        self.assertEqual((min(read_fd, write_fd), max(read_fd, write_fd)), server.get_fds())
+        self.assertEqual(makeflags, server.get_environment({})['MAKEFLAGS'])
+        server.close()
+        os.fstat(read_fd)
+
+    def test__legacy_fds_flag_is_understood(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+        self.assertIsNotNone(jobserver.inherit({'MAKEFLAGS': '-j2 --jobserver-fds={},{}'.format(read_fd, write_fd)}))
+
+    def test__inherited_fifo_is_opened(self):
+        temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp)
+        fifo = os.path.join(temp, 'fifo')
+        os.mkfifo(fifo)
+        server = jobserver.inherit({'MAKEFLAGS': '-j2 --jobserver-auth=fifo:{}'.format(fifo)})
+        self.addCleanup(server.close)
+        server.acquire()
+        server.release(b'+')
+        self.assertEqual(b'+', server.acquire())
+
+    def test__closed_inherited_fds__are_ignored(self):
+        read_fd, write_fd = os.pipe()
+        os.close(read_fd)
+        os.close(write_fd)
+        self.assertIsNone(jobserver.inherit({'MAKEFLAGS': '-j2 --jobserver-auth={},{}'.format(read_fd, write_fd)}))
+
+    def test__no_jobserver_in_environment(self):
+        self.assertIsNone(jobserver.inherit({'MAKEFLAGS': 'k'}))
+        self.assertIsNone(jobserver.inherit({}))
+
+
+@unittest.skipUnless(shutil.which('make'), 'GNU make is not installed')
+class NestedMake(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp)
+        with open(os.path.join(self.temp, 'Makefile'), 'w') as f:
+            f.write('all: a b c d\n\na b c d:\n\tsleep 0.4\n')
+
+    def _run(self, jobs):
+        server = jobserver.create(jobs)
+        self.addCleanup(server.close)
+        data = {'variables': {}, 'commands': {'build': {'pre': ['make -s'], 'post': []}}}
+        started = time.time()
+        runner.run(data, 'build', self.temp, jobs=jobs, jobserver=server)
+        return time.time() - started
+
+    def test__nested_make_runs_exactly_as_parallel_as_the_tokens_allow(self):
+        elapsed = self._run(2)
+        self.assertGreater(elapsed, 0.75)
+        self.assertLess(elapsed, 1.4)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from projects import lint
+from projects import projectfile
+
+_VALID = '''from v1.0.0
+
+build|b: [compile]
+  make
+
+compile:
+  cc main.c
+'''
+
+
+class Lint(TestCase):
+
+    def setUp(self):
+        self.temp = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp)
+
+    def _write(self, relative, source):
+        directory = os.path.join(self.temp, relative)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, 'Projectfile')
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def test__projectfiles_are_discovered_recursively(self):
+        expected = [self._write('a', _VALID), self._write(os.path.join('a', 'sub'), _VALID), self._write('b', _VALID)]
+        self.assertEqual(sorted(expected), lint.discover([os.path.join(self.temp, 'a'), os.path.join(self.temp, 'b')]))
+
+    def test__valid_projectfiles__no_problems(self):
+        paths = [self._write('a', _VALID), self._write('b', _VALID)]
+        self.assertEqual([], lint.lint(paths, jobs=2))
+
+    def test__syntax_errors_of_every_file_are_collected(self):
+        paths = [self._write('a', 'from v1.0.0\n\nbad\n'), self._write('b', 'build:\n'), self._write('c', _VALID)]
+        self.assertEqual([
+            {'path': paths[0], 'line': 3, 'error': projectfile._COMMAND_HEADER_MISSING_COLON_ERROR},
+            {'path': paths[1], 'line': 1, 'error': projectfile._VERSION_MISSING_ERROR}
+        ], lint.lint(paths, jobs=2))
+
+    def test__unclosed_parallel_block__reported_on_the_last_line(self):
+        path = self._write('a', _VALID + '  |||\n  make a\n')
+        self.assertEqual([{'path': path, 'line': 10, 'error': projectfile._PARALLEL_BLOCK_UNCLOSED_ERROR}],
+                         lint.lint([path]))
+
+    def test__problems_are_reported_as_they_are_found(self):
+        paths = [self._write('a', 'from v1.0.0\n\nbad\n'), self._write('b', _VALID + '\ntest: [lint]\n  make\n')]
+        reported = []
+        problems = lint.lint(paths, jobs=2, report=reported.append)
+        self.assertEqual(problems, reported)
+        self.assertEqual([paths[0], paths[1]], [problem['path'] for problem in reported])
+
+    def test__name_collision__reported_with_both_lines(self):
+        path = self._write('a', _VALID + '\ncheck|b:\n  make check\n')
+        self.assertEqual([{'path': path, 'line': 9, 'error': lint._NAME_COLLISION_ERROR.format('b', 3)}],
+                         lint.lint([path]))
+
+    def test__undefined_dependency__reported(self):
+        path = self._write('a', _VALID + '\ntest: [lint]\n  make test\n')
+        error = projectfile._UNDEFINED_DEPENDENCY_ERROR.format('test', 'lint')
+        self.assertEqual([{'path': path, 'line': None, 'error': error}], lint.lint([path]))
+
+    def test__cycle__reported(self):
+        path = self._write('a', 'from v1.0.0\n\nx: [y]\n  a\n\ny: [x]\n  b\n')
+        error = projectfile._DEPENDENCY_CYCLE_ERROR.format('x -> y -> x')
+        self.assertEqual([{'path': path, 'line': None, 'error': error}], lint.lint([path]))
+
+    def test__dependency_on_parent_command__is_valid(self):
+        paths = [self._write('a', _VALID), self._write(os.path.join('a', 'sub'), 'from v1.0.0\n\npkg: [build]\n  tar\n')]
+        self.assertEqual([], lint.lint(paths, jobs=2))
+
+    def test__problem_of_parent__is_not_repeated_for_children(self):
+        parent = self._write('a', _VALID + '\ntest: [lint]\n  make test\n')
+        child = self._write(os.path.join('a', 'sub'), 'from v1.0.0\n\npkg: [build]\n  tar\n')
+        self.assertEqual([parent], [problem['path'] for problem in lint.lint([parent, child], jobs=2)])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import lockfile
+
+_PROJECTFILE = '''from v1.0.0
+
+build|b: [compile]
+  make
+
+compile:
+  cc main.c
+'''
+
+
+class Lockfile(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp)
+        self.path = os.path.join(self.temp, 'Projectfile')
+        with open(self.path, 'w') as f:
+            f.write(_PROJECTFILE)
+        self.data = lockfile.projectfile.get(self.path)
+
+    def test__written_lock_is_loaded_without_parsing(self):
+        lockfile.write(self.path, self.data)
+        with mock.patch.object(lockfile.projectfile, 'get') as mock_get:
+            self.assertEqual(self.data, lockfile.get(self.path))
+        self.assertFalse(mock_get.called)
+
+    def test__lock_is_written_next_to_the_projectfile(self):
+        self.assertEqual(self.path + '.lock', lockfile.write(self.path, self.data))
+        self.assertEqual(['Projectfile', 'Projectfile.lock'], sorted(os.listdir(self.temp)))
+
+    def test__missing_lock__source_is_parsed(self):
+        self.assertIsNone(lockfile.load(self.path))
+        self.assertEqual(self.data, lockfile.get(self.path))
+
+    def test__changed_source__lock_is_stale(self):
+        lockfile.write(self.path, self.data)
+        with open(self.path, 'a') as f:
+            f.write('\ntest:\n  make test\n')
+        self.assertIsNone(lockfile.load(self.path))
+        self.assertIn('test', lockfile.get(self.path)['commands'])
+
+    def test__touched_source_with_the_same_content__lock_is_used(self):
+        lockfile.write(self.path, self.data)
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        with mock.patch.object(lockfile.projectfile, 'get') as mock_get:
+            self.assertEqual(self.data, lockfile.get(self.path))
+        self.assertFalse(mock_get.called)
+
+    def test__identical_copy_over_the_source__lock_is_used(self):
+        lockfile.write(self.path, self.data)
+        copy = os.path.join(self.temp, 'checkout')
+        with open(copy, 'w') as f:
+            f.write(_PROJECTFILE)
+        os.rename(copy, self.path)
+        self.assertEqual(self.data, lockfile.load(self.path))
+
+    def test__same_size_but_other_content__lock_is_stale(self):
+        lockfile.write(self.path, self.data)
+        st = os.stat(self.path)
+        with open(self.path, 'w') as f:
+            f.write(_PROJECTFILE.replace('make', 'mako'))
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(lockfile.load(self.path))
+
+    def test__other_format_version__lock_is_stale(self):
+        lockfile.write(self.path, self.data)
+        with mock.patch.object(lockfile, '_FORMAT_VERSION', 3):
+            self.assertIsNone(lockfile.load(self.path))
+
+    def test__corrupted_lock__is_ignored(self):
+        with open(self.path + '.lock', 'wb') as f:
+            f.write(b'\x00garbage')
+        self.assertIsNone(lockfile.load(self.path))
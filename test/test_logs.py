@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import logs
+
+
+class LogsTestCase(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp)
+        path_patcher = mock.patch.object(logs.config, 'data_path',
+                                         side_effect=lambda *names: os.path.join(self.temp, *names))
+        path_patcher.start()
+        self.addCleanup(path_patcher.stop)
+
+    def _create(self, output, command='build', project='/project', status=0, chunk_size=16):
+        with mock.patch.object(logs, '_CHUNK_SIZE', chunk_size):
+            log = logs.create(project, command)
+            for line in output:
+                log.write(line)
+            log.close(status)
+        return log.run
+
+
+class Capture(LogsTestCase):
+
+    def test__output_is_read_back(self):
+        run = self._create([b'line 1\n', b'line 2\n', b'line 3'])
+        self.assertEqual(b'line 1\nline 2\nline 3', b''.join(logs.read(run)))
+
+    def test__chunks_are_separate_gzip_members(self):
+        run = self._create([b'0123456789\n'] * 4)
+        self.assertEqual(2, len(logs._read_index(run)))
+        # the concatenated members are a valid gzip file
+        with gzip.open(logs._get_log_path(run)) as f:
+            self.assertEqual(b'0123456789\n' * 4, f.read())
+
+    def test__old_chunk_is_flushed_before_it_is_full(self):
+        log = logs.create('/project', 'serve')
+        with mock.patch.object(logs, '_FLUSH_INTERVAL', 0):
+            log.write(b'first\n')
+            log.write(b'second\n')
+        # readable while the command is still running
+        self.assertEqual([b'first\n', b'second\n'], list(logs.read(log.run)))
+        log.close(None)
+
+    def test__quiet_command__last_chunk_is_flushed_by_the_timer(self):
+        with mock.patch.object(logs, '_FLUSH_INTERVAL', 0.05):
+            log = logs.create('/project', 'serve')
+            log.write(b'waiting for connections\n')
+            deadline = time.time() + 5
+            while not logs._read_index(log.run) and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(b'waiting for connections\n', b''.join(logs.read(log.run)))
+            log.close(None)
+
+    def test__partial_index_entry_is_ignored(self):
+        run = self._create([b'0123456789\n'] * 4)
+        with open(logs._get_log_path(run), 'ab') as f:
+            f.write(b'\x1f\x8b')
+        with open(logs._get_index_path(run), 'ab') as f:
+            f.write(b'\x00\x01')
+        self.assertEqual(b'0123456789\n' * 4, b''.join(logs.read(run)))
+
+    def test__writes_after_close_are_dropped(self):
+        log = logs.create('/project', 'build')
+        log.write(b'kept\n')
+        log.close(0)
+        log.write(b'late\n')
+        self.assertEqual(b'kept\n', b''.join(logs.read(log.run)))
+
+
+class Tail(LogsTestCase):
+
+    def test__last_lines_are_returned(self):
+        run = self._create([b'line 1\n', b'line 2\n', b'line 3\n'])
+        self.assertEqual(b'line 2\nline 3\n', logs.tail(run, 2))
+
+    def test__unterminated_last_line_is_kept(self):
+        run = self._create([b'line 1\n', b'line 2\n', b'partial'])
+        self.assertEqual(b'line 2\npartial', logs.tail(run, 2))
+
+    def test__only_the_last_members_are_decompressed(self):
+        run = self._create(['{:08}\n'.format(i).encode('ascii') for i in range(100)])
+        with mock.patch.object(logs.gzip, 'decompress', wraps=gzip.decompress) as mock_decompress:
+            self.assertEqual(b'00000098\n00000099\n', logs.tail(run, 2))
+        self.assertLessEqual(mock_decompress.call_count, 2)
+
+    def test__more_lines_than_logged__returns_everything(self):
+        run = self._create([b'only\n'])
+        self.assertEqual(b'only\n', logs.tail(run, 10))
+
+
+class Catalog(LogsTestCase):
+
+    def test__runs_are_listed_latest_first(self):
+        with mock.patch.object(logs.time, 'time', side_effect=[10.0, 20.0]):
+            first = logs.create('/project', 'build')
+            second = logs.create('/other', 'test')
+        self.assertEqual([second.run, first.run], [run['run'] for run in logs.get_runs()])
+        self.assertEqual([first.run], [run['run'] for run in logs.get_runs('/project')])
+
+    def test__status_and_sizes_are_recorded_on_close(self):
+        run = self._create([b'0123456789\n'] * 2, status=2)
+        entry = logs.get_runs()[0]
+        self.assertEqual((run, 'build', 2, 22), (entry['run'], entry['command'], entry['status'], entry['bytes']))
+        self.assertEqual(os.path.getsize(logs._get_log_path(run)), entry['size'])
+
+    def test__run_is_found_by_id_or_latest_command(self):
+        with mock.patch.object(logs.time, 'time', side_effect=[10.0, 20.0, 30.0]):
+            first = logs.create('/project', 'build')
+            latest = logs.create('/project', 'build')
+            other = logs.create('/other', 'build')
+        self.assertEqual(first.run, logs.find_run(first.run))
+        self.assertEqual(latest.run, logs.find_run('build', '/project'))
+        self.assertEqual(other.run, logs.find_run('build'))
+        self.assertIsNone(logs.find_run('deploy', '/project'))
+
+
+class Rotation(LogsTestCase):
+
+    def _age(self, run, days):
+        runs = logs.cache.load(logs._CACHE_NAME)
+        runs[run]['started'] -= days * logs._DAY
+        logs.cache.dump(logs._CACHE_NAME, runs)
+
+    def test__old_runs_are_removed(self):
+        old = self._create([b'old\n'])
+        new = self._create([b'new\n'])
+        self._age(old, 15)
+        self.assertEqual([old], logs.rotate(14, 1024 * 1024))
+        self.assertEqual([new], [run['run'] for run in logs.get_runs()])
+        self.assertFalse(os.path.exists(logs._get_log_path(old)))
+        self.assertFalse(os.path.exists(logs._get_index_path(old)))
+
+    def test__oldest_runs_are_removed_above_the_size_limit(self):
+        runs = []
+        for age in (3, 2, 1):
+            runs.append(self._create([b'output\n']))
+            self._age(runs[-1], age)
+        size = os.path.getsize(logs._get_log_path(runs[0]))
+        self.assertEqual([runs[0]], logs.rotate(14, 2 * size))
+        self.assertEqual(runs[:0:-1], [run['run'] for run in logs.get_runs()])
+
+    def test__running_commands_are_kept_within_the_age_limit(self):
+        running = logs.create('/project', 'serve')
+        running.write(b'x' * 100)
+        running._flush()
+        logs.cache.merge(logs._CACHE_NAME, {running.run: dict(logs.cache.load(logs._CACHE_NAME)[running.run],
+                                                              size=1000)})
+        self.assertEqual([], logs.rotate(14, 10))
+        self._age(running.run, 15)
+        self.assertEqual([running.run], logs.rotate(14, 10))
+        running.close(None)
+        self.assertEqual([], logs.get_runs())
+
+    def test__nothing_to_remove__cache_is_not_written(self):
+        self._create([b'output\n'])
+        generation = logs.cache.get_generation(logs._CACHE_NAME)
+        self.assertEqual([], logs.rotate(14, 1024 * 1024))
+        self.assertEqual(generation, logs.cache.get_generation(logs._CACHE_NAME))
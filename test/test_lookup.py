@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import lookup
+
+
+class FindProjectfile(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp)
+        self.project = os.path.join(self.temp, 'project')
+        self.deep = os.path.join(self.project, 'a', 'b', 'c')
+        os.makedirs(self.deep)
+        self.cached = {}
+        cache_patcher = mock.patch.object(lookup, 'cache', autospec=True)
+        mock_cache = cache_patcher.start()
+        mock_cache.load.side_effect = lambda name: dict(self.cached)
+        mock_cache.dump.side_effect = lambda name, data: self.cached.update(data)
+        mock_cache.merge.side_effect = lambda name, entries: self.cached.update(entries)
+        self.addCleanup(cache_patcher.stop)
+
+    def _write(self, directory):
+        path = os.path.join(directory, 'Projectfile')
+        open(path, 'w').close()
+        return path
+
+    def test__nearest_projectfile_is_found(self):
+        self._write(self.project)
+        expected = self._write(os.path.join(self.project, 'a'))
+        self.assertEqual(expected, lookup.find_projectfile(self.deep, self.project))
+
+    def test__lookup_stops_at_project_root(self):
+        self._write(self.temp)
+        self.assertIsNone(lookup.find_projectfile(self.deep, self.project))
+
+    def test__negative_and_positive_results_are_cached(self):
+        self._write(self.project)
+        lookup.find_projectfile(self.deep, self.project)
+        self.assertEqual(False, self.cached[self.deep][1])
+        self.assertEqual(True, self.cached[self.project][1])
+
+    def test__unchanged_directories_are_not_listed_again(self):
+        expected = self._write(self.project)
+        lookup.find_projectfile(self.deep, self.project)
+        with mock.patch.object(lookup.os.path, 'isfile') as mock_isfile:
+            self.assertEqual(expected, lookup.find_projectfile(self.deep, self.project))
+        self.assertFalse(mock_isfile.called)
+        self.assertEqual(1, lookup.cache.merge.call_count)
+
+    def test__new_projectfile_invalidates_its_directory(self):
+        self._write(self.project)
+        lookup.find_projectfile(self.deep, self.project)
+        stat = os.stat(self.deep)
+        expected = self._write(self.deep)
+        os.utime(self.deep, (stat.st_atime, stat.st_mtime + 1))
+        self.assertEqual(expected, lookup.find_projectfile(self.deep, self.project))
@@ -1,6 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 from unittest import TestCase
 
 try:
@@ -15,7 +22,15 @@ except ImportError:
     open_mock_string = 'builtins.open'
 
 from projects import p
+from projects import chooser
 from projects import config
+from projects import events
+from projects import hierarchy
+from projects import lint
+from projects import logs
+from projects import metadata
+from projects import plan
+from projects import runner
 
 
 class Config(TestCase):
@@ -28,3 +43,167 @@ class Config(TestCase):
         p.main(())
         mock_path.inside_project.assert_called_with(config._default_config['projects-path'])
         # TODO: mock out further calls
+
+    @mock.patch('sys.stderr', new_callable=io.StringIO)
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    @mock.patch.object(p, 'config', autospec=True)
+    def test__errors_are_printed_to_stderr(self, mock_config, mock_stdout, mock_stderr):
+        mock_config.ConfigError = config.ConfigError
+        mock_config.get.side_effect = config.ConfigError('Broken config!')
+        self.assertEqual(1, p.main(()))
+        self.assertEqual('', mock_stdout.getvalue())
+        self.assertEqual('Broken config!\n', mock_stderr.getvalue())
+
+
+class Interrupt(TestCase):
+
+    @mock.patch.object(runner, 'run', autospec=True, side_effect=KeyboardInterrupt)
+    @mock.patch.object(hierarchy, 'get_namespace', autospec=True)
+    @mock.patch.object(p, '_find_projectfile', return_value=('/project', '/project/Projectfile'))
+    @mock.patch.object(p, 'plugins', autospec=True)
+    @mock.patch.object(p, 'config', autospec=True)
+    @mock.patch.object(p, 'paths', autospec=True)
+    def test__ctrl_c__exits_with_130(self, mock_paths, mock_config, mock_plugins, mock_find, mock_namespace,
+                                     mock_run):
+        mock_config.get.return_value = {'projects-path': '/projects'}
+        mock_config._optional_config = config._optional_config
+        mock_plugins.get_subcommands.return_value = {}
+        mock_paths.inside_project.return_value = True
+        self.assertEqual(130, p.main(['build']))
+        mock_plugins.call_hook.assert_called_with(mock.ANY, 'finish', '/project', 'build', False)
+
+
+class Imports(TestCase):
+
+    def test__subsystems_are_not_imported_by_the_dispatcher(self):
+        script = 'import sys; import projects.p; print(" ".join(sorted(sys.modules)))'
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(p.__file__)))
+        modules = subprocess.check_output([sys.executable, '-c', script], env=env).decode('utf-8').split()
+        for module in ('asyncio', 'sqlite3', 'multiprocessing', 'concurrent.futures', 'projects.runner'):
+            self.assertNotIn(module, modules)
+
+
+class JsonMode(TestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        stream_patcher = mock.patch.object(events, '_stream', None)
+        stream_patcher.start()
+        self.addCleanup(stream_patcher.stop)
+        enable_patcher = mock.patch.object(p.events, 'enable', side_effect=lambda: setattr(events, '_stream', self.stream))
+        enable_patcher.start()
+        self.addCleanup(enable_patcher.stop)
+
+    def _records(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    @mock.patch('projects.chooser', autospec=True)
+    @mock.patch.object(p, 'plugins', autospec=True)
+    @mock.patch.object(p, 'config', autospec=True)
+    @mock.patch.object(p, 'paths', autospec=True)
+    def test__projects_are_listed_as_events_without_the_chooser(self, mock_paths, mock_config, mock_plugins,
+                                                                mock_chooser):
+        mock_config.get.return_value = {'projects-path': '/projects'}
+        mock_plugins.get_subcommands.return_value = {}
+        mock_paths.inside_project.return_value = False
+        mock_paths.list_projects.return_value = {'b': '/projects/b', 'a': '/projects/a'}
+        self.assertEqual(0, p.main(['--json']))
+        self.assertFalse(mock_chooser.choose.called)
+        self.assertEqual([('project', 'a', '/projects/a'), ('project', 'b', '/projects/b')],
+                         [(r['event'], r['name'], r['path']) for r in self._records()[:-1]])
+        self.assertEqual({'event': 'result', 'status': 0, 'version': 1}, self._records()[-1])
+
+    @mock.patch.object(metadata, 'scan', autospec=True)
+    @mock.patch.object(p, 'plugins', autospec=True)
+    @mock.patch.object(p, 'config', autospec=True)
+    @mock.patch.object(p, 'paths', autospec=True)
+    def test__projects_are_sorted_and_filtered_by_metadata(self, mock_paths, mock_config, mock_plugins, mock_scan):
+        mock_config.get.return_value = {'projects-path': '/projects'}
+        mock_plugins.get_subcommands.return_value = {}
+        mock_paths.inside_project.return_value = False
+        mock_paths.list_projects.return_value = {'a': '/projects/a', 'b': '/projects/b', 'c': '/projects/c'}
+        mock_scan.return_value = {
+            'a': {'size': 1, 'files': {'.py': 1}, 'latest': 0.0},
+            'b': {'size': 3 * p._MEGABYTE, 'files': {'.py': 2}, 'latest': 0.0},
+            'c': {'size': 2 * p._MEGABYTE, 'files': {'.js': 1}, 'latest': 0.0}
+        }
+        self.assertEqual(0, p.main(['--json', '--sort', 'size', '--reverse', '--ext', 'py']))
+        self.assertEqual(['b', 'a'], [r['name'] for r in self._records()[:-1]])
+
+    @mock.patch.object(metadata, 'scan', autospec=True)
+    @mock.patch.object(p, 'plugins', autospec=True)
+    @mock.patch.object(p, 'config', autospec=True)
+    @mock.patch.object(p, 'paths', autospec=True)
+    def test__invalid_list_option__is_an_error(self, mock_paths, mock_config, mock_plugins, mock_scan):
+        mock_config.get.return_value = {'projects-path': '/projects'}
+        mock_plugins.get_subcommands.return_value = {}
+        mock_paths.inside_project.return_value = False
+        self.assertEqual(1, p.main(['--json', '--sort', 'color']))
+        self.assertFalse(mock_scan.called)
+        self.assertEqual(p._LIST_USAGE_ERROR, self._records()[0]['message'])
+
+    @mock.patch.object(plan.history, 'get_estimates', return_value={})
+    @mock.patch.object(p, 'plugins', autospec=True)
+    @mock.patch.object(p, 'config', autospec=True)
+    def test__plan_outside_of_the_projects(self, mock_config, mock_plugins, mock_estimates):
+        temp = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp)
+        with open(os.path.join(temp, 'Projectfile'), 'w') as f:
+            f.write('from v1.0.0\nbuild:\n  make\n')
+        mock_config.get.return_value = {'projects-path': os.path.join(temp, 'projects')}
+        mock_plugins.get_subcommands.return_value = {}
+        cwd = os.getcwd()
+        os.chdir(temp)
+        self.addCleanup(os.chdir, cwd)
+        self.assertEqual(0, p.main(['--json', 'plan', 'build']))
+        self.assertEqual(['build'], [r['name'] for r in self._records() if r['event'] == 'step'])
+
+    @mock.patch.object(p, 'config', autospec=True)
+    def test__errors_are_events(self, mock_config):
+        mock_config.ConfigError = config.ConfigError
+        mock_config.get.side_effect = config.ConfigError('Broken config!')
+        self.assertEqual(1, p.main(['--json']))
+        self.assertEqual([{'event': 'error', 'message': 'Broken config!', 'version': 1},
+                          {'event': 'result', 'status': 1, 'version': 1}], self._records())
+
+    @mock.patch('projects.lint', autospec=True)
+    @mock.patch.object(p, 'config', autospec=True)
+    def test__lint_problems_are_streamed(self, mock_config, mock_lint):
+        problem = {'path': '/p/Projectfile', 'line': 3, 'error': 'Bad!'}
+        mock_config.get.return_value = {'projects-path': '/projects'}
+        mock_lint.discover.return_value = ['/p/Projectfile']
+
+        def lint(paths, jobs, report=None):
+            report(problem)
+            return [problem]
+
+        mock_lint.lint.side_effect = lint
+        self.assertEqual(1, p.main(['lint', '--json', '/p']))
+        self.assertEqual(['projectfile', 'problem', 'result'], [r['event'] for r in self._records()])
+        self.assertEqual(3, self._records()[1]['line'])
+
+
+    @mock.patch('projects.logs', autospec=True)
+    @mock.patch.object(p, '_find_projectfile', return_value=('/project', '/project/Projectfile'))
+    @mock.patch.object(p, 'config', autospec=True)
+    def test__log_tail_is_an_event(self, mock_config, mock_find, mock_logs):
+        mock_config.get.return_value = {'projects-path': '/projects'}
+        mock_logs.find_run.return_value = '20261019-120000-abcdef'
+        mock_logs.tail.return_value = b'done\n'
+        self.assertEqual(0, p.main(['--json', 'logs', '-n', '5', 'build']))
+        mock_logs.find_run.assert_called_once_with('build', '/project')
+        mock_logs.tail.assert_called_once_with('20261019-120000-abcdef', 5)
+        self.assertEqual({'event': 'log', 'run': '20261019-120000-abcdef', 'output': 'done\n', 'version': 1},
+                         self._records()[0])
+
+    @mock.patch('projects.logs', autospec=True)
+    @mock.patch.object(p, '_find_projectfile', return_value=(None, None))
+    @mock.patch.object(p, 'config', autospec=True)
+    def test__unknown_log__is_an_error(self, mock_config, mock_find, mock_logs):
+        mock_config.get.return_value = {'projects-path': '/projects'}
+        mock_logs.find_run.return_value = None
+        self.assertEqual(1, p.main(['--json', 'logs', 'deploy']))
+        mock_logs.find_run.assert_called_once_with('deploy', None)
+        self.assertEqual({'event': 'error', 'message': p._UNKNOWN_RUN_ERROR.format('deploy'), 'version': 1},
+                         self._records()[0])
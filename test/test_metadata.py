@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import metadata
+
+
+def _write(path, content='x'):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class Scanning(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.cached = {}
+        patcher = mock.patch.object(metadata, 'cache', autospec=True)
+        mock_cache = patcher.start()
+        mock_cache.load.side_effect = lambda name: dict(self.cached)
+        mock_cache.dump.side_effect = lambda name, data: self.cached.update(data)
+        self.addCleanup(patcher.stop)
+        _write(os.path.join(self.temp, 'alpha', 'main.py'))
+        _write(os.path.join(self.temp, 'alpha', 'src', 'lib.py'))
+        _write(os.path.join(self.temp, 'alpha', 'src', 'deep', 'README'))
+        _write(os.path.join(self.temp, 'beta', 'index.JS'))
+        _write(os.path.join(self.temp, 'not-a-project.txt'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def test__files_are_counted_by_extension_across_the_whole_tree(self):
+        result = metadata.scan(self.temp, jobs=2)
+        self.assertEqual(['alpha', 'beta'], sorted(result))
+        self.assertEqual({'.py': 2, '': 1}, result['alpha']['files'])
+        self.assertEqual({'.js': 1}, result['beta']['files'])
+
+    def test__size_and_latest_modification_are_collected(self):
+        os.utime(os.path.join(self.temp, 'beta', 'index.JS'), (2000000000, 2000000000))
+        result = metadata.scan(self.temp)
+        self.assertEqual(2000000000, result['beta']['latest'])
+        self.assertTrue(result['alpha']['size'] > 0)
+
+    def test__unchanged_directories_are_not_listed_again(self):
+        metadata.scan(self.temp)
+        with mock.patch.object(metadata.os, 'scandir') as mock_scandir:
+            result = metadata.scan(self.temp)
+        self.assertFalse(mock_scandir.called)
+        self.assertEqual({'.py': 2, '': 1}, result['alpha']['files'])
+
+    def test__only_changed_directories_are_listed_again(self):
+        metadata.scan(self.temp)
+        changed = os.path.join(self.temp, 'alpha', 'src', 'deep')
+        _write(os.path.join(changed, 'new.py'))
+        os.utime(changed, (2000000000, 2000000000))
+        original_scandir = os.scandir
+        with mock.patch.object(metadata.os, 'scandir', side_effect=original_scandir) as mock_scandir:
+            result = metadata.scan(self.temp)
+        mock_scandir.assert_called_once_with(changed)
+        self.assertEqual({'.py': 3, '': 1}, result['alpha']['files'])
+
+    def test__removed_directories_are_dropped_from_the_cache(self):
+        metadata.scan(self.temp)
+        shutil.rmtree(os.path.join(self.temp, 'beta'))
+        self.cached.clear()
+        result = metadata.scan(self.temp)
+        self.assertEqual(['alpha'], sorted(result))
+        self.assertFalse(any('beta' in path for path in self.cached))
+
+
+class SortingAndFiltering(TestCase):
+
+    data = {
+        'small': {'size': 10, 'files': {'.py': 1}, 'latest': 300.0},
+        'large': {'size': 1000, 'files': {'.c': 5, '.h': 5}, 'latest': 100.0},
+        'Medium': {'size': 100, 'files': {'.py': 3}, 'latest': 200.0}
+    }
+
+    def test__sort_by_name_is_case_insensitive(self):
+        result = metadata.sort_projects(['small', 'large', 'Medium'], self.data)
+        self.assertEqual(['large', 'Medium', 'small'], result)
+
+    def test__sort_by_size_descending(self):
+        result = metadata.sort_projects(['small', 'large', 'Medium'], self.data, 'size', reverse=True)
+        self.assertEqual(['large', 'Medium', 'small'], result)
+
+    def test__sort_by_latest_activity(self):
+        result = metadata.sort_projects(['small', 'large', 'Medium'], self.data, 'latest', reverse=True)
+        self.assertEqual(['small', 'Medium', 'large'], result)
+
+    def test__unscanned_projects_come_last(self):
+        result = metadata.sort_projects(['new', 'large', 'small'], self.data, 'files')
+        self.assertEqual(['small', 'large', 'new'], result)
+
+    def test__filter_by_extension(self):
+        result = metadata.filter_projects(['small', 'large', 'Medium'], self.data, extension='.PY')
+        self.assertEqual(['small', 'Medium'], result)
+
+    def test__filter_by_size_and_activity(self):
+        names = ['small', 'large', 'Medium']
+        self.assertEqual(['large', 'Medium'], metadata.filter_projects(names, self.data, min_size=100))
+        self.assertEqual(['small'], metadata.filter_projects(names, self.data, active_since=250.0))
@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import shutil
+import tempfile
 from unittest import TestCase
 try:
     import mock
@@ -10,37 +13,120 @@ except ImportError:
 from projects import paths
 
 
-class DetermineIfCallHappenedFromProject(TestCase):
+class PathTestCase(TestCase):
 
-    @mock.patch('projects.paths.os')
-    def test__current_path_gets_called(self, mock_os):
+    def setUp(self):
+        paths._tries.clear()
+        self.addCleanup(paths._tries.clear)
+
+
+class DetermineIfCallHappenedFromProject(PathTestCase):
+
+    @mock.patch.object(paths.os, 'getcwd')
+    def test__current_path_gets_called(self, mock_getcwd):
+        mock_getcwd.return_value = '/machine'
         paths.inside_project('some/path')
-        mock_os.getcwd.assert_called_with()
+        mock_getcwd.assert_called_with()
 
-    @mock.patch('projects.paths.os')
-    def test__inside_projects_root__returns_false(self, mock_os):
+    @mock.patch.object(paths.os, 'getcwd')
+    def test__inside_projects_root__returns_false(self, mock_getcwd):
         p = '/machine/projects'
-        mock_os.getcwd.return_value = p
+        mock_getcwd.return_value = p
         result = paths.inside_project(p)
         self.assertEqual(False, result)
 
-    @mock.patch('projects.paths.os')
-    def test__outside_projects__returns_false(self, mock_os):
+    @mock.patch.object(paths.os, 'getcwd')
+    def test__outside_projects__returns_false(self, mock_getcwd):
         p = '/machine/projects'
-        mock_os.getcwd.return_value = '/machine'
+        mock_getcwd.return_value = '/machine'
         result = paths.inside_project(p)
         self.assertEqual(False, result)
 
-    @mock.patch('projects.paths.os')
-    def test__inside_project_root__returns_true(self, mock_os):
+    @mock.patch.object(paths.os, 'getcwd')
+    def test__inside_project_root__returns_true(self, mock_getcwd):
         p = '/machine/projects'
-        mock_os.getcwd.return_value = '/machine/projects/project'
+        mock_getcwd.return_value = '/machine/projects/project'
         result = paths.inside_project(p)
         self.assertEqual(True, result)
 
-    @mock.patch('projects.paths.os')
-    def test__deep_inside_project__returns_true(self, mock_os):
+    @mock.patch.object(paths.os, 'getcwd')
+    def test__deep_inside_project__returns_true(self, mock_getcwd):
         p = '/machine/projects'
-        mock_os.getcwd.return_value = '/machine/projects/project/d1/d2/d3'
+        mock_getcwd.return_value = '/machine/projects/project/d1/d2/d3'
         result = paths.inside_project(p)
         self.assertEqual(True, result)
+
+    @mock.patch.object(paths.os, 'getcwd')
+    def test__sibling_with_common_prefix__returns_false(self, mock_getcwd):
+        mock_getcwd.return_value = '/machine/projects2/project'
+        self.assertEqual(False, paths.inside_project('/machine/projects'))
+
+    @mock.patch.object(paths.os, 'getcwd')
+    def test__trailing_separator_in_config__is_ignored(self, mock_getcwd):
+        mock_getcwd.return_value = '/machine/projects/project'
+        self.assertEqual(True, paths.inside_project('/machine/projects/'))
+
+    @mock.patch.object(paths.os, 'getcwd')
+    def test__any_of_multiple_roots__returns_true(self, mock_getcwd):
+        mock_getcwd.return_value = '/work/repos/project/src'
+        self.assertEqual(True, paths.inside_project(['/machine/projects', '/work/repos']))
+
+
+class Resolve(PathTestCase):
+
+    def test__project_and_subpath_are_returned(self):
+        result = paths.resolve('/machine/projects', '/machine/projects/project/d1/d2')
+        self.assertEqual(('/machine/projects', 'project', os.path.join('d1', 'd2')), result)
+
+    def test__project_directory__has_empty_subpath(self):
+        self.assertEqual(('/machine/projects', 'project', ''),
+                         paths.resolve('/machine/projects', '/machine/projects/project'))
+
+    def test__root__has_no_project(self):
+        self.assertEqual(('/machine/projects', None, ''), paths.resolve('/machine/projects', '/machine/projects'))
+
+    def test__outside_of_roots__returns_none(self):
+        self.assertIsNone(paths.resolve(['/machine/projects', '/work'], '/machine/other'))
+
+    def test__nested_root__deepest_root_wins(self):
+        result = paths.resolve(['/machine', '/machine/projects'], '/machine/projects/project')
+        self.assertEqual(('/machine/projects', 'project', ''), result)
+
+    def test__trie_is_built_once(self):
+        paths.resolve('/machine/projects', '/machine/projects/a')
+        with mock.patch.object(paths, 'get_roots') as mock_roots:
+            paths.resolve('/machine/projects', '/machine/projects/b')
+        self.assertFalse(mock_roots.called)
+
+
+class RealPaths(PathTestCase):
+
+    def setUp(self):
+        super(RealPaths, self).setUp()
+        self.temp = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp)
+        self.root = os.path.join(self.temp, 'projects')
+        self.other = os.path.join(self.temp, 'other')
+        for path in (os.path.join(self.root, 'alpha', 'src'), os.path.join(self.other, 'alpha'),
+                     os.path.join(self.other, 'beta')):
+            os.makedirs(path)
+        open(os.path.join(self.root, 'file.txt'), 'w').close()
+        self.link = os.path.join(self.temp, 'link')
+        os.symlink(self.root, self.link)
+
+    def test__symlinked_root__matches_physical_path(self):
+        result = paths.resolve(self.link, os.path.join(self.root, 'alpha', 'src'))
+        self.assertEqual((self.root, 'alpha', 'src'), result)
+
+    def test__path_through_symlink__is_resolved(self):
+        result = paths.resolve(self.root, os.path.join(self.link, 'alpha'))
+        self.assertEqual((self.root, 'alpha', ''), result)
+
+    def test__projects_of_every_root__first_root_wins(self):
+        result = paths.list_projects([self.root, self.other])
+        self.assertEqual({'alpha': os.path.join(self.root, 'alpha'),
+                          'beta': os.path.join(self.other, 'beta')}, result)
+
+    def test__missing_root__is_skipped(self):
+        result = paths.list_projects([os.path.join(self.temp, 'missing'), self.other])
+        self.assertEqual(['alpha', 'beta'], sorted(result))
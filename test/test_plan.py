@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import plan
+from projects import runner
+
+
+def _data():
+    return {
+        'variables': {},
+        'commands': {
+            'compile': {'pre': ['cc -c main.c'], 'post': []},
+            'docs': {'pre': ['make docs'], 'post': [], 'inputs': ['doc'], 'outputs': ['html']},
+            'lint': {'pre': ['flake8'], 'post': []},
+            'link': {'dependencies': ['compile'], 'pre': ['cc main.o'], 'post': []},
+            'release': {'dependencies': ['l', 'docs', 'lint'], 'pre': ['upload'], 'post': []},
+            'l': {'alias': 'link'}
+        }
+    }
+
+
+class Plan(TestCase):
+
+    def setUp(self):
+        estimates_patcher = mock.patch.object(plan.history, 'get_estimates', return_value={})
+        self.mock_estimates = estimates_patcher.start()
+        self.addCleanup(estimates_patcher.stop)
+        contains_patcher = mock.patch.object(plan.cas, 'contains', return_value=False)
+        self.mock_contains = contains_patcher.start()
+        self.addCleanup(contains_patcher.stop)
+        popen_patcher = mock.patch.object(runner.subprocess, 'Popen')
+        self.mock_popen = popen_patcher.start()
+        self.addCleanup(popen_patcher.stop)
+
+    def _get_plan(self):
+        with mock.patch.object(plan.cas, 'get_key', return_value='key'):
+            return plan.get_plan(_data(), 'release', '/project', '/project')
+
+    def test__steps_are_grouped_into_stages(self):
+        result = self._get_plan()
+        self.assertEqual([['compile', 'docs', 'lint'], ['link'], ['release']], result['stages'])
+        self.assertFalse(self.mock_popen.called)
+
+    def test__cached_step__is_skipped_without_restoring(self):
+        self.mock_contains.return_value = True
+        with mock.patch.object(plan.cas, 'restore') as mock_restore:
+            result = self._get_plan()
+        self.assertFalse(mock_restore.called)
+        self.mock_contains.assert_called_once_with('key')
+        self.assertEqual(['docs'], [step['name'] for step in result['steps'] if step['skipped']])
+
+    def test__shell_variables_are_not_evaluated(self):
+        data = _data()
+        data['variables'] = {'rev': '`git rev-parse HEAD`'}
+        data['commands']['lint']['pre'] = ['flake8 {{rev}}']
+        data['commands']['docs']['pre'] = ['make docs REV={{rev}}']
+        result = plan.get_plan(data, 'release', '/project')
+        self.assertFalse(self.mock_popen.called)
+        self.assertFalse(self.mock_contains.called)
+        steps = dict((step['name'], step) for step in result['steps'])
+        self.assertEqual((False, True), (steps['docs']['skipped'], steps['docs']['unknown']))
+        self.assertEqual('~0.0s, cache unknown', plan.format_state(steps['docs']))
+        self.assertFalse(steps['lint']['unknown'])
+
+    def test__critical_path_follows_the_longest_estimates(self):
+        self.mock_estimates.return_value = {'compile': 1.0, 'link': 2.0, 'docs': 5.0, 'lint': 1.0, 'release': 1.0}
+        result = self._get_plan()
+        self.assertEqual(['docs', 'release'], result['critical-path'])
+        self.assertEqual(6.0, result['duration'])
+        self.assertEqual({'docs', 'release'}, set(step['name'] for step in result['steps'] if step['critical']))
+
+    def test__skipped_steps_are_instant(self):
+        self.mock_estimates.return_value = {'compile': 1.0, 'link': 2.0, 'docs': 5.0, 'lint': 1.0, 'release': 1.0}
+        self.mock_contains.return_value = True
+        result = self._get_plan()
+        self.assertEqual(['compile', 'link', 'release'], result['critical-path'])
+        self.assertEqual(4.0, result['duration'])
+
+    def test__steps_without_history_get_the_average(self):
+        self.mock_estimates.return_value = {'compile': 1.0, 'link': 3.0}
+        steps = dict((step['name'], step) for step in self._get_plan()['steps'])
+        self.assertEqual((2.0, False), (steps['lint']['estimate'], steps['lint']['history']))
+        self.assertEqual('~2.0s', plan.format_estimate(steps['lint']))
+        self.assertEqual('3.0s', plan.format_estimate(steps['link']))
+
+    def test__unknown_command__raises_error(self):
+        with self.assertRaises(runner.RunnerError):
+            plan.get_plan(_data(), 'missing', '/project')
+
+    def test__dot_export_highlights_the_critical_path(self):
+        self.mock_estimates.return_value = {'compile': 1.0, 'link': 2.0, 'docs': 5.0, 'lint': 1.0, 'release': 1.0}
+        dot = plan.get_dot(self._get_plan())
+        self.assertTrue(dot.startswith('digraph plan {'))
+        self.assertIn('"docs" -> "release" [color=red, penwidth=2];', dot)
+        self.assertIn('"compile" -> "link";', dot)
+        self.assertIn('"lint" [label="lint\\n1.0s"];', dot)
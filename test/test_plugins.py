@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import plugins
+
+_DEPLOY_PLUGIN = '''
+CALLS = []
+
+def command_upload_all(conf, args):
+    return 'uploaded {}'.format(' '.join(args))
+
+def on_run(cwd, command):
+    CALLS.append((cwd, command))
+    return 'run hook'
+
+def helper():
+    pass
+'''
+
+_LISTING_PLUGIN = '''
+def on_list(projects_path, names):
+    return len(names)
+'''
+
+
+class PluginTestCase(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.cached = {}
+        plugins._modules.clear()
+        self._write('deploy', _DEPLOY_PLUGIN)
+        self._write('listing', _LISTING_PLUGIN)
+        path_patcher = mock.patch.object(plugins, '_get_plugins_path', return_value=self.temp)
+        path_patcher.start()
+        self.addCleanup(path_patcher.stop)
+        cache_patcher = mock.patch.object(plugins, 'cache', autospec=True)
+        mock_cache = cache_patcher.start()
+        mock_cache.load.side_effect = lambda name: dict(self.cached)
+        mock_cache.dump.side_effect = lambda name, data: self.cached.update(data)
+        mock_cache.update.side_effect = lambda name, function: self.cached.update(function(dict(self.cached)))
+        self.addCleanup(cache_patcher.stop)
+        self.conf = {'projects-path': '~/projects', 'plugins': ['deploy', 'listing']}
+
+    def tearDown(self):
+        plugins._reset_pool()
+        plugins._modules.clear()
+        shutil.rmtree(self.temp)
+
+    def _write(self, name, source):
+        with open(os.path.join(self.temp, name + '.py'), 'w') as f:
+            f.write(source)
+
+
+class Manifest(PluginTestCase):
+
+    def test__subcommands_and_hooks_are_collected_without_importing(self):
+        manifest = plugins.get_manifest(self.conf)
+        self.assertEqual(['upload-all'], manifest['deploy']['subcommands'])
+        self.assertEqual(['run'], manifest['deploy']['hooks'])
+        self.assertEqual(['list'], manifest['listing']['hooks'])
+        self.assertEqual({}, plugins._modules)
+
+    def test__unchanged_plugins_are_not_scanned_again(self):
+        plugins.get_manifest(self.conf)
+        with mock.patch.object(plugins, '_scan') as mock_scan:
+            plugins.get_manifest(self.conf)
+        self.assertFalse(mock_scan.called)
+
+    def test__changed_plugin_is_scanned_again(self):
+        plugins.get_manifest(self.conf)
+        self._write('listing', _LISTING_PLUGIN + '\ndef command_extra(conf, args):\n    pass\n')
+        self.assertEqual({'upload-all': 'deploy', 'extra': 'listing'}, plugins.get_subcommands(self.conf))
+
+    def test__no_plugins_configured__cache_is_not_touched(self):
+        self.assertEqual({}, plugins.get_manifest({'projects-path': '~/projects'}))
+        self.assertFalse(plugins.cache.load.called)
+
+    def test__missing_plugin__raises_error(self):
+        with self.assertRaises(plugins.PluginError) as cm:
+            plugins.get_manifest({'plugins': ['missing']})
+        self.assertEqual(plugins._MISSING_PLUGIN_ERROR.format('missing', self.temp), cm.exception.args[0])
+
+    def test__plugin_with_invalid_syntax__raises_error(self):
+        self._write('broken', 'def (:\n')
+        with self.assertRaises(plugins.PluginError):
+            plugins.get_manifest({'plugins': ['broken']})
+
+
+class LazyLoading(PluginTestCase):
+
+    def test__subcommand_imports_only_its_plugin(self):
+        result = plugins.run_subcommand(self.conf, 'upload-all', ['a', 'b'])
+        self.assertEqual('uploaded a b', result)
+        self.assertEqual(['deploy'], list(plugins._modules))
+
+    def test__hook_is_called_only_on_providing_plugins(self):
+        result = plugins.call_hook(self.conf, 'run', '/project', 'build')
+        self.assertEqual({'deploy': 'run hook'}, result)
+        self.assertIn('deploy:run', self.cached)
+        self.assertNotIn('listing:run', self.cached)
+
+    def test__hook_without_providers__imports_nothing(self):
+        self.assertEqual({}, plugins.call_hook(self.conf, 'finish', '/project', 'build', True))
+        self.assertEqual({}, plugins._modules)
+
+
+
+class HookExecution(PluginTestCase):
+
+    def setUp(self):
+        super(HookExecution, self).setUp()
+        stderr_patcher = mock.patch.object(plugins.sys, 'stderr')
+        self.stderr = stderr_patcher.start()
+        self.addCleanup(stderr_patcher.stop)
+
+    def test__hooks_run_out_of_process(self):
+        plugins.call_hook(self.conf, 'run', '/project', 'build')
+        self.assertEqual({}, plugins._modules)
+
+    def test__worker_pool_is_reused(self):
+        plugins.call_hook(self.conf, 'run', '/project', 'build')
+        pool = plugins._pool
+        plugins.call_hook(self.conf, 'list', '~/projects', ['a', 'b'])
+        self.assertIs(pool, plugins._pool)
+
+    def test__independent_hooks_run_concurrently(self):
+        self._write('first', 'import time\ndef on_run(cwd, command):\n    time.sleep(0.5)\n    return 1\n')
+        self._write('second', 'import time\ndef on_run(cwd, command):\n    time.sleep(0.5)\n    return 2\n')
+        conf = {'plugins': ['first', 'second'], 'hook-timeout': 0.9}
+        self.assertEqual({'first': 1, 'second': 2}, plugins.call_hook(conf, 'run', '/project', 'build'))
+
+    def test__overrunning_hook__is_skipped_with_warning(self):
+        self._write('slow', 'import time\ndef on_run(cwd, command):\n    time.sleep(60)\n')
+        conf = {'plugins': ['deploy', 'slow'], 'hook-timeout': 0.5}
+        result = plugins.call_hook(conf, 'run', '/project', 'build')
+        self.assertEqual({'deploy': 'run hook'}, result)
+        self.stderr.write.assert_called_once_with(
+            plugins._HOOK_TIMEOUT_WARNING.format('run', 'slow', 0.5) + '\n')
+        self.assertEqual(1, self.cached['slow:run']['timeouts'])
+        self.assertIsNone(plugins._pool)
+
+    def test__failing_import__is_skipped_with_warning(self):
+        self._write('failing', 'raise RuntimeError("boom")\ndef on_run(cwd, command):\n    pass\n')
+        self.assertEqual({}, plugins.call_hook({'plugins': ['failing']}, 'run', '/project', 'build'))
+        error = plugins._PLUGIN_IMPORT_ERROR.format('failing', 'boom')
+        self.stderr.write.assert_called_once_with(
+            plugins._HOOK_FAILED_WARNING.format('run', 'failing', error) + '\n')
+        self.assertEqual(1, self.cached['failing:run']['errors'])
+
+    def test__latency_statistics_are_accumulated(self):
+        plugins.call_hook(self.conf, 'run', '/project', 'build')
+        plugins.call_hook(self.conf, 'run', '/project', 'build')
+        entry = plugins.get_statistics()['deploy:run']
+        self.assertEqual(2, entry['calls'])
+        self.assertEqual(0, entry['timeouts'])
+        self.assertGreaterEqual(entry['total'], entry['max'])
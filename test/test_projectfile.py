@@ -1566,3 +1566,234 @@ class PostState(TestCase):
         self.assertEqual(cm.exception.__class__, SyntaxError)
         self.assertTrue(projectfile._COMMAND_HEADER_MISSING_COLON_ERROR == cm.exception.args[0])
 
+
+
+class CommandHeaderOptions(TestCase):
+
+    def test__inputs_and_outputs_can_be_declared(self):
+        line = 'build|b: [dep] {inputs=src CMakeLists.txt, outputs=build/app}'
+        expected = {
+            'build': {
+                'dependencies': ['dep'],
+                'inputs': ['src', 'CMakeLists.txt'],
+                'outputs': ['build/app'],
+                'done': False
+            },
+            'b': {
+                'alias': 'build'
+            }
+        }
+        result = projectfile._parse_command_header(line)
+        self.assertEqual(expected, result)
+
+    def test__options_without_dependencies(self):
+        line = 'build:{outputs=dist}'
+        expected = {
+            'build': {
+                'outputs': ['dist'],
+                'done': False
+            }
+        }
+        result = projectfile._parse_command_header(line)
+        self.assertEqual(expected, result)
+
+    def test__timeout_and_retries_can_be_declared(self):
+        line = 'deploy: {timeout=90, retries=2}'
+        expected = {
+            'deploy': {
+                'timeout': 90.0,
+                'retries': 2,
+                'done': False
+            }
+        }
+        result = projectfile._parse_command_header(line)
+        self.assertEqual(expected, result)
+
+    def test__invalid_timeout_or_retries__raises_exception(self):
+        for line, option in (('deploy: {timeout=0}', 'timeout'), ('deploy: {timeout=soon}', 'timeout'),
+                             ('deploy: {retries=-1}', 'retries'), ('deploy: {retries=1.5}', 'retries')):
+            with self.assertRaises(SyntaxError) as cm:
+                projectfile._parse_command_header(line)
+            self.assertEqual(projectfile._COMMAND_HEADER_INVALID_OPTION_VALUE.format(option), cm.exception.args[0])
+
+    def test__unknown_option__raises_exception(self):
+        line = 'build: {colour=red}'
+        with self.assertRaises(Exception) as cm:
+            projectfile._parse_command_header(line)
+        self.assertEqual(cm.exception.__class__, SyntaxError)
+        self.assertEqual(projectfile._COMMAND_HEADER_UNKNOWN_OPTION.format('colour'), cm.exception.args[0])
+
+    def test__empty_option_value__raises_exception(self):
+        line = 'build: {outputs=}'
+        with self.assertRaises(Exception) as cm:
+            projectfile._parse_command_header(line)
+        self.assertEqual(cm.exception.__class__, SyntaxError)
+        self.assertEqual(projectfile._COMMAND_HEADER_INVALID_OPTION_VALUE.format('outputs'), cm.exception.args[0])
+
+    def test__invalid_option_syntax__raises_exception(self):
+        line = 'build: {outputs}'
+        with self.assertRaises(Exception) as cm:
+            projectfile._parse_command_header(line)
+        self.assertEqual(cm.exception.__class__, SyntaxError)
+        self.assertEqual(projectfile._COMMAND_HEADER_INVALID_OPTION_LIST, cm.exception.args[0])
+
+    def test__unclosed_option_list__raises_exception(self):
+        line = 'build: {outputs=dist'
+        with self.assertRaises(Exception) as cm:
+            projectfile._parse_command_header(line)
+        self.assertEqual(cm.exception.__class__, SyntaxError)
+        self.assertEqual(projectfile._COMMAND_HEADER_INVALID_OPTION_LIST, cm.exception.args[0])
+
+
+class FullParse(TestCase):
+
+    def test__readme_example_can_be_parsed(self):
+        lines = [
+            'from v1.1.0',
+            '',
+            'deploy_url = \'hello_imre\'',
+            '',
+            'bootstrap|b:',
+            '  """',
+            '  This is the initialization command.',
+            '  """',
+            '  mkdir build',
+            '  cd build',
+            '  ===',
+            '  cd ..',
+            '',
+            'publish|p: [bootstrap, build] {outputs=dist}',
+            '  upload'
+        ]
+        expected = {
+            'min-version': (1, 1, 0),
+            'variables': {'deploy_url': 'hello_imre'},
+            'commands': {
+                'bootstrap': {
+                    'description': 'This is the initialization command.',
+                    'pre': ['mkdir build', 'cd build'],
+                    'post': ['cd ..']
+                },
+                'b': {'alias': 'bootstrap'},
+                'publish': {
+                    'dependencies': ['bootstrap', 'build'],
+                    'outputs': ['dist'],
+                    'pre': ['upload'],
+                    'post': []
+                },
+                'p': {'alias': 'publish'}
+            }
+        }
+        result = projectfile._parse_lines(lines)
+        self.assertEqual(expected, result)
+
+    def test__syntax_error_is_reported_with_line_number(self):
+        lines = ['from v1.1.0', '', 'command', '  echo']
+        with self.assertRaises(projectfile.ProjectfileError) as cm:
+            projectfile._parse_lines(lines)
+        expected = {'line': 3, 'error': projectfile._COMMAND_HEADER_MISSING_COLON_ERROR}
+        self.assertEqual(expected, cm.exception.args[0])
+
+    def test__missing_version__raises_error(self):
+        with self.assertRaises(projectfile.ProjectfileError) as cm:
+            projectfile._parse_lines(['', ''])
+        self.assertEqual(projectfile._VERSION_MISSING_ERROR, cm.exception.args[0]['error'])
+
+    def test__get_loads_and_parses_the_file(self):
+        mock_open = mock.mock_open(read_data='from v1.0.0\ncommand:\n  echo')
+        with mock.patch(builtin_module+'.open', mock_open):
+            result = projectfile.get('/path/Projectfile')
+        mock_open.assert_called_with('/path/Projectfile', 'r')
+        self.assertEqual(['echo'], result['commands']['command']['pre'])
+
+
+class ParallelBlock(TestCase):
+
+    def _parse(self, body):
+        return projectfile._parse_lines(['from v1.0.0', 'build:'] + body)
+
+    def test__block_lines_are_parsed_into_a_nested_list(self):
+        result = self._parse(['  mkdir out', '  |||', '  make docs', '', '  make lib', '  |||', '  echo done'])
+        self.assertEqual(['mkdir out', ['make docs', 'make lib'], 'echo done'], result['commands']['build']['pre'])
+
+    def test__block_can_follow_the_command_divisor(self):
+        result = self._parse(['  make', '  ===', '  |||', '  upload a', '  upload b', '  |||'])
+        self.assertEqual(['make'], result['commands']['build']['pre'])
+        self.assertEqual([['upload a', 'upload b']], result['commands']['build']['post'])
+
+    def test__block_can_follow_the_description(self):
+        result = self._parse(['  """', '  Builds.', '  """', '  |||', '  a', '  b', '  |||'])
+        self.assertEqual([['a', 'b']], result['commands']['build']['pre'])
+
+    def test__unclosed_block_at_the_end__raises_error(self):
+        with self.assertRaises(projectfile.ProjectfileError) as cm:
+            self._parse(['  |||', '  a'])
+        self.assertEqual({'line': 4, 'error': projectfile._PARALLEL_BLOCK_UNCLOSED_ERROR}, cm.exception.args[0])
+
+    def test__command_header_inside_a_block__raises_error(self):
+        with self.assertRaises(projectfile.ProjectfileError) as cm:
+            self._parse(['  |||', '  a', 'other:', '  b'])
+        self.assertEqual({'line': 5, 'error': projectfile._PARALLEL_BLOCK_UNCLOSED_ERROR}, cm.exception.args[0])
+
+    def test__divisor_inside_a_block__raises_error(self):
+        with self.assertRaises(projectfile.ProjectfileError) as cm:
+            self._parse(['  |||', '  a', '  ===', '  b'])
+        self.assertEqual({'line': 5, 'error': projectfile._PARALLEL_BLOCK_UNCLOSED_ERROR}, cm.exception.args[0])
+
+    def test__empty_block__raises_error(self):
+        with self.assertRaises(projectfile.ProjectfileError) as cm:
+            self._parse(['  a', '  |||', '', '  |||'])
+        self.assertEqual({'line': 6, 'error': projectfile._PARALLEL_BLOCK_EMPTY_ERROR}, cm.exception.args[0])
+
+
+class EnvironmentSetup(TestCase):
+
+    def test__source_lines_are_collected_in_order(self):
+        lines = ['from v1.0.0', 'source venv/bin/activate', 'target = all', 'source env.sh', 'build:', '  make']
+        result = projectfile._parse_lines(lines)
+        self.assertEqual(['venv/bin/activate', 'env.sh'], result['environment'])
+        self.assertEqual({'target': 'all'}, result['variables'])
+
+    def test__source_can_still_be_a_variable_or_command_name(self):
+        result = projectfile._parse_lines(['from v1.0.0', 'source = 1', 'source:', '  make'])
+        self.assertEqual({'source': '1'}, result['variables'])
+        self.assertIn('source', result['commands'])
+        self.assertNotIn('environment', result)
+
+    def test__source_line_of_a_command_is_a_command_line(self):
+        result = projectfile._parse_lines(['from v1.0.0', 'build:', '  source env.sh'])
+        self.assertEqual(['source env.sh'], result['commands']['build']['pre'])
+
+    def test__indented_source_line__raises_error(self):
+        with self.assertRaises(projectfile.ProjectfileError) as cm:
+            projectfile._parse_lines(['from v1.0.0', '  source env.sh'])
+        self.assertEqual({'line': 2, 'error': projectfile._SOURCE_INDENTATION_ERROR}, cm.exception.args[0])
+
+
+class Validation(TestCase):
+
+    def _commands(self, **commands):
+        return {'commands': commands}
+
+    def test__valid_command_graph__no_errors(self):
+        data = self._commands(build={'dependencies': ['compile']}, compile={}, b={'alias': 'build'})
+        self.assertEqual([], projectfile.validate(data))
+
+    def test__alias_to_undefined_command__reported(self):
+        data = self._commands(b={'alias': 'build'})
+        self.assertEqual([projectfile._UNDEFINED_ALIAS_ERROR.format('b', 'build')], projectfile.validate(data))
+
+    def test__circular_alias__reported(self):
+        data = self._commands(a={'alias': 'b'}, b={'alias': 'a'})
+        self.assertEqual([projectfile._CIRCULAR_ALIAS_ERROR.format('a'), projectfile._CIRCULAR_ALIAS_ERROR.format('b')],
+                         projectfile.validate(data))
+
+    def test__undefined_dependency__reported(self):
+        data = self._commands(build={'dependencies': ['compile']})
+        self.assertEqual([projectfile._UNDEFINED_DEPENDENCY_ERROR.format('build', 'compile')],
+                         projectfile.validate(data))
+
+    def test__dependency_cycle__reported_with_path(self):
+        data = self._commands(a={'dependencies': ['b']}, b={'dependencies': ['c']}, c={'dependencies': ['x']},
+                              x={'alias': 'a'})
+        self.assertEqual([projectfile._DEPENDENCY_CYCLE_ERROR.format('a -> b -> c -> a')], projectfile.validate(data))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import render
+
+_ESCAPE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+
+def _plain(line):
+    return _ESCAPE.sub('', line)
+
+
+class RendererTestCase(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(render.terminalsize, 'get_terminal_size', return_value=(40, 7))
+        self.mock_size = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stream = mock.Mock()
+
+
+class Layout(RendererTestCase):
+
+    def test__items_are_laid_out_in_columns(self):
+        renderer = render.ProjectList(['alpha', 'beta', 'gamma'], stream=self.stream)
+        lines = [_plain(line) for line in renderer.get_lines()]
+        self.assertEqual('You have 3 projects on your machine.', lines[0])
+        self.assertEqual('[1] alpha  [2] beta   [3] gamma', lines[2])
+
+    def test__only_the_visible_page_is_rendered(self):
+        names = ['p{}'.format(i) for i in range(2000)]
+        renderer = render.ProjectList(names, stream=self.stream)
+        lines = renderer.get_lines()
+        self.assertEqual(7, len(lines))
+        self.assertEqual('Page 1/334', lines[-1])
+
+    def test__paging(self):
+        names = ['p{}'.format(i) for i in range(30)]
+        renderer = render.ProjectList(names, stream=self.stream)
+        renderer.next_page()
+        self.assertTrue(_plain(renderer.get_lines()[2]).startswith('[13] p12'))
+        renderer.next_page()
+        renderer.next_page()
+        self.assertEqual('Page 3/3', renderer.get_lines()[-1])
+        renderer.previous_page()
+        self.assertEqual('Page 2/3', renderer.get_lines()[-1])
+
+    def test__selecting_an_item_moves_to_its_page(self):
+        names = ['p{}'.format(i) for i in range(30)]
+        renderer = render.ProjectList(names, highlight_color='<hl>', stream=self.stream)
+        renderer.select(20)
+        lines = renderer.get_lines()
+        self.assertEqual('Page 2/3', lines[-1])
+        self.assertTrue(any('<hl>' + render._REVERSE + '[21] p20' in line for line in lines))
+
+    def test__configured_number_color_is_used(self):
+        renderer = render.ProjectList(['alpha'], number_color='<nc>', stream=self.stream)
+        self.assertTrue(renderer.get_lines()[2].startswith('[<nc>'))
+
+    def test__no_projects(self):
+        renderer = render.ProjectList([], stream=self.stream)
+        self.assertEqual([render._HEADER_EMPTY], renderer.get_lines())
+
+
+class Drawing(RendererTestCase):
+
+    def test__frame_is_emitted_with_a_single_write(self):
+        renderer = render.ProjectList(['p{}'.format(i) for i in range(100)], stream=self.stream)
+        renderer.draw()
+        self.assertEqual(1, self.stream.write.call_count)
+        self.assertTrue(self.stream.write.call_args[0][0].startswith(render._CLEAR_SCREEN))
+
+    def test__redraw_only_touches_changed_lines(self):
+        renderer = render.ProjectList(['p{}'.format(i) for i in range(10)], stream=self.stream)
+        renderer.draw()
+        renderer.select(0)
+        self.assertEqual(1, renderer.draw())
+        self.assertNotIn(render._CLEAR_SCREEN, self.stream.write.call_args[0][0])
+
+    def test__unchanged_frame_writes_nothing(self):
+        renderer = render.ProjectList(['a', 'b'], stream=self.stream)
+        renderer.draw()
+        self.assertEqual(0, renderer.draw())
+        self.assertEqual(1, self.stream.write.call_count)
+
+    def test__resize_forces_a_full_redraw(self):
+        renderer = render.ProjectList(['a', 'b'], stream=self.stream)
+        renderer.draw()
+        self.mock_size.return_value = (80, 24)
+        renderer.draw()
+        self.assertTrue(self.stream.write.call_args[0][0].startswith(render._CLEAR_SCREEN))
+
+
+class Colors(TestCase):
+
+    def test__configured_color_is_returned(self):
+        self.assertEqual(render._COLORS['cyan'], render.get_color({'number-color': 'cyan'}, 'number-color'))
+
+    def test__default_color_is_used_when_not_configured(self):
+        self.assertEqual(render._COLORS['yellow'], render.get_color({}, 'highlight-color'))
@@ -0,0 +1,432 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase, skipIf
+
+try:
+    import pty
+except ImportError:
+    pty = None
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import interpolation
+from projects import runner
+
+
+def _data():
+    return {
+        'variables': {},
+        'commands': {
+            'bootstrap': {'pre': ['mkdir build'], 'post': []},
+            'b': {'alias': 'bootstrap'},
+            'build': {'dependencies': ['b'], 'pre': ['make'], 'post': ['echo done']},
+            'publish': {'dependencies': ['bootstrap', 'build'], 'pre': [], 'post': []},
+            'cached': {'pre': ['make'], 'post': [], 'inputs': ['src'], 'outputs': ['build']}
+        }
+    }
+
+
+class ExecutionOrder(TestCase):
+
+    def test__dependencies_are_executed_first(self):
+        result = runner._get_execution_order(_data(), 'publish')
+        self.assertEqual(['bootstrap', 'build', 'publish'], result)
+
+    def test__aliases_are_resolved(self):
+        result = runner._get_execution_order(_data(), 'b')
+        self.assertEqual(['bootstrap'], result)
+
+    def test__unknown_command__raises_error(self):
+        with self.assertRaises(runner.RunnerError) as cm:
+            runner._get_execution_order(_data(), 'missing')
+        self.assertEqual(runner._UNKNOWN_COMMAND_ERROR.format('missing'), cm.exception.args[0])
+
+    def test__circular_dependency__raises_error(self):
+        data = _data()
+        data['commands']['bootstrap']['dependencies'] = ['publish']
+        with self.assertRaises(runner.RunnerError) as cm:
+            runner._get_execution_order(data, 'publish')
+        self.assertEqual(runner._CIRCULAR_DEPENDENCY_ERROR.format('publish'), cm.exception.args[0])
+
+
+class Script(TestCase):
+
+    def test__pre_and_post_lines_are_joined_into_one_script(self):
+        resolver = interpolation.Resolver({})
+        result = runner._get_script(_data()['commands']['build'], resolver)
+        self.assertEqual('set -e\nmake\necho done', result)
+
+    def test__variables_are_substituted(self):
+        resolver = interpolation.Resolver({'target': 'all'})
+        command = {'pre': ['make {{target}}'], 'post': []}
+        result = runner._get_script(command, resolver)
+        self.assertEqual('set -e\nmake all', result)
+
+    def test__parallel_block_lines_are_substituted(self):
+        resolver = interpolation.Resolver({'target': 'all'})
+        command = {'pre': [['make {{target}}', 'make docs']], 'post': []}
+        result = runner._get_script(command, resolver)
+        self.assertIn('(\nmake all\n)', result)
+        self.assertIn('(\nmake docs\n)', result)
+        self.assertNotIn('{{target}}', result)
+
+
+def _popen(*codes):
+    processes = []
+    for code in codes:
+        process = mock.Mock()
+        process.wait.return_value = code
+        processes.append(process)
+    return processes
+
+
+class Run(TestCase):
+
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__commands_are_executed_in_the_given_directory(self, mock_popen):
+        mock_popen.side_effect = _popen(0, 0)
+        runner.run(_data(), 'build', '/project')
+        mock_popen.assert_any_call('set -e\nmkdir build', shell=True, cwd='/project', **runner._PROCESS_GROUP)
+        mock_popen.assert_called_with('set -e\nmake\necho done', shell=True, cwd='/project', **runner._PROCESS_GROUP)
+
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__undefined_variable__raises_error(self, mock_popen):
+        data = _data()
+        data['commands']['bootstrap']['pre'] = ['mkdir {{missing}}']
+        with self.assertRaises(runner.RunnerError) as cm:
+            runner.run(data, 'bootstrap', '/project')
+        self.assertEqual(interpolation._UNDEFINED_VARIABLE_ERROR.format('missing'), cm.exception.args[0])
+        self.assertFalse(mock_popen.called)
+
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__failing_command__raises_error(self, mock_popen):
+        mock_popen.side_effect = _popen(2)
+        with self.assertRaises(runner.RunnerError) as cm:
+            runner.run(_data(), 'bootstrap', '/project')
+        self.assertEqual(runner._COMMAND_FAILED_ERROR.format('bootstrap', 2), cm.exception.args[0])
+
+    @mock.patch.object(runner, 'cas', autospec=True)
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__cache_hit__command_is_not_executed(self, mock_popen, mock_cas):
+        mock_cas.restore.return_value = True
+        runner.run(_data(), 'cached', '/project')
+        self.assertFalse(mock_popen.called)
+        self.assertFalse(mock_cas.store.called)
+
+    @mock.patch.object(runner, 'cas', autospec=True)
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__cache_miss__outputs_are_stored(self, mock_popen, mock_cas):
+        mock_cas.restore.return_value = False
+        mock_cas.get_key.return_value = 'key'
+        mock_popen.side_effect = _popen(0)
+        runner.run(_data(), 'cached', '/project', cache_size=42)
+        mock_cas.get_key.assert_called_with('set -e\nmake', {}, '/project', ['src'])
+        mock_cas.store.assert_called_with('key', '/project', ['build'])
+        mock_cas.gc.assert_called_with(42)
+
+    @mock.patch.object(runner, 'cas', autospec=True)
+    def test__cache_key_depends_only_on_the_variables_of_the_command(self, mock_cas):
+        data = _data()
+        data['variables'] = {'target': 'all', 'other': 'x'}
+        data['commands']['cached']['pre'] = ['make {{target}}']
+        data['commands']['bootstrap']['pre'] = ['mkdir {{other}}']
+        resolvers = {}
+        runner._get_key(data, 'bootstrap', '/project', resolvers)
+        runner._get_key(data, 'cached', '/project', resolvers)
+        mock_cas.get_key.assert_called_with('set -e\nmake all', {'target': 'all'}, '/project', ['src'])
+
+    @mock.patch.object(runner, 'cas', autospec=True)
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__commands_without_outputs_bypass_the_cache(self, mock_popen, mock_cas):
+        mock_popen.side_effect = _popen(0)
+        runner.run(_data(), 'bootstrap', '/project')
+        self.assertFalse(mock_cas.get_key.called)
+
+    @mock.patch.object(runner.sys, 'stderr')
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__failing_command__is_retried(self, mock_popen, mock_stderr):
+        mock_popen.side_effect = _popen(1, 1, 0)
+        data = _data()
+        data['commands']['bootstrap']['retries'] = 2
+        runner.run(data, 'bootstrap', '/project')
+        self.assertEqual(3, mock_popen.call_count)
+
+    @mock.patch.object(runner.sys, 'stderr')
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__retries_exhausted__raises_error(self, mock_popen, mock_stderr):
+        mock_popen.side_effect = _popen(1, 3)
+        data = _data()
+        data['commands']['bootstrap']['retries'] = 1
+        with self.assertRaises(runner.RunnerError) as cm:
+            runner.run(data, 'bootstrap', '/project')
+        self.assertEqual(runner._COMMAND_FAILED_ERROR.format('bootstrap', 3), cm.exception.args[0])
+
+
+    @mock.patch.object(runner, 'cas', autospec=True)
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__events_are_reported_and_output_goes_to_stderr(self, mock_popen, mock_cas):
+        mock_cas.restore.side_effect = [True]
+        mock_popen.side_effect = _popen(0)
+        data = _data()
+        data['commands']['cached']['dependencies'] = ['bootstrap']
+        reported = []
+        runner.run(data, 'cached', '/project', report=lambda event, fields: reported.append((event, fields)))
+        self.assertEqual([
+            ('start', {'command': 'bootstrap'}),
+            ('finish', {'command': 'bootstrap', 'status': 0, 'duration': reported[1][1]['duration'], 'run': None}),
+            ('restored', {'command': 'cached'})
+        ], reported)
+        self.assertEqual(runner.sys.stderr.fileno(), mock_popen.call_args[1]['stdout'])
+
+    @mock.patch.object(runner, 'environment', autospec=True)
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__environment_snapshot_is_passed_to_the_commands(self, mock_popen, mock_environment):
+        mock_popen.side_effect = _popen(0, 0)
+        mock_environment.get_diff.return_value = {'set': {'VIRTUAL_ENV': '/venv'}, 'unset': []}
+        mock_environment.apply.return_value = {'VIRTUAL_ENV': '/venv'}
+        data = _data()
+        data['environment'] = ['venv/bin/activate']
+        runner.run(data, 'build', '/project')
+        mock_environment.get_diff.assert_called_once_with(['venv/bin/activate'], '/project')
+        self.assertEqual([{'VIRTUAL_ENV': '/venv'}] * 2, [call[1]['env'] for call in mock_popen.call_args_list])
+
+    @mock.patch.object(runner.subprocess, 'Popen')
+    def test__failing_environment_setup__raises_error(self, mock_popen):
+        data = _data()
+        data['environment'] = ['missing.sh']
+        with self.assertRaises(runner.RunnerError) as cm:
+            runner.run(data, 'bootstrap', '/project')
+        self.assertEqual(runner.environment._MISSING_SCRIPT_ERROR.format('/project/missing.sh'), cm.exception.args[0])
+        self.assertFalse(mock_popen.called)
+
+
+class CriticalPath(TestCase):
+
+    def _data(self):
+        return {'variables': {}, 'commands': {
+            'lint': {'pre': ['lint'], 'post': []},
+            'docs': {'pre': ['docs'], 'post': []},
+            'compile': {'pre': ['compile'], 'post': []},
+            'link': {'dependencies': ['compile'], 'pre': ['link'], 'post': []},
+            'all': {'dependencies': ['lint', 'docs', 'link'], 'pre': [], 'post': []}
+        }}
+
+    def _run(self, estimates):
+        with mock.patch.object(runner, 'history', autospec=True) as mock_history:
+            mock_history.get_estimates.return_value = estimates
+            with mock.patch.object(runner.subprocess, 'Popen') as mock_popen:
+                mock_popen.side_effect = lambda *args, **kwargs: _popen(0)[0]
+                runner.run(self._data(), 'all', '/project', project='/project')
+        return [call[0][0].split('\n')[-1] for call in mock_popen.call_args_list], mock_history
+
+    def test__without_history__declaration_order_is_kept(self):
+        executed, _ = self._run({})
+        self.assertEqual(['lint', 'docs', 'compile', 'link', 'set -e'], executed)
+
+    def test__longest_chain_is_started_first(self):
+        executed, _ = self._run({'lint': 5.0, 'docs': 1.0, 'compile': 4.0, 'link': 3.0})
+        self.assertEqual(['compile', 'lint', 'link', 'docs', 'set -e'], executed)
+
+    def test__unknown_commands_are_estimated_with_the_average(self):
+        executed, _ = self._run({'lint': 2.0, 'compile': 6.0})
+        self.assertEqual(['compile', 'docs', 'link', 'lint', 'set -e'], executed)
+
+    def test__executed_commands_are_recorded(self):
+        _, mock_history = self._run({})
+        recorded = [call[0][1] for call in mock_history.record.call_args_list]
+        self.assertEqual(['lint', 'docs', 'compile', 'link', 'all'], recorded)
+        self.assertEqual(0, mock_history.record.call_args[0][3])
+
+
+class Lifecycle(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp)
+
+    def _command(self, lines, **options):
+        command = {'pre': lines, 'post': []}
+        command.update(options)
+        return command
+
+    def _pid_alive(self, path):
+        with open(path) as f:
+            pid = int(f.read())
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        # killed orphans stay zombies until init reaps them
+        try:
+            with open('/proc/{}/stat'.format(pid)) as f:
+                return f.read().split(')')[-1].split()[0] != 'Z'
+        except IOError:
+            return True
+
+    def test__timeout__kills_the_whole_process_group(self):
+        pid_file = os.path.join(self.temp, 'child.pid')
+        data = {'variables': {}, 'commands': {
+            'hang': self._command(['sleep 60 & echo $! > {}'.format(pid_file), 'wait'], timeout=0.5)
+        }}
+        started = time.time()
+        with self.assertRaises(runner.RunnerError) as cm:
+            runner.run(data, 'hang', self.temp)
+        self.assertLess(time.time() - started, 10)
+        self.assertEqual(runner._COMMAND_TIMEOUT_ERROR.format('hang', 0.5), cm.exception.args[0])
+        self.assertFalse(self._pid_alive(pid_file))
+
+    def test__command_runs_in_its_own_group_in_the_same_session(self):
+        ids_file = os.path.join(self.temp, 'ids')
+        data = {'variables': {}, 'commands': {
+            'ids': self._command(['{} -c "import os; print(os.getsid(0), os.getpgrp())" > {}'.format(
+                sys.executable, ids_file)])
+        }}
+        runner.run(data, 'ids', self.temp)
+        with open(ids_file) as f:
+            session, group = [int(value) for value in f.read().split()]
+        self.assertEqual(os.getsid(0), session)
+        self.assertNotEqual(os.getpgrp(), group)
+
+    @skipIf(pty is None, 'pty is not available')
+    def test__command_reading_the_terminal_gets_the_foreground(self):
+        answer_file = os.path.join(self.temp, 'answer')
+        data = {'variables': {}, 'commands': {
+            'ask': self._command(['read -r answer', 'echo "$answer" > {}'.format(answer_file)])
+        }}
+        self.assertEqual(0, self._run_on_terminal(data, 'ask', b'yes\n'))
+        with open(answer_file) as f:
+            self.assertEqual('yes\n', f.read())
+
+    @skipIf(pty is None, 'pty is not available')
+    def test__ctrl_c_on_the_terminal__interrupts_the_run(self):
+        data = {'variables': {}, 'commands': {'wait': self._command(['sleep 30'])}}
+        self.assertEqual(130, self._run_on_terminal(data, 'wait', b'\x03'))
+
+    def _run_on_terminal(self, data, name, keys):
+        pid, master = pty.fork()
+        if pid == 0:
+            # the child is the session leader of the pty, p runs in its foreground
+            try:
+                runner.run(data, name, self.temp)
+                os._exit(0)
+            except KeyboardInterrupt:
+                os._exit(130)
+            except BaseException:
+                os._exit(1)
+        try:
+            time.sleep(0.5)
+            os.write(master, keys)
+            deadline = time.time() + 10
+            while time.time() < deadline:
+                finished, status = os.waitpid(pid, os.WNOHANG)
+                if finished:
+                    return os.WEXITSTATUS(status)
+                time.sleep(0.05)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self.fail('the command reading the terminal was stopped')
+        finally:
+            os.close(master)
+
+    def test__failing_branch__cancels_running_siblings(self):
+        pid_file = os.path.join(self.temp, 'sibling.pid')
+        data = {'variables': {}, 'commands': {
+            'slow': self._command(['sleep 60 & echo $! > {}'.format(pid_file), 'wait']),
+            'broken': self._command(['sleep 0.3', 'exit 4']),
+            'all': self._command([], dependencies=['slow', 'broken'])
+        }}
+        started = time.time()
+        with self.assertRaises(runner.RunnerError) as cm:
+            runner.run(data, 'all', self.temp, jobs=2)
+        self.assertLess(time.time() - started, 10)
+        self.assertEqual(runner._COMMAND_FAILED_ERROR.format('broken', 4), cm.exception.args[0])
+        self.assertFalse(self._pid_alive(pid_file))
+
+    def test__independent_commands_run_in_parallel(self):
+        data = {'variables': {}, 'commands': {
+            'a': self._command(['sleep 0.5']),
+            'b': self._command(['sleep 0.5']),
+            'all': self._command([], dependencies=['a', 'b'])
+        }}
+        started = time.time()
+        runner.run(data, 'all', self.temp, jobs=2)
+        self.assertLess(time.time() - started, 0.9)
+
+    def test__dependents_wait_for_their_dependencies(self):
+        log = os.path.join(self.temp, 'log')
+        data = {'variables': {}, 'commands': {
+            'first': self._command(['sleep 0.2', 'echo first >> {}'.format(log)]),
+            'second': self._command(['echo second >> {}'.format(log)], dependencies=['first'])
+        }}
+        runner.run(data, 'second', self.temp, jobs=4)
+        with open(log) as f:
+            self.assertEqual('first\nsecond\n', f.read())
+
+    def _logged_runs(self):
+        path_patcher = mock.patch.object(runner.logs.config, 'data_path',
+                                         side_effect=lambda *names: os.path.join(self.temp, 'p', *names))
+        path_patcher.start()
+        self.addCleanup(path_patcher.stop)
+
+    def test__logged_output_is_captured_and_passed_through(self):
+        self._logged_runs()
+        data = {'variables': {}, 'commands': {
+            'build': self._command(['echo out', 'echo err >&2'])
+        }}
+        runner.run(data, 'build', self.temp, project=self.temp, log=True)
+        runs = runner.logs.get_runs(self.temp)
+        self.assertEqual([('build', 0)], [(run['command'], run['status']) for run in runs])
+        captured = b''.join(runner.logs.read(runs[0]['run']))
+        self.assertEqual([b'err', b'out'], sorted(captured.split()))
+
+    def test__failed_run__status_and_retries_are_logged(self):
+        self._logged_runs()
+        data = {'variables': {}, 'commands': {
+            'flaky': self._command(['echo attempt', 'exit 3'], retries=1)
+        }}
+        reported = []
+        with self.assertRaises(runner.RunnerError):
+            runner.run(data, 'flaky', self.temp, project=self.temp, log=True,
+                       report=lambda event, fields: reported.append((event, fields)))
+        run = runner.logs.get_runs(self.temp)[0]
+        self.assertEqual(3, run['status'])
+        self.assertEqual(run['run'], [fields for event, fields in reported if event == 'finish'][0]['run'])
+        captured = b''.join(runner.logs.read(run['run'])).decode('utf-8')
+        self.assertEqual(2, captured.count('attempt\n'))
+        self.assertIn(runner._RETRY_MESSAGE.format(runner._COMMAND_FAILED_ERROR.format('flaky', 3), 1, 1), captured)
+
+    def _run_script(self, lines):
+        script = runner._get_script(self._command(lines), interpolation.Resolver({}))
+        process = subprocess.Popen(script, shell=True, cwd=self.temp, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT)
+        output = process.communicate()[0].decode('utf-8')
+        return process.returncode, output
+
+    def test__parallel_block_lines_run_concurrently(self):
+        started = time.time()
+        code, output = self._run_script([['sleep 0.5', 'sleep 0.5', 'sleep 0.5'], 'echo joined'])
+        self.assertLess(time.time() - started, 1.2)
+        self.assertEqual((0, 'joined\n'), (code, output))
+
+    def test__parallel_block_output_is_grouped_by_line(self):
+        code, output = self._run_script([[
+            'echo a1; sleep 0.3; echo a2',
+            'sleep 0.1; echo b1; sleep 0.3; echo b2 >&2  # comment'
+        ]])
+        self.assertEqual((0, 'a1\na2\nb1\nb2\n'), (code, output))
+
+    def test__failing_parallel_line__fails_after_the_block_joined(self):
+        code, output = self._run_script([['exit 3', 'sleep 0.2; echo finished'], 'echo after'])
+        self.assertNotEqual(0, code)
+        self.assertEqual('finished\n', output)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import scaffold
+
+_TEMPLATE_PROJECTFILE = '''from v1.0.0
+
+name = {{project}}
+owner = {{owner}}
+
+build:
+  make {{target}}
+'''
+
+
+def _write(path, content):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+class Create(TestCase):
+
+    def setUp(self):
+        self.temp = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp)
+        self.root = os.path.join(self.temp, 'projects')
+        os.makedirs(self.root)
+        self.conf = {'projects-path': self.root}
+        self.templates = os.path.join(self.temp, 'templates')
+        self.template = os.path.join(self.templates, 'python')
+        _write(os.path.join(self.template, 'Projectfile'), _TEMPLATE_PROJECTFILE)
+        _write(os.path.join(self.template, 'src', 'main.py'), 'print("hello")\n')
+        _write(os.path.join(self.template, 'vendor', 'lib', 'module.py'), 'VALUE = 1\n')
+        os.symlink('src/main.py', os.path.join(self.template, 'main.py'))
+        path_patcher = mock.patch.object(scaffold, '_get_templates_path', return_value=self.templates)
+        path_patcher.start()
+        self.addCleanup(path_patcher.stop)
+
+    def test__templates_are_listed(self):
+        os.makedirs(os.path.join(self.templates, 'go'))
+        _write(os.path.join(self.templates, 'README'), '')
+        self.assertEqual(['go', 'python'], scaffold.list_templates())
+
+    def test__template_tree_is_cloned(self):
+        path = scaffold.create(self.conf, 'app', 'python')
+        self.assertEqual(os.path.join(self.root, 'app'), path)
+        self.assertEqual('print("hello")\n', _read(os.path.join(path, 'src', 'main.py')))
+        self.assertEqual('VALUE = 1\n', _read(os.path.join(path, 'vendor', 'lib', 'module.py')))
+        self.assertEqual('src/main.py', os.readlink(os.path.join(path, 'main.py')))
+
+    def test__cloned_files_are_independent_of_the_template(self):
+        path = scaffold.create(self.conf, 'app', 'python')
+        _write(os.path.join(path, 'src', 'main.py'), 'changed\n')
+        self.assertEqual('print("hello")\n', _read(os.path.join(self.template, 'src', 'main.py')))
+
+    def test__hardlinks_are_used_only_when_allowed(self):
+        with mock.patch.object(scaffold.files, 'clone') as mock_clone:
+            scaffold.create(self.conf, 'app', 'python', hardlink=True)
+        self.assertEqual(2, mock_clone.call_count)
+        self.assertTrue(all(call[0][2] for call in mock_clone.call_args_list))
+
+    def test__projectfile_variables_are_filled_in(self):
+        path = scaffold.create(self.conf, 'app', 'python', {'owner': 'me'})
+        expected = _TEMPLATE_PROJECTFILE.replace('{{project}}', 'app').replace('{{owner}}', 'me')
+        self.assertEqual(expected, _read(os.path.join(path, 'Projectfile')))
+
+    def test__missing_default_template__starter_projectfile_is_created(self):
+        path = scaffold.create(self.conf, 'app')
+        self.assertEqual(['Projectfile'], os.listdir(path))
+        self.assertIn('project = app', _read(os.path.join(path, 'Projectfile')))
+
+    def test__existing_project__raises_error(self):
+        os.makedirs(os.path.join(self.root, 'app'))
+        with self.assertRaises(scaffold.ScaffoldError) as cm:
+            scaffold.create(self.conf, 'app', 'python')
+        self.assertEqual(scaffold._PROJECT_EXISTS_ERROR.format('app'), cm.exception.args[0])
+
+    def test__unknown_template__raises_error(self):
+        with self.assertRaises(scaffold.ScaffoldError) as cm:
+            scaffold.create(self.conf, 'app', 'rust')
+        self.assertEqual(scaffold._UNKNOWN_TEMPLATE_ERROR.format('rust'), cm.exception.args[0])
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'app')))
+
+    def test__invalid_name__raises_error(self):
+        for name in ('', '.hidden', os.path.join('a', 'b')):
+            with self.assertRaises(scaffold.ScaffoldError):
+                scaffold.create(self.conf, name, 'python')
+
+    def test__failed_clone__removes_the_partial_project(self):
+        with mock.patch.object(scaffold.files, 'clone', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                scaffold.create(self.conf, 'app', 'python')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'app')))
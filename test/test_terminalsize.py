@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from unittest import TestCase
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from projects import terminalsize
+
+
+class TerminalSizeTestCase(TestCase):
+
+    def setUp(self):
+        terminalsize._size = None
+        terminalsize._listeners[:] = []
+        patcher = mock.patch.object(terminalsize, 'signal', autospec=True)
+        self.mock_signal = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        terminalsize._size = None
+        terminalsize._listeners[:] = []
+        terminalsize._previous_handler = None
+
+
+class Querying(TerminalSizeTestCase):
+
+    @mock.patch.object(terminalsize, 'shutil', autospec=True)
+    def test__size_is_queried_from_shutil(self, mock_shutil):
+        mock_shutil.get_terminal_size.return_value = os.terminal_size((120, 40))
+        self.assertEqual((120, 40), terminalsize.get_terminal_size())
+
+    @mock.patch.object(terminalsize, 'shutil', autospec=True)
+    def test__size_is_queried_only_once(self, mock_shutil):
+        mock_shutil.get_terminal_size.return_value = os.terminal_size((120, 40))
+        for _ in range(100):
+            terminalsize.get_terminal_size()
+        self.assertEqual(1, mock_shutil.get_terminal_size.call_count)
+
+    @mock.patch.object(terminalsize.os, 'get_terminal_size', autospec=True)
+    @mock.patch.object(terminalsize, 'shutil', autospec=True)
+    def test__redirected_stdout__falls_back_to_stderr(self, mock_shutil, mock_get_size):
+        mock_shutil.get_terminal_size.return_value = os.terminal_size((0, 0))
+        mock_get_size.return_value = os.terminal_size((100, 30))
+        self.assertEqual((100, 30), terminalsize.get_terminal_size())
+        mock_get_size.assert_called_with(2)
+
+    @mock.patch.object(terminalsize.os, 'get_terminal_size', autospec=True)
+    @mock.patch.object(terminalsize, 'shutil', autospec=True)
+    def test__no_terminal__returns_default(self, mock_shutil, mock_get_size):
+        mock_shutil.get_terminal_size.return_value = os.terminal_size((0, 0))
+        mock_get_size.side_effect = OSError()
+        self.assertEqual(terminalsize._DEFAULT_SIZE, terminalsize.get_terminal_size())
+
+
+class Resizing(TerminalSizeTestCase):
+
+    @mock.patch.object(terminalsize, 'shutil', autospec=True)
+    def test__handler_is_installed_on_first_query(self, mock_shutil):
+        mock_shutil.get_terminal_size.return_value = os.terminal_size((120, 40))
+        terminalsize.get_terminal_size()
+        self.mock_signal.signal.assert_called_with(self.mock_signal.SIGWINCH, terminalsize._handle_resize)
+
+    @mock.patch.object(terminalsize, 'shutil', autospec=True)
+    def test__resize_updates_the_cached_size_and_notifies_listeners(self, mock_shutil):
+        mock_shutil.get_terminal_size.return_value = os.terminal_size((120, 40))
+        listener = mock.Mock()
+        terminalsize.on_resize(listener)
+        mock_shutil.get_terminal_size.return_value = os.terminal_size((60, 20))
+        terminalsize._handle_resize(28, None)
+        self.assertEqual((60, 20), terminalsize.get_terminal_size())
+        listener.assert_called_with((60, 20))
+
+    @mock.patch.object(terminalsize, 'shutil', autospec=True)
+    def test__removed_listener_is_not_notified(self, mock_shutil):
+        mock_shutil.get_terminal_size.return_value = os.terminal_size((120, 40))
+        listener = mock.Mock()
+        terminalsize.on_resize(listener)
+        terminalsize.off_resize(listener)
+        terminalsize._handle_resize(28, None)
+        self.assertFalse(listener.called)